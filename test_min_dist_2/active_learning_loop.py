@@ -4,10 +4,16 @@ import yaml
 from scripts.bootstrap import run_bootstrap
 from scripts.train_mace import train_ensemble_for_iteration
 from scripts.calc_mean_error import compute_mean_test_mae_for_iteration
-from scripts.create_db import create_db
-from scripts.run_ga import run_ga
+from scripts.create_db import create_db, ga_db_name
+from scripts.explore import explorer
 from scripts.submit_dft import submit_dft
 from scripts.merge import merge_datasets
+from scripts.tracing import TRACER, span, print_summary
+from scripts.stage_runner import StageRunner
+from scripts.async_loop import run_async_loop
+from scripts import speculative
+from scripts.warm_start import warm_start_seeds
+from scripts.candidate_pool import mark_dft_labelled
 from pathlib import Path
 import matplotlib.pyplot as pyplot
 from ase.io import read
@@ -30,28 +36,85 @@ with open(args.config) as f:
 first_average_errors=[]
 second_average_errors=[]
 
+# Timing spans per stage, written to data/iterXXX/trace*.json(l)
+TRACER.configure(cfg)
+
+# mode: async overlaps DFT, training and GA exploration (scripts/async_loop.py)
+if cfg["active_learning"].get("mode", "sync") == "async":
+    run_async_loop(cfg)
+    raise SystemExit(0)
+
 
 for it in range(0, cfg["active_learning"]["iterations"]):
     print(it)
+    iterdir=Path(cfg["data"]["iterdir_pattern"].format(iter=it))
+    TRACER.start_iteration(it, iterdir)
+    # Completion markers in data/iterXXX/.stages; a restarted run skips stages that are up to date
+    runner=StageRunner(cfg, it)
+    db_file=Path(ga_db_name(cfg, it))
+    committee_models=Path(cfg["data"]["runsdir_pattern"].format(iter=it)) / "boot_*" / "checkpoints" / "*_stagetwo.model"
+
+    def seeded_create_db(fresh=False):
+        # candidates explored during the previous iteration's DFT (rescored with this committee)
+        # and the best/most diverse structures of earlier iterations; a fresh (retry) population
+        # is random only
+        seeds=[] if fresh else speculative.rescored_seeds(cfg, it) + warm_start_seeds(cfg, it)
+        return create_db(cfg, it, seeds=seeds)
+
+    def run_create_db(force=False):
+        # the GA adds candidates to the database, so only its existence is checked
+        earlier_relaxed=[Path(cfg["data"]["iterdir_pattern"].format(iter=j)) / "dft_relaxed.xyz" for j in range(it)]
+        return runner.run("create_db", seeded_create_db, force,
+                          inputs=[speculative.candidates_file(cfg, it), committee_models, *earlier_relaxed],
+                          cfg_keys=["initialization", "speculative", "warm_start"],
+                          outputs=[db_file], verify_outputs=False, force=force)
+
+    # explore: ga (run_ga) or md (md_explore); both write selected_for_dft.extxyz, the stage keeps its name
+    # attempt: retry number, seeds the MD explorer so a retry does not replay the same run
+    def run_run_ga(force=False, attempt=0):
+        return runner.run("run_ga", explorer(cfg), cfg, it, inputs=[committee_models],
+                          cfg_keys=["initialization", "ga", "explore", "md_explore"], after=["create_db"],
+                          outputs=[iterdir / "selected_for_dft.extxyz"], force=force, attempt=attempt)
+
+    def run_submit_dft(force=False):
+        result=runner.run("submit_dft", submit_dft, cfg, it, inputs=[iterdir / "selected_for_dft.extxyz"],
+                          cfg_keys=["dft"], after=["run_ga"], outputs=[iterdir / "dft_*.xyz"], force=force)
+        # only structures DFT actually labelled leave the candidate pool
+        mark_dft_labelled(cfg, [it])
+        return result
+
     if it!=0:
         #Prepare bootstrapped training datasets
-        manifest=run_bootstrap(cfg, iteration=it)
+        with span("bootstrap"):
+            manifest=runner.run("bootstrap", run_bootstrap, cfg, iteration=it,
+                                inputs=[cfg["data"]["dataset_pattern"].format(iter=it)],
+                                cfg_keys=["prep", "data.dataset_pattern", "data.iterdir_pattern"], extra={"iteration": it},
+                                outputs=[iterdir / "manifest.json", iterdir / "valid.xyz", iterdir / "train_pool.xyz",
+                                         iterdir / "train_boot_*.xyz"],
+                                cacheable=True)
 
         manifest_path=Path(manifest["outdir"]) / "manifest.json"
         # Train ensemble for this iteration 
-        train_ensemble_for_iteration(cfg, manifest_path)
+        with span("train"):
+            train_ensemble_for_iteration(cfg, manifest_path, runner=runner)
         # Compute mean test MAE after training
-        first_mae, second_mae = compute_mean_test_mae_for_iteration(it)
+        with span("test_mae"):
+            first_mae, second_mae = compute_mean_test_mae_for_iteration(it)
         first_average_errors.append(first_mae)
         second_average_errors.append(second_mae)
         print("Average mae per atom on test data in stage one: ", first_mae)
         print("Average mae per atom on test datain stage two: ", second_mae)
     # Create initial random population
-    create_db(cfg, it)
+    with span("create_db"):
+        run_create_db()
     # Run genetic algorithm and select uncertain candidates
-    run_ga(cfg, it)
+    with span("run_ga"):
+        run_run_ga()
+    # Explore the next iteration with this committee while the DFT runs
+    speculation=speculative.start(cfg, it)
     # Submit dft labeling 
-    submit_dft(cfg, it)
+    with span("submit_dft"):
+        run_submit_dft()
     # Check if there are successfully converged structures, if not run the genetic algorithm again
     relaxed_file_path=Path(f"data/iter{it:03d}/dft_relaxed.xyz")
 
@@ -68,14 +131,19 @@ for it in range(0, cfg["active_learning"]["iterations"]):
     while not is_enough(relaxed_file_path):
         if retries<max_retries:
             print("Number of dft relaxed structures is not enough, running the GA again!")
-            run_ga(cfg,it)
-            submit_dft(cfg, it)
+            with span("run_ga", retry=retries + 1):
+                run_run_ga(force=True, attempt=retries + 1)
+            with span("submit_dft", retry=retries + 1):
+                run_submit_dft(force=True)
             retries+=1
         else:
             print("Starting the GA with a different random population!")
-            create_db(cfg,it)
-            run_ga(cfg,it)
-            submit_dft(cfg, it)
+            with span("create_db", retry="new_population"):
+                run_create_db(force=True)
+            with span("run_ga", retry="new_population"):
+                run_run_ga(force=True, attempt=max_retries + 1)
+            with span("submit_dft", retry="new_population"):
+                run_submit_dft(force=True)
             
 
             # Check again — if still not enough, skip iteration completely
@@ -92,7 +160,17 @@ for it in range(0, cfg["active_learning"]["iterations"]):
 
     if is_enough(relaxed_file_path):
         print("Merging the datasets...")
-        merge_datasets(it, include_failed=False)
+        with span("merge"):
+            runner.run("merge", merge_datasets, it, include_failed=False,
+                       inputs=[cfg["data"]["dataset_pattern"].format(iter=it), relaxed_file_path],
+                       after=["submit_dft"], outputs=[cfg["data"]["dataset_pattern"].format(iter=it + 1)])
+
+    if speculation is not None:
+        speculation.join()
+    if runner.cache is not None:
+        stats=runner.cache.stats()
+        print(f"[Artifact-cache] hits={stats['hits']} misses={stats['misses']} stored={stats['stored']}")
+    print_summary(TRACER.finish_iteration())
     """ print("The GA was successfull! Merging the datasets...")
     # Merge dft labels and existing data
     merge_datasets(it, include_failed=False) """
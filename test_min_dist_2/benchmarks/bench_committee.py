@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# bench_committee.py
+# Energy+force latency/throughput of CommitteeCalculator against committee size, cluster
+# size, r_max, torch threads, float32 vs float64 and single vs batched evaluation.
+# Uses randomly initialised MACE models with the production architecture.
+#
+#   python -m benchmarks.bench_committee --members 1 5 10 --sizes 8 55 --threads 1 4 --cores 40
+import argparse
+import itertools
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from ase.calculators.calculator import all_changes
+
+from benchmarks.common import machine_meta
+from benchmarks.synthetic import make_cluster, make_standin_models
+from scripts.committee_calc import CommitteeCalculator
+
+
+def time_single(committee, structures, repeats):
+    for a in structures[:1]:    # warm-up (lazy initialisation, allocator)
+        committee.calculate(a, ["energy", "forces"], all_changes)
+    t0 = time.perf_counter()
+    n = 0
+    for _ in range(repeats):
+        for a in structures:
+            committee.calculate(a, ["energy", "forces"], all_changes)
+            n += 1
+    return (time.perf_counter() - t0) / n
+
+
+def time_batched(committee, structures, repeats):
+    committee.calculate_batch(structures[:1])
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        committee.calculate_batch(structures)
+    return (time.perf_counter() - t0) / (repeats * len(structures))
+
+
+def best_per_core_count(runs, cores):
+    """
+    For every (n_atoms, n_members, r_max): the setting with the highest aggregate throughput on
+    `cores` cores, running cores // threads independent workers with `threads` threads each.
+    """
+    best = {}
+    for r in runs:
+        t = r["params"]["threads"]
+        if t > cores:
+            continue
+        workers = cores // t
+        agg = workers * r["throughput_per_s"]
+        key = (r["params"]["n_atoms"], r["params"]["n_members"], r["params"]["r_max"])
+        if key not in best or agg > best[key]["aggregate_throughput_per_s"]:
+            best[key] = {
+                "n_atoms": key[0], "n_members": key[1], "r_max": key[2],
+                "threads": t, "workers": workers,
+                "dtype": r["params"]["dtype"], "mode": r["params"]["mode"],
+                "latency_ms": r["latency_ms"],
+                "aggregate_throughput_per_s": agg,
+            }
+    return [best[k] for k in sorted(best)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="CommitteeCalculator micro-benchmark")
+    ap.add_argument("--members", type=int, nargs="+", default=[1, 2, 5, 10])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[8, 20, 55, 147])
+    ap.add_argument("--r-max", type=float, nargs="+", default=[5.0, 9.0])
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--dtypes", nargs="+", default=["float64", "float32"])
+    ap.add_argument("--modes", nargs="+", default=["single", "batched"])
+    ap.add_argument("--batch-size", type=int, default=8, help="Structures per evaluation (batched mode)")
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--num-channels", type=int, default=128)
+    ap.add_argument("--max-L", type=int, default=1)
+    ap.add_argument("--cores", type=int, nargs="+", default=[os.cpu_count()],
+                    help="Core counts to report the best configuration for")
+    ap.add_argument("--model-dir", default="bench_models", help="Where stand-in models are cached")
+    ap.add_argument("--out", "-o", default="bench_committee.json")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    structures = {n: [make_cluster(n, rng) for _ in range(args.batch_size)] for n in args.sizes}
+    for frames in structures.values():
+        for a in frames:
+            a.info["charge"] = 0
+
+    results = {
+        "benchmark": "committee",
+        "meta": machine_meta(torch=torch.__version__, num_channels=args.num_channels,
+                             max_L=args.max_L, batch_size=args.batch_size),
+        "runs": [],
+    }
+    out_path = Path(args.out).resolve()
+    n_max = max(args.members)
+
+    for r_max, dtype in itertools.product(args.r_max, args.dtypes):
+        paths = make_standin_models(Path(args.model_dir), n_max, r_max, args.num_channels, args.max_L)
+        for n_members in args.members:
+            committee = CommitteeCalculator(model_paths=paths[:n_members], default_dtype=dtype)
+            for threads, n_atoms, mode in itertools.product(args.threads, args.sizes, args.modes):
+                torch.set_num_threads(threads)
+                timer = time_batched if mode == "batched" else time_single
+                latency = timer(committee, structures[n_atoms], args.repeats)
+                params = {"n_members": n_members, "n_atoms": n_atoms, "r_max": r_max,
+                          "threads": threads, "dtype": dtype, "mode": mode}
+                results["runs"].append({
+                    "params": params,
+                    "latency_ms": latency * 1e3,
+                    "throughput_per_s": 1.0 / latency,
+                })
+                print(f"[bench] {params} latency={latency * 1e3:8.2f} ms/structure")
+            out_path.write_text(json.dumps(results, indent=2))
+
+    results["best"] = {str(c): best_per_core_count(results["runs"], c) for c in args.cores}
+    out_path.write_text(json.dumps(results, indent=2))
+
+    for c, rows in results["best"].items():
+        print(f"\n[bench] Best settings on {c} cores:")
+        for b in rows:
+            print(f"  n_atoms={b['n_atoms']:4d} members={b['n_members']:2d} r_max={b['r_max']:4.1f} -> "
+                  f"{b['workers']} x {b['threads']} thread(s), {b['dtype']}, {b['mode']}: "
+                  f"{b['aggregate_throughput_per_s']:.1f} structures/s")
+    print(f"[bench] Results → {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# bench_loop.py
+# End-to-end timing of one active-learning iteration on synthetic Na clusters, with tiny
+# MACE models and the fake DFT backend. Every case runs in its own throw-away campaign
+# directory; results go to a JSON file that can be compared between versions.
+#
+#   python -m benchmarks.bench_loop --sizes 8 20 55 147 --n-boot 2 --out bench_loop.json
+import argparse
+import copy
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import yaml
+from ase.io import read
+
+from benchmarks.common import CAMPAIGN_DIR, machine_meta, timed
+from benchmarks.synthetic import write_campaign_data
+from scripts.bootstrap import run_bootstrap
+from scripts.committee_calc import CommitteeCalculator
+from scripts.create_db import create_db
+from scripts.merge import merge_datasets
+from scripts.run_ga import run_ga
+from scripts.submit_dft import submit_dft
+from scripts.train_mace import train_ensemble_for_iteration
+
+# Small stand-in models: same architecture and options as the production config, far fewer weights/epochs
+TINY_MACE = {
+    "num_channels": 16,
+    "max_L": 0,
+    "r_max": 5.0,
+    "max_num_epochs": 2,
+    "patience": 2,
+    "batch_size": 4,
+    "valid_batch_size": 4,
+}
+
+
+def bench_config(base_cfg, n_atoms, n_boot, n_dft, offsprings, population, opt_steps, dft_latency):
+    cfg = copy.deepcopy(base_cfg)
+    cfg["mace"].update(TINY_MACE)
+    cfg["prep"].update({"n_boot": n_boot, "val_frac": 0.2})
+    cfg["initialization"].update({"n_atoms": n_atoms, "n_to_generate": population, "box_side": "auto"})
+    cfg["ga"].update({"offsprings": offsprings, "n_dft": n_dft, "opt_steps": opt_steps})
+    cfg["dft"].update({"backend": "fake", "executor": "local", "opt_steps": opt_steps})
+    cfg["dft"]["fake"] = {"potential": "morse", "latency": dft_latency, "failure_rate": 0.0, "seed": 0}
+    cfg["dft"]["scratch"] = {"enabled": False}
+    return cfg
+
+
+def run_case(base_cfg, workdir: Path, params: dict, n_train: int, n_test: int) -> dict:
+    cfg = bench_config(base_cfg, **params)
+    write_campaign_data(workdir, params["n_atoms"], n_train, n_test)
+    (workdir / "config.yaml").write_text(yaml.safe_dump(cfg, sort_keys=False))
+
+    timings, counts = {}, {}
+    old_cwd = Path.cwd()
+    os.chdir(workdir)   # every stage works with paths relative to the campaign directory
+    try:
+        with timed(timings, "bootstrap"):
+            manifest = run_bootstrap(cfg, iteration=0)
+        with timed(timings, "train"):
+            train_ensemble_for_iteration(cfg, Path(manifest["outdir"]) / "manifest.json")
+
+        test_frames = read(cfg["data"]["test_file"], ":")
+        committee = CommitteeCalculator(iteration=0, use_forces=True)
+        with timed(timings, "committee_eval"):
+            for a in test_frames:
+                a.calc = committee
+                a.get_potential_energy()
+        counts["committee_eval_structures"] = len(test_frames)
+        counts["committee_members"] = len(committee.members)
+
+        with timed(timings, "create_db"):
+            create_db(cfg, 0)
+        with timed(timings, "ga_relax"):
+            run_ga(cfg, 0)
+        with timed(timings, "dft_dispatch"):
+            submit_dft(cfg, 0)
+        with timed(timings, "merge"):
+            merge_datasets(0, include_failed=False)
+
+        counts["selected_for_dft"] = len(read("data/iter000/selected_for_dft.extxyz", ":"))
+        relaxed = Path("data/iter000/dft_relaxed.xyz")
+        counts["dft_relaxed"] = len(read(str(relaxed), ":")) if relaxed.exists() else 0
+    finally:
+        os.chdir(old_cwd)
+
+    timings["total"] = {k: sum(t[k] for t in timings.values()) for k in ("wall_s", "cpu_s")}
+    return {"params": params, "timings": timings, "counts": counts}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="End-to-end benchmark of one active-learning iteration")
+    ap.add_argument("--config", "-c", default=str(CAMPAIGN_DIR / "config.yaml"), help="Base config.yaml")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[8, 20, 55, 147], help="Cluster sizes (n_atoms)")
+    ap.add_argument("--n-boot", type=int, nargs="+", default=[2])
+    ap.add_argument("--n-dft", type=int, nargs="+", default=[4])
+    ap.add_argument("--offsprings", type=int, nargs="+", default=[4])
+    ap.add_argument("--population", type=int, nargs="+", default=[6])
+    ap.add_argument("--opt-steps", type=int, default=50, help="BFGS step limit for GA and fake DFT")
+    ap.add_argument("--dft-latency", type=float, default=0.0, help="Fake DFT seconds per single point")
+    ap.add_argument("--n-train", type=int, default=20, help="Synthetic training structures")
+    ap.add_argument("--n-test", type=int, default=5, help="Synthetic test structures")
+    ap.add_argument("--out", "-o", default="bench_loop.json")
+    ap.add_argument("--keep", action="store_true", help="Keep the temporary campaign directories")
+    args = ap.parse_args()
+
+    base_cfg = yaml.safe_load(open(args.config))
+    out_path = Path(args.out).resolve()
+    root = Path(tempfile.mkdtemp(prefix="bench_loop_"))
+
+    results = {
+        "benchmark": "loop",
+        "meta": machine_meta(opt_steps=args.opt_steps, dft_latency=args.dft_latency),
+        "runs": [],
+    }
+    grid = itertools.product(args.sizes, args.n_boot, args.n_dft, args.offsprings, args.population)
+    for case, (n_atoms, n_boot, n_dft, offsprings, population) in enumerate(grid):
+        params = {"n_atoms": n_atoms, "n_boot": n_boot, "n_dft": n_dft, "offsprings": offsprings,
+                  "population": population, "opt_steps": args.opt_steps, "dft_latency": args.dft_latency}
+        print(f"[bench] case {case}: {params}")
+        result = run_case(base_cfg, root / f"case_{case:03d}", params, args.n_train, args.n_test)
+        results["runs"].append(result)
+        for stage, t in result["timings"].items():
+            print(f"[bench]   {stage:15s} wall={t['wall_s']:9.2f}s cpu={t['cpu_s']:9.2f}s")
+        # write after every case so partial results survive a crash
+        out_path.write_text(json.dumps(results, indent=2))
+
+    print(f"[bench] Results → {out_path}")
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# bench_optimizers.py
+# Committee calls and wall time per converged structure for the GA relaxation optimizers
+# (scripts/optimizers.py), counted with CommitteeCalculator.n_calls. Uses randomly
+# initialised MACE models unless --models points at a trained committee (a random
+# landscape converges differently from a trained one; use --models for decisions).
+#
+#   python -m benchmarks.bench_optimizers --sizes 8 20 --n-structures 16
+#   python -m benchmarks.bench_optimizers --models "runs/iter003/boot_*/checkpoints/*_stagetwo.model"
+import argparse
+import glob
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from benchmarks.common import machine_meta
+from benchmarks.synthetic import make_cluster, make_standin_models
+from scripts.committee_calc import CommitteeCalculator
+from scripts.optimizers import OPTIMIZERS, make_optimizer, relax_batch
+
+
+def run_optimizer(name, committee, structures, fmax, steps, batch_size):
+    frames = [a.copy() for a in structures]
+    for a in frames:
+        a.info["charge"] = 0
+    calls0, t0 = committee.n_calls, time.perf_counter()
+    if name == "batched_fire":
+        nsteps = relax_batch(frames, committee, fmax, steps, batch_size)
+    else:
+        nsteps = []
+        for a in frames:
+            a.calc = committee
+            dyn = make_optimizer(a, name)
+            dyn.run(fmax, steps)
+            nsteps.append(dyn.nsteps)
+    wall = time.perf_counter() - t0
+    converged = sum(n < steps for n in nsteps)
+    calls = committee.n_calls - calls0
+    return {
+        "n_structures": len(frames),
+        "converged": converged,
+        "mean_steps": float(np.mean(nsteps)),
+        "committee_calls": calls,
+        "calls_per_converged": calls / converged if converged else None,
+        "wall_s_per_converged": wall / converged if converged else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Optimizer comparison for committee relaxations")
+    ap.add_argument("--optimizers", nargs="+", default=list(OPTIMIZERS))
+    ap.add_argument("--sizes", type=int, nargs="+", default=[8, 20])
+    ap.add_argument("--n-structures", type=int, default=16)
+    ap.add_argument("--fmax", type=float, default=0.05)
+    ap.add_argument("--steps", type=int, default=300)
+    ap.add_argument("--batch-size", type=int, default=16, help="batched_fire: structures per committee call")
+    ap.add_argument("--members", type=int, default=5)
+    ap.add_argument("--r-max", type=float, default=9.0)
+    ap.add_argument("--models", help="Glob of trained committee models (default: random stand-ins)")
+    ap.add_argument("--model-dir", default="bench_models", help="Where stand-in models are cached")
+    ap.add_argument("--out", "-o", default="bench_optimizers.json")
+    args = ap.parse_args()
+
+    if args.models:
+        paths = sorted(glob.glob(args.models))
+    else:
+        paths = make_standin_models(Path(args.model_dir), args.members, args.r_max)
+    committee = CommitteeCalculator(model_paths=paths)
+
+    rng = np.random.default_rng(0)
+    structures = {n: [make_cluster(n, rng, rattle=0.2) for _ in range(args.n_structures)] for n in args.sizes}
+
+    results = {
+        "benchmark": "optimizers",
+        "meta": machine_meta(torch=torch.__version__, n_members=len(paths), models=args.models or "stand-in",
+                             fmax=args.fmax, steps=args.steps),
+        "runs": [],
+    }
+    out_path = Path(args.out).resolve()
+    for n_atoms in args.sizes:
+        for name in args.optimizers:
+            res = run_optimizer(name, committee, structures[n_atoms], args.fmax, args.steps, args.batch_size)
+            results["runs"].append({"params": {"optimizer": name, "n_atoms": n_atoms}, **res})
+            per = res["calls_per_converged"]
+            print(f"[bench] n_atoms={n_atoms:4d} {name:13s} converged {res['converged']}/{res['n_structures']}  "
+                  f"calls/converged={per if per is None else f'{per:.1f}'}  mean steps={res['mean_steps']:.1f}")
+            out_path.write_text(json.dumps(results, indent=2))
+    print(f"[bench] Results → {out_path}")
+
+
+if __name__ == "__main__":
+    main()
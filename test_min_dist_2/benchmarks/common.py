@@ -0,0 +1,45 @@
+# common.py
+# Helpers shared by the benchmark scripts.
+import os
+import platform
+import subprocess
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+CAMPAIGN_DIR = Path(__file__).resolve().parents[1]
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=CAMPAIGN_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine_meta(**extra):
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    meta.update(extra)
+    return meta
+
+
+def cpu_time():
+    """CPU seconds of this process plus finished children (mace_run_train, DFT task processes)."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+@contextmanager
+def timed(timings, name):
+    t0, c0 = time.perf_counter(), cpu_time()
+    try:
+        yield
+    finally:
+        timings[name] = {"wall_s": time.perf_counter() - t0, "cpu_s": cpu_time() - c0}
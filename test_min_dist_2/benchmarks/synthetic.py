@@ -0,0 +1,114 @@
+# synthetic.py
+# Synthetic Na clusters and fake-DFT labelled datasets for the benchmarks.
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from ase import Atoms
+from ase.cluster import Icosahedron
+from ase.io import write
+
+from scripts.fake_dft import FakeDFTCalculator
+
+NA_LATTICE = 4.23       # Å, bcc Na
+NA_DMIN = 3.0           # Å, minimum distance for random clusters
+# Mackay icosahedra: number of shells -> atoms
+MAGIC_SHELLS = {13: 2, 55: 3, 147: 4, 309: 5}
+
+
+def random_cluster(n_atoms: int, rng: np.random.Generator, dmin: float = NA_DMIN) -> Atoms:
+    """Random sequential placement in a sphere of roughly bulk density (x2 volume)."""
+    radius = (2 * n_atoms * 39.3 * 3 / (4 * np.pi)) ** (1 / 3)
+    pos = []
+    while len(pos) < n_atoms:
+        p = rng.uniform(-radius, radius, 3)
+        if np.linalg.norm(p) > radius:
+            continue
+        if pos and np.min(np.linalg.norm(np.asarray(pos) - p, axis=1)) < dmin:
+            continue
+        pos.append(p)
+    return Atoms(f"Na{n_atoms}", positions=pos)
+
+
+def make_cluster(n_atoms: int, rng: np.random.Generator, rattle: float = 0.1) -> Atoms:
+    if n_atoms in MAGIC_SHELLS:
+        atoms = Icosahedron("Na", noshells=MAGIC_SHELLS[n_atoms], latticeconstant=NA_LATTICE)
+        atoms.positions -= atoms.positions.mean(axis=0)
+    else:
+        atoms = random_cluster(n_atoms, rng)
+    atoms.positions += rng.normal(0, rattle, atoms.positions.shape)
+    atoms.cell = None
+    atoms.pbc = False
+    return atoms
+
+
+def labelled_dataset(n_atoms: int, n_frames: int, seed: int = 0, charge: int = 0,
+                     fake_cfg=None) -> List[Atoms]:
+    """Clusters labelled like DFT frames of the real datasets (REF_energy, REF_forces, charge)."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(n_frames):
+        a = make_cluster(n_atoms, rng, rattle=rng.uniform(0.05, 0.3))
+        a.calc = FakeDFTCalculator(fake_cfg, total_charge=charge)
+        a.info["REF_energy"] = float(a.get_potential_energy())
+        a.arrays["REF_forces"] = a.get_forces().copy()
+        a.info["charge"] = charge
+        a.calc = None
+        frames.append(a)
+    return frames
+
+
+def write_campaign_data(root: Path, n_atoms: int, n_train: int, n_test: int, seed: int = 0, charge: int = 0):
+    """data/iter000/dataset_iter000.xyz and data/test.xyz, as a campaign directory expects them."""
+    root = Path(root)
+    (root / "data" / "iter000").mkdir(parents=True, exist_ok=True)
+    write(str(root / "data" / "iter000" / "dataset_iter000.xyz"),
+          labelled_dataset(n_atoms, n_train, seed, charge), format="extxyz")
+    write(str(root / "data" / "test.xyz"),
+          labelled_dataset(n_atoms, n_test, seed + 1, charge), format="extxyz")
+
+
+def make_standin_models(out_dir: Path, n_models: int, r_max: float, num_channels: int = 128,
+                        max_L: int = 1, num_interactions: int = 2, correlation: int = 3,
+                        element: str = "Na", seed: int = 0) -> List[Path]:
+    """
+    Randomly initialised MACE models with the production architecture (see mace: in config.yaml).
+    Good enough for timing: inference cost does not depend on the weights.
+    """
+    import torch
+    from ase.data import atomic_numbers
+    from e3nn import o3
+    from mace import modules
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    hidden = f"{num_channels}x0e" + "".join(
+        f" + {num_channels}x{l}{'o' if l % 2 else 'e'}" for l in range(1, max_L + 1))
+    interaction = modules.interaction_classes["RealAgnosticResidualInteractionBlock"]
+    paths = []
+    for i in range(n_models):
+        path = out_dir / f"standin_rmax{r_max:g}_c{num_channels}_L{max_L}_{i:02d}.model"
+        if not path.exists():
+            torch.manual_seed(seed + i)
+            model = modules.ScaleShiftMACE(
+                r_max=r_max,
+                num_bessel=8,
+                num_polynomial_cutoff=5,
+                max_ell=3,
+                interaction_cls=interaction,
+                interaction_cls_first=interaction,
+                num_interactions=num_interactions,
+                num_elements=1,
+                hidden_irreps=o3.Irreps(hidden),
+                MLP_irreps=o3.Irreps("16x0e"),
+                gate=torch.nn.functional.silu,
+                atomic_energies=np.array([-1.0]),
+                avg_num_neighbors=8.0,
+                atomic_numbers=[atomic_numbers[element]],
+                correlation=correlation,
+                atomic_inter_scale=1.0,
+                atomic_inter_shift=0.0,
+            )
+            torch.save(model, path)
+        paths.append(path)
+    return paths
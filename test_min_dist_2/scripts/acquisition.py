@@ -0,0 +1,137 @@
+# acquisition.py
+# Batch selection of DFT candidates that trades committee uncertainty against diversity in
+# fingerprint space, so one batch does not spend n_dft calculations on copies of the same
+# structure. Structures closer than dedup_tol are first collapsed to the most uncertain copy.
+#
+#   top       the n most uncertain (previous behaviour)
+#   fps       greedy farthest-point: maximise uncertainty^w * distance to the selected set
+#   kmeans++  k-means++ seeding: sample with probability ∝ uncertainty^w * distance²
+#   dpp       greedy MAP of a determinantal point process with quality = uncertainty^w and
+#             similarity = exp(-d² / 2ℓ²), ℓ = median pairwise distance
+#
+# If an early DPP stop leaves fewer than n, the batch is topped up with the remaining
+# distinct candidates in uncertainty order. Collapsed duplicates are never added back, so
+# the batch is shorter than n when there are fewer distinct candidates (submit_dft's
+# is_enough/retry path in active_learning_loop.py handles short batches).
+from typing import Dict, List, Sequence
+
+import numpy as np
+from ase import Atoms
+
+from scripts.fingerprints import fingerprint_distance_matrix, fingerprint_matrix
+
+DEFAULT_ACQUISITION = {
+    "method": "top",
+    "uncertainty_key": "sigma_E_pa",
+    "uncertainty_weight": 1.0,
+    "dedup_tol": 0.015,     # same tolerance as the GA comparator's pair_cor_cum_diff
+    "seed": 0,
+}
+
+METHODS = ("top", "fps", "kmeans++", "dpp")
+
+
+def uncertainty(a: Atoms, key: str = "sigma_E_pa") -> float:
+    value = float(a.info.get("key_value_pairs", {}).get(key, np.nan))
+    return 0.0 if np.isnan(value) else value
+
+
+def _greedy_fps(q: np.ndarray, dist: np.ndarray, n: int) -> List[int]:
+    chosen = [int(np.argmax(q))]
+    min_dist = dist[chosen[0]].copy()
+    while len(chosen) < n:
+        score = q * min_dist
+        score[chosen] = -np.inf
+        nxt = int(np.argmax(score))
+        chosen.append(nxt)
+        min_dist = np.minimum(min_dist, dist[nxt])
+    return chosen
+
+
+def _kmeanspp(q: np.ndarray, dist: np.ndarray, n: int, rng: np.random.Generator) -> List[int]:
+    chosen = [int(np.argmax(q))]
+    min_dist = dist[chosen[0]].copy()
+    while len(chosen) < n:
+        p = q * min_dist**2
+        p[chosen] = 0.0
+        if p.sum() <= 0:
+            rest = [i for i in range(len(q)) if i not in chosen]
+            p = np.zeros(len(q))
+            p[rest] = 1.0
+        nxt = int(rng.choice(len(q), p=p / p.sum()))
+        chosen.append(nxt)
+        min_dist = np.minimum(min_dist, dist[nxt])
+    return chosen
+
+
+def _greedy_dpp(q: np.ndarray, dist: np.ndarray, n: int) -> List[int]:
+    """Fast greedy MAP inference (incremental Cholesky) for L = diag(q) S diag(q)."""
+    off_diag = dist[np.triu_indices(len(q), k=1)]
+    ell = np.median(off_diag[off_diag > 0]) if np.any(off_diag > 0) else 1.0
+    L = np.outer(q, q) * np.exp(-dist**2 / (2 * ell**2))
+    gains = np.diag(L).copy()
+    cis = np.zeros((n, len(q)))
+    chosen = [int(np.argmax(gains))]
+    while len(chosen) < n:
+        k = len(chosen) - 1
+        j = chosen[-1]
+        if gains[j] <= 1e-12:
+            break
+        e = (L[j] - cis[:k, j] @ cis[:k]) / np.sqrt(gains[j])
+        cis[k] = e
+        gains = gains - e**2
+        gains[chosen] = -np.inf
+        nxt = int(np.argmax(gains))
+        if gains[nxt] <= 1e-12:
+            break   # remaining candidates are (numerically) spanned by the selection
+        chosen.append(nxt)
+    return chosen
+
+
+def select_batch(candidates: Sequence[Atoms], n: int, method: str = "top", uncertainty_key: str = "sigma_E_pa",
+                 uncertainty_weight: float = 1.0, dedup_tol: float = 0.015, seed: int = 0) -> List[Atoms]:
+    """Pick up to n distinct candidates for DFT; returned in selection order."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown acquisition method '{method}' (expected one of {METHODS})")
+    candidates = list(candidates)
+    if n <= 0 or not candidates:
+        return []
+    sigma = np.array([uncertainty(a, uncertainty_key) for a in candidates])
+    if method == "top":
+        return [candidates[i] for i in np.argsort(-sigma, kind="stable")[:n]]
+
+    # collapse near-duplicates onto their most uncertain copy
+    order = np.argsort(-sigma, kind="stable")
+    fps = fingerprint_matrix([candidates[i] for i in order])
+    dist = fingerprint_distance_matrix(fps)
+    keep = []
+    for k in range(len(order)):
+        if not keep or dist[k, keep].min() > dedup_tol:
+            keep.append(k)
+    dist = dist[np.ix_(keep, keep)]
+    pool = [candidates[order[k]] for k in keep]
+    q = np.maximum(sigma[order][keep], 1e-12) ** uncertainty_weight
+    n_pool = min(n, len(pool))
+
+    if method == "fps":
+        chosen = _greedy_fps(q, dist, n_pool)
+    elif method == "kmeans++":
+        chosen = _kmeanspp(q, dist, n_pool, np.random.default_rng(seed))
+    else:
+        chosen = _greedy_dpp(q, dist, n_pool)
+    if len(candidates) > len(pool):
+        print(f"[Acquisition] {len(candidates) - len(pool)} near-duplicate candidates collapsed")
+
+    # top up from the unchosen distinct candidates only
+    if len(chosen) < n_pool:
+        taken = set(chosen)
+        rest = [i for i in range(len(pool)) if i not in taken]   # pool is in uncertainty order
+        print(f"[Acquisition] topping up {n_pool - len(chosen)} structures in uncertainty order")
+        chosen = list(chosen) + rest[:n_pool - len(chosen)]
+    if n_pool < n:
+        print(f"[Acquisition] only {n_pool} distinct candidates for {n} DFT slots")
+    return [pool[i] for i in chosen]
+
+
+def acquisition_cfg(cfg: dict) -> Dict:
+    return {**DEFAULT_ACQUISITION, **(cfg.get("ga", {}).get("acquisition") or {})}
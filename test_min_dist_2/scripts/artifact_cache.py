@@ -0,0 +1,98 @@
+# artifact_cache.py
+# Content-addressed store for stage outputs, shared between campaign directories
+# (first_trial, loop_2, ...). The key of a stage is the StageRunner key: a hash of only the
+# config keys and input files the stage consumes. Changing ga.offsprings therefore leaves
+# the bootstrap and training keys untouched, and their outputs are restored instead of
+# recomputed.
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def file_sha256(path, chunk=1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    """
+    One directory per stage execution:
+      <root>/<stage>/<key[:2]>/<key>/meta.json
+      <root>/<stage>/<key[:2]>/<key>/files/<output path relative to the campaign dir>
+    Output paths must be relative (they are restored relative to the current directory).
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    def _entry(self, stage: str, key: str) -> Path:
+        return self.root / stage / key[:2] / key
+
+    def restore(self, stage: str, key: str) -> Optional[Dict]:
+        """Copy the cached outputs into place and return the entry's meta, or None on a miss."""
+        entry = self._entry(stage, key)
+        meta_path = entry / "meta.json"
+        if not meta_path.exists():
+            self.misses += 1
+            return None
+        meta = json.loads(meta_path.read_text())
+        for rel, digest in meta["outputs"].items():
+            src = entry / "files" / rel
+            if not src.is_file() or file_sha256(src) != digest:
+                print(f"[Artifact-cache] {stage}: entry {key[:12]} is damaged, dropping it")
+                shutil.rmtree(entry, ignore_errors=True)
+                self.misses += 1
+                return None
+        for rel in meta["outputs"]:
+            Path(rel).parent.mkdir(parents=True, exist_ok=True)
+            # a copy, not a link: MACE rewrites model files in place
+            shutil.copy2(entry / "files" / rel, rel)
+        self.hits += 1
+        return meta
+
+    def put(self, stage: str, key: str, outputs: Dict[str, str], result=None) -> Optional[Path]:
+        """Store outputs ({relative path: sha256}) of a finished stage."""
+        if any(Path(p).is_absolute() for p in outputs):
+            return None
+        entry = self._entry(stage, key)
+        if (entry / "meta.json").exists():
+            return entry
+        tmp = entry.with_name(f"{entry.name}.tmp{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for rel in outputs:
+            dst = tmp / "files" / rel
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(rel, dst)
+        meta = {"stage": stage, "key": key, "outputs": outputs, "result": result,
+                "stored": time.strftime("%Y-%m-%dT%H:%M:%S"), "source": str(Path.cwd())}
+        (tmp / "meta.json").write_text(json.dumps(meta, indent=2))
+        try:
+            os.replace(tmp, entry)  # atomic; loses the race quietly if another campaign stored it first
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return entry
+        self.stored += 1
+        return entry
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
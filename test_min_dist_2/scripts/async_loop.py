@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# async_loop.py
+# Asynchronous active learning (active_learning.mode: async). Instead of
+# train → create_db → run_ga → submit_dft → merge in lock-step, three activities overlap:
+#
+#   exploration  a GA thread keeps running run_ga (or md_explore, explore: md) with the
+#                newest committee and offers its selection to a prioritised DFT queue (newest
+#                committee first, then highest sigma_E_pa; structures already queued or
+#                labelled are dropped)
+#   labelling    up to dft.n_workers DFTTask subprocesses; every finished label is appended
+#                to data/iterXXX/dft_relaxed.xyz right away
+#   training     once async.retrain_every new labels have arrived, merge_datasets builds the
+#                next dataset and a background thread bootstraps and trains the next committee;
+#                exploration switches to it as soon as it is ready
+#
+# The campaign ends after one exploration round with the final committee and the labelling
+# of its selection. Stall guard: after max_idle_rounds exploration rounds in a row that add
+# nothing new to the queue, with the queue drained and no training running, the labels so
+# far are merged and the next committee is trained; with no new labels at all, or after
+# max_failed DFT failures since the last merge, the loop stops with an error instead of
+# spinning. Timing spans are flushed to data/iterXXX per label generation. Labels
+# are merged on structure_hash, since GA confids restart at 1 in every generation's DB.
+#
+# "Generation" g below is the iteration index of the sync loop, so all paths (data/iterXXX,
+# runs/iterXXX, committee models) are the same as in active_learning_loop.py.
+import argparse
+import heapq
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+from ase import Atoms
+from ase.io import read, write
+
+from scripts.bootstrap import run_bootstrap
+from scripts.candidate_pool import mark_dft_labelled
+from scripts.create_db import create_db
+from scripts.dft_cache import DFTCache, dft_settings_from_cfg, structure_hash
+from scripts.dft_task import DFTTask
+from scripts.explore import explorer
+from scripts.merge import merge_datasets
+from scripts.stage_runner import StageRunner
+from scripts.tracing import TRACER, span, print_summary
+from scripts.train_mace import train_ensemble_for_iteration
+
+DEFAULT_ASYNC = {
+    "retrain_every": 20,        # new DFT labels that trigger training the next committee
+    "queue_size": 200,          # GA pauses while this many candidates wait for DFT
+    "poll_interval": 5.0,       # seconds between scheduler passes
+    "max_idle_rounds": 3,       # exploration rounds in a row without a new candidate: stalled
+    "max_failed": 100,          # DFT failures since the last merge before giving up
+    "status_file": "data/async_status.json",
+}
+
+
+def candidate_sigma(a: Atoms) -> float:
+    return float(a.info.get("key_value_pairs", {}).get("sigma_E_pa", 0.0))
+
+
+class AsyncActiveLearner:
+    def __init__(self, cfg: dict):
+        self.cfg = cfg
+        self.acfg = {**DEFAULT_ASYNC, **(cfg.get("async") or {})}
+        self.generations = int(cfg["active_learning"]["iterations"])
+        self.n_workers = int(cfg["dft"].get("n_workers", 10))
+
+        self.model_gen = 0              # committee used by the GA
+        self.explored_gen = -1          # committee of the last finished exploration round
+        self.label_gen = 0              # data/iterXXX that new labels are appended to
+        self.labels_since_merge = 0
+        self.failed_since_merge = 0
+        self.idle_rounds = 0            # exploration rounds in a row that offered nothing new
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._queue: List = []          # heap of (-generation, -sigma, seq, atoms)
+        self._seq = itertools.count()
+        self._task_index = itertools.count(1)
+        self._seen = set()              # structure hashes queued, running or labelled
+        self._errors: List[BaseException] = []
+
+        self.cache = None
+        if cfg["dft"].get("cache", True):
+            self.cache = DFTCache(cfg["dft"].get("cache_dir", "data/dft_cache"), dft_settings_from_cfg(cfg),
+                                  cfg["dft"].get("cache_failures", False))
+
+        self.stats = {"offered": 0, "duplicates": 0, "labelled": 0, "failed": 0, "cache_hits": 0,
+                      "dft_busy_s": 0.0, "trainings": 0}
+        self.t_start = time.time()
+
+    # ---- exploration ----
+    def offer(self, frames: List[Atoms], generation: int) -> int:
+        """Queue the frames not queued or labelled before; returns how many were new."""
+        new = 0
+        with self._lock:
+            for a in frames:
+                h = structure_hash(a)
+                self.stats["offered"] += 1
+                if h in self._seen:
+                    self.stats["duplicates"] += 1
+                    continue
+                self._seen.add(h)
+                heapq.heappush(self._queue, (-generation, -candidate_sigma(a), next(self._seq), a))
+                new += 1
+        return new
+
+    def _explore(self):
+        db_gen = None
+        while not self._stop.is_set():
+            with self._lock:
+                full = len(self._queue) >= self.acfg["queue_size"]
+            g = self.model_gen
+            if full or (g == db_gen and self.idle_rounds >= self.acfg["max_idle_rounds"]):
+                time.sleep(self.acfg["poll_interval"])   # the scheduler resolves a stall
+                continue
+            if g != db_gen:
+                with span("create_db", cat="async", generation=g):
+                    create_db(self.cfg, g)
+                db_gen, attempt = g, 0
+                self.idle_rounds = 0
+            # on this thread, which is the only one writing the candidate pool
+            mark_dft_labelled(self.cfg, range(self.label_gen + 1))
+            with span("run_ga", cat="async", generation=g, attempt=attempt):
+                explorer(self.cfg)(self.cfg, g, attempt=attempt)   # later rounds of g explore afresh
+            attempt += 1
+            selected = Path(self.cfg["data"]["iterdir_pattern"].format(iter=g)) / "selected_for_dft.extxyz"
+            new = self.offer(read(str(selected), ":"), g)
+            self.idle_rounds = 0 if new else self.idle_rounds + 1
+            self.explored_gen = g
+            if g + 1 >= self.generations:
+                return      # one round with the final committee
+
+    # ---- labelling ----
+    def _next_task(self) -> Optional[DFTTask]:
+        """Pop the best queued candidate; cache hits are recorded directly."""
+        while True:
+            with self._lock:
+                if not self._queue:
+                    return None
+                _, _, _, a = heapq.heappop(self._queue)
+            hit = self.cache.get(a) if self.cache else None
+            if hit is None:
+                iterdir = Path(self.cfg["data"]["iterdir_pattern"].format(iter=self.label_gen))
+                return DFTTask.from_cfg(self.cfg, next(self._task_index), a, iterdir)
+            self.stats["cache_hits"] += 1
+            self._add_label(*hit)
+
+    def _add_label(self, ok_flag: bool, frame: Atoms):
+        iterdir = Path(self.cfg["data"]["iterdir_pattern"].format(iter=self.label_gen))
+        iterdir.mkdir(parents=True, exist_ok=True)
+        # same files submit_dft writes, so merge_datasets can build the next dataset
+        out = iterdir / ("dft_relaxed.xyz" if ok_flag else "dft_failed.xyz")
+        write(str(out), frame, format="extxyz", append=True)
+        if ok_flag:
+            self.stats["labelled"] += 1
+            self.labels_since_merge += 1
+        else:
+            self.stats["failed"] += 1
+            self.failed_since_merge += 1
+
+    def _harvest(self, task: DFTTask, ok_flag: bool, frame: Atoms):
+        t = task.timing()
+        if t:
+            self.stats["dft_busy_s"] += t["wall_s"]
+            TRACER.record("dft.task", t["ts"], t["wall_s"], t["cpu_s"], cat="dft", pid=t["pid"], tid=t["pid"],
+                          host=t["host"], index=task.index, ok=ok_flag)
+        if self.cache and task.completed():
+            self.cache.put(task.atoms, ok_flag, frame)
+        self._add_label(ok_flag, frame)
+
+    # ---- training ----
+    def _train(self, generation: int):
+        runner = StageRunner(self.cfg, generation)
+        with span("train", cat="async", generation=generation):
+            manifest = run_bootstrap(self.cfg, iteration=generation)
+            train_ensemble_for_iteration(self.cfg, Path(manifest["outdir"]) / "manifest.json", runner=runner)
+        self.idle_rounds = 0
+        self.model_gen = generation     # the GA picks it up on its next round
+        self.stats["trainings"] += 1
+        print(f"[Async] committee generation {generation} is ready")
+
+    def _stalled(self, in_flight, trainer: Optional[threading.Thread]) -> bool:
+        """Exploration offers nothing new, nothing is queued or running, and no committee is training."""
+        if self.failed_since_merge >= self.acfg["max_failed"]:
+            self._stop.set()
+            raise RuntimeError(f"[Async] {self.failed_since_merge} DFT failures since the last merge "
+                               f"({self.labels_since_merge} labels); check dft_failed.xyz")
+        if in_flight or self.idle_rounds < self.acfg["max_idle_rounds"] or self.finished(in_flight):
+            return False
+        if trainer is not None and trainer.is_alive():
+            return False
+        with self._lock:
+            if self._queue:
+                return False
+        if not self.labels_since_merge or self.label_gen + 1 >= self.generations:
+            self._stop.set()
+            raise RuntimeError(f"[Async] stalled: {self.idle_rounds} exploration rounds with committee "
+                               f"{self.model_gen} found nothing new and there are no new labels to retrain on")
+        return True
+
+    def _maybe_retrain(self, trainer: Optional[threading.Thread], force: bool = False) -> Optional[threading.Thread]:
+        if trainer is not None and trainer.is_alive():
+            return trainer
+        if self.label_gen + 1 >= self.generations or self.labels_since_merge < self.acfg["retrain_every"]:
+            if not (force and self.labels_since_merge and self.label_gen + 1 < self.generations):
+                return trainer
+            print(f"[Async] exploration stalled, retraining on {self.labels_since_merge} new labels")
+        with span("merge", cat="async", generation=self.label_gen):
+            merge_datasets(self.label_gen, include_failed=False, dedup_key="structure")
+        print_summary(TRACER.finish_iteration())
+        self.label_gen += 1
+        TRACER.start_iteration(self.label_gen, self.cfg["data"]["iterdir_pattern"].format(iter=self.label_gen))
+        self.labels_since_merge = 0
+        self.failed_since_merge = 0
+        print(f"[Async] training generation {self.label_gen}")
+        trainer = self._thread(self._train, self.label_gen, name=f"train-{self.label_gen}")
+        return trainer
+
+    # ---- scheduler ----
+    def _thread(self, fn, *args, name):
+        def target():
+            try:
+                fn(*args)
+            except BaseException as e:  # surfaced by the scheduler loop
+                self._errors.append(e)
+                self._stop.set()
+        th = threading.Thread(target=target, name=name, daemon=True)
+        th.start()
+        return th
+
+    def write_status(self, in_flight: int):
+        elapsed = time.time() - self.t_start
+        status = {
+            **self.stats,
+            "model_generation": self.model_gen,
+            "label_generation": self.label_gen,
+            "queued": len(self._queue),
+            "in_flight": in_flight,
+            "elapsed_s": elapsed,
+            "dft_utilisation": self.stats["dft_busy_s"] / (self.n_workers * elapsed) if elapsed else 0.0,
+        }
+        path = Path(self.acfg["status_file"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(status, indent=2))
+        return status
+
+    def finished(self, in_flight) -> bool:
+        """The final committee has explored once and its selection is labelled."""
+        final = self.generations - 1
+        if self.model_gen < final or self.explored_gen < final or in_flight:
+            return False
+        with self._lock:
+            return not any(-gen >= final for gen, _, _, _ in self._queue)
+
+    def run(self) -> Dict:
+        explorer = self._thread(self._explore, name="ga")
+        trainer = None
+        in_flight = {}
+        with ThreadPoolExecutor(self.n_workers, thread_name_prefix="dft") as pool:
+            while not self._stop.is_set():
+                while len(in_flight) < self.n_workers:
+                    task = self._next_task()
+                    if task is None:
+                        break
+                    in_flight[pool.submit(task)] = task
+                trainer = self._maybe_retrain(trainer)
+                if self._stalled(in_flight, trainer):
+                    trainer = self._maybe_retrain(trainer, force=True)
+                if self.finished(in_flight):
+                    break
+                if in_flight:
+                    done, _ = wait(in_flight, timeout=self.acfg["poll_interval"], return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        self._harvest(in_flight.pop(fut), *fut.result())
+                else:
+                    time.sleep(self.acfg["poll_interval"])
+                status = self.write_status(len(in_flight))
+                print(f"[Async] gen {self.model_gen}/{self.label_gen}: queued={status['queued']} "
+                      f"running={len(in_flight)} labelled={self.stats['labelled']} "
+                      f"DFT utilisation={status['dft_utilisation']:.2f}")
+
+            self._stop.set()
+            for fut in list(in_flight):     # labels that are already paid for
+                self._harvest(in_flight.pop(fut), *fut.result())
+        explorer.join()
+        if trainer is not None:
+            trainer.join()
+        if self._errors:
+            raise self._errors[0]
+
+        if self.labels_since_merge:
+            merge_datasets(self.label_gen, include_failed=False, dedup_key="structure")
+        return self.write_status(0)
+
+
+def run_async_loop(cfg: dict) -> Dict:
+    TRACER.configure(cfg)
+    TRACER.start_iteration(0, cfg["data"]["iterdir_pattern"].format(iter=0))
+    status = AsyncActiveLearner(cfg).run()
+    print_summary(TRACER.finish_iteration())
+    print(f"[Async] done: {status['labelled']} labels, {status['trainings']} retrainings, "
+          f"DFT utilisation {status['dft_utilisation']:.2f}")
+    return status
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Asynchronous active-learning loop")
+    ap.add_argument("--config", "-c", required=True, help="Path to project config.yaml")
+    args = ap.parse_args()
+    cfg = yaml.safe_load(open(args.config))
+    run_async_loop(cfg)
+
+
+if __name__ == "__main__":
+    main()
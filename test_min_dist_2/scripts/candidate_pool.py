@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# candidate_pool.py
+# Persistent pool of every structure the GA relaxed, across iterations. Candidates that
+# were not sent to DFT stay available: after each retrain the pool is rescored with one
+# batched committee pass and offered to selection next to the fresh GA population.
+#
+# Stored as flat arrays in one compressed .npz (candidate_pool.path):
+#   numbers (n_atoms_total,) uint8   positions (n_atoms_total, 3) float32   offsets (N+1,)
+#   cell (N, 3, 3) float32   charge (N,)   iteration/confid (N,) provenance
+#   hash (N,) structure_hash prefix   energy/sigma_E_pa/sigma_F_mean (N,) last scores
+#   scored_with (N,) committee iteration of the scores   labelled (N,) labelled by DFT
+#
+# Entries are marked labelled after submit_dft, from the confids in dft_relaxed.xyz
+# (mark_dft_labelled), so structures whose DFT failed stay in the pool.
+import argparse
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+import yaml
+from ase import Atoms
+from ase.io import read
+
+from scripts.dft_cache import structure_hash
+from scripts.tracing import span
+
+DEFAULT_POOL = {
+    "enabled": False,
+    "path": "data/candidate_pool.npz",
+    "max_size": 5000,       # oldest labelled, then lowest-uncertainty entries are dropped beyond this
+    "batch_size": 64,       # structures per batched committee call when rescoring
+    "offer": 50,            # unlabelled pool entries (highest sigma_E_pa) offered to selection
+}
+
+_FIELDS = {
+    "cell": np.float32, "charge": np.int16, "iteration": np.int32, "confid": np.int64, "hash": "S16",
+    "energy": np.float64, "sigma_E_pa": np.float64, "sigma_F_mean": np.float64,
+    "scored_with": np.int32, "labelled": bool,
+}
+
+
+def pool_cfg(cfg: dict) -> Dict:
+    return {**DEFAULT_POOL, **(cfg.get("candidate_pool") or {})}
+
+
+class CandidatePool:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.numbers = np.zeros(0, np.uint8)
+        self.positions = np.zeros((0, 3), np.float32)
+        self.offsets = np.zeros(1, np.int64)
+        self.fields = {k: np.zeros((0, 3, 3) if k == "cell" else 0, dtype) for k, dtype in _FIELDS.items()}
+        if self.path.exists():
+            self.load()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    # ---- storage ----
+    def load(self):
+        with np.load(self.path) as z:
+            self.numbers, self.positions, self.offsets = z["numbers"], z["positions"], z["offsets"]
+            self.fields = {k: z[k] for k in _FIELDS}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.stem}.tmp{os.getpid()}.npz")
+        np.savez_compressed(tmp, numbers=self.numbers, positions=self.positions, offsets=self.offsets, **self.fields)
+        os.replace(tmp, self.path)
+
+    # ---- content ----
+    def atoms(self, i: int) -> Atoms:
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        f = self.fields
+        a = Atoms(numbers=self.numbers[lo:hi], positions=self.positions[lo:hi].astype(float),
+                  cell=f["cell"][i].astype(float), pbc=False)
+        a.info["confid"] = f"pool-{f['iteration'][i]:03d}-{f['confid'][i]}"   # unique across GA databases
+        a.info["charge"] = int(f["charge"][i])
+        a.info["pool_index"] = i
+        a.info["key_value_pairs"] = {"raw_score": -float(f["energy"][i]), "sigma_E_pa": float(f["sigma_E_pa"][i]),
+                                     "sigma_F_mean": float(f["sigma_F_mean"][i])}
+        return a
+
+    def add(self, frames: Sequence[Atoms], iteration: int, charge: int, scored_with: int = None) -> int:
+        """Add relaxed candidates of `iteration`'s GA, scored by `scored_with`'s committee; duplicates are skipped."""
+        known = set(self.fields["hash"].tolist())
+        new = []
+        for a in frames:
+            h = structure_hash(a)[:16].encode()
+            if h in known:
+                continue
+            known.add(h)
+            kv = a.info.get("key_value_pairs", {})
+            new.append((a, h, kv))
+        if not new:
+            return 0
+        self.numbers = np.concatenate([self.numbers] + [a.get_atomic_numbers().astype(np.uint8) for a, _, _ in new])
+        self.positions = np.concatenate([self.positions] + [a.get_positions().astype(np.float32) for a, _, _ in new])
+        sizes = np.array([len(a) for a, _, _ in new])
+        self.offsets = np.concatenate([self.offsets, self.offsets[-1] + np.cumsum(sizes)])
+        rows = {
+            "cell": [a.get_cell()[:] for a, _, _ in new],
+            "charge": [charge] * len(new),
+            "iteration": [iteration] * len(new),
+            "confid": [int(a.info.get("confid", -1)) for a, _, _ in new],
+            "hash": [h for _, h, _ in new],
+            "energy": [-float(kv.get("raw_score", np.nan)) for _, _, kv in new],
+            "sigma_E_pa": [float(kv.get("sigma_E_pa", np.nan)) for _, _, kv in new],
+            "sigma_F_mean": [float(kv.get("sigma_F_mean", np.nan)) for _, _, kv in new],
+            "scored_with": [iteration if scored_with is None else scored_with] * len(new),
+            "labelled": [False] * len(new),
+        }
+        for k, dtype in _FIELDS.items():
+            self.fields[k] = np.concatenate([self.fields[k], np.asarray(rows[k], dtype=dtype)])
+        return len(new)
+
+    def mark_labelled(self, frames: Sequence[Atoms]) -> int:
+        """
+        Mark the entries the (DFT-relaxed) frames came from: confid "pool-<it>-<confid>" for
+        pool offers, an integer confid plus info["ga_iteration"] for GA candidates. Relaxed
+        geometries differ from the stored ones, so the structure hash can't be used.
+        """
+        f = self.fields
+        before = int(f["labelled"].sum())
+        for a in frames:
+            confid = str(a.info.get("confid", ""))
+            if confid.startswith("pool-"):
+                _, it, c = confid.split("-", 2)
+            elif "ga_iteration" in a.info and confid.lstrip("-").isdigit():
+                it, c = a.info["ga_iteration"], confid
+            else:
+                continue    # harvested or MD frames are not pool entries
+            f["labelled"] |= (f["iteration"] == int(it)) & (f["confid"] == int(c))
+        return int(f["labelled"].sum()) - before
+
+    def rescore(self, committee, iteration: int, batch_size: int = 64) -> int:
+        """Rescore all unlabelled entries not yet scored by `iteration`'s committee."""
+        todo = np.flatnonzero(~self.fields["labelled"] & (self.fields["scored_with"] != iteration))
+        if len(todo) == 0:
+            return 0
+        with span("pool.rescore", cat="pool", n_structures=len(todo)):
+            for start in range(0, len(todo), batch_size):
+                idx = todo[start:start + batch_size]
+                results = committee.calculate_batch([self.atoms(i) for i in idx])
+                for i, res in zip(idx, results):
+                    self.fields["energy"][i] = res["energy"]
+                    self.fields["sigma_E_pa"][i] = res["sigma_E_pa"]
+                    self.fields["sigma_F_mean"][i] = res["sigma_F_mean"]
+                    self.fields["scored_with"][i] = iteration
+        return len(todo)
+
+    def offer(self, n: int, exclude: Sequence[Atoms] = ()) -> List[Atoms]:
+        """The n unlabelled entries with the highest sigma_E_pa, except structures in `exclude`."""
+        excluded = [structure_hash(a)[:16].encode() for a in exclude]
+        idx = np.flatnonzero(~self.fields["labelled"] & ~np.isin(self.fields["hash"], excluded))
+        idx = idx[np.argsort(-self.fields["sigma_E_pa"][idx])][:n]
+        return [self.atoms(i) for i in idx]
+
+    def prune(self, max_size: int):
+        if len(self) <= max_size:
+            return
+        f = self.fields
+        # keep unlabelled before labelled, then the most uncertain, then the most recent
+        order = np.lexsort((-f["iteration"], -np.nan_to_num(f["sigma_E_pa"], nan=-np.inf), f["labelled"]))
+        keep = np.sort(order[:max(max_size, 1)])
+        sizes = np.diff(self.offsets)
+        atom_idx = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in keep])
+        self.numbers, self.positions = self.numbers[atom_idx], self.positions[atom_idx]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes[keep])])
+        self.fields = {k: v[keep] for k, v in f.items()}
+
+    def summary(self) -> Dict:
+        f = self.fields
+        return {"size": len(self), "labelled": int(f["labelled"].sum()),
+                "iterations": sorted(set(f["iteration"].tolist())),
+                "size_mb": (self.path.stat().st_size / 2**20) if self.path.exists() else 0.0}
+
+
+def mark_dft_labelled(cfg: dict, iterations: Sequence[int]) -> int:
+    """Mark the pool entries behind data/iterXXX/dft_relaxed.xyz of `iterations` as labelled."""
+    pcfg = pool_cfg(cfg)
+    if not pcfg["enabled"] or not Path(pcfg["path"]).exists():
+        return 0
+    frames = []
+    for it in iterations:
+        path = Path(cfg["data"]["iterdir_pattern"].format(iter=it)) / "dft_relaxed.xyz"
+        if path.exists():
+            frames += read(str(path), ":")
+    pool = CandidatePool(pcfg["path"])
+    n = pool.mark_labelled(frames)
+    if n:
+        pool.save()
+        print(f"[Pool] {n} candidates labelled by DFT")
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect the persistent candidate pool")
+    ap.add_argument("--config", "-c", required=True, help="Path to project config.yaml")
+    args = ap.parse_args()
+    cfg = yaml.safe_load(open(args.config))
+    print(CandidatePool(pool_cfg(cfg)["path"]).summary())
+
+
+if __name__ == "__main__":
+    main()
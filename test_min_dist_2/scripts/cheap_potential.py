@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# cheap_potential.py
+# Analytic Gupta (second-moment tight-binding) potential fitted to the current training set,
+# for the first, cheap stage of the GA relaxation cascade (ga.cascade):
+#
+#   E = sum_i [ sum_j A exp(-p (r_ij/r0 - 1)) - sqrt( sum_j xi^2 exp(-2q (r_ij/r0 - 1)) ) ]
+#
+# Random start structures spend most of their steps leaving bad contacts; the fitted
+# potential gets them near a minimum and the committee only tightens. r0 is the median
+# nearest-neighbour distance of the data; A, xi, p, q are fitted to REF_forces and to
+# REF_energy with a constant offset per charge (the calculator energy has no offset, which
+# does not matter for relaxations). A training set of mostly relaxed structures has near-zero
+# forces, which any sufficiently weak potential reproduces, so the fit is anchored to the
+# literature parameters by a log-prior (prior_weight). Fits are cached next to the dataset,
+# keyed by its sha256.
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import yaml
+from ase import Atoms
+from ase.calculators.calculator import Calculator, all_changes
+from ase.io import read
+from ase.optimize import BFGS
+from scipy.optimize import least_squares
+from scipy.spatial.distance import pdist
+
+from scripts.artifact_cache import file_sha256
+
+DEFAULT_CASCADE = {
+    "enabled": False,
+    "potential": "gupta",
+    "apply_to": "initial",  # initial (create_db structures) | all (also offspring)
+    "fmax": 0.01,           # eV/Å of the fitted potential; the cheap stage may as well converge
+    "steps": 300,
+    "max_frames": 300,      # frames used for the fit (random subset)
+    "prior_weight": 0.1,    # pull of the fit towards GUPTA_START (per log-unit)
+}
+
+# Na, Li et al., Phys. Rev. B 57, 4814 (1998); only the starting point of the fit
+GUPTA_START = {"A": 0.01595, "xi": 0.29113, "p": 10.13, "q": 1.30}
+GUPTA_BOUNDS = {"A": (1e-4, 10.0), "xi": (1e-3, 10.0), "p": (3.0, 20.0), "q": (0.3, 5.0)}
+
+
+def cascade_cfg(cfg: dict) -> Dict:
+    return {**DEFAULT_CASCADE, **(cfg.get("ga", {}).get("cascade") or {})}
+
+
+def _gupta(positions: np.ndarray, A, xi, p, q, r0):
+    diff = positions[:, None, :] - positions[None, :, :]
+    r = np.linalg.norm(diff, axis=-1)
+    np.fill_diagonal(r, np.inf)
+    x = r / r0 - 1.0
+    rep = A * np.exp(-p * x)
+    band = xi**2 * np.exp(-2.0 * q * x)
+    rho = band.sum(axis=1)
+    sqrt_rho = np.sqrt(rho)
+    energy = rep.sum() - sqrt_rho.sum()
+    # dE/dr_ij for each ordered pair, both atoms' embedding terms included
+    dE_dr = -2.0 * p / r0 * rep + (q / r0) * band * (1.0 / sqrt_rho[:, None] + 1.0 / sqrt_rho[None, :])
+    forces = -(dE_dr / r)[:, :, None] * diff
+    return energy, forces.sum(axis=1)
+
+
+class GuptaCalculator(Calculator):
+    implemented_properties = ["energy", "forces"]
+
+    def __init__(self, A, xi, p, q, r0, **kwargs):
+        super().__init__(**kwargs)
+        self.params = {"A": A, "xi": xi, "p": p, "q": q, "r0": r0}
+        self.n_calls = 0
+
+    def calculate(self, atoms=None, properties=("energy", "forces"), system_changes=all_changes):
+        super().calculate(atoms, properties, system_changes)
+        self.n_calls += 1
+        energy, forces = _gupta(self.atoms.get_positions(), **self.params)
+        self.results["energy"] = float(energy)
+        self.results["forces"] = forces
+
+
+def fit_gupta(frames: Sequence[Atoms], prior_weight: float = 0.1) -> Dict:
+    """Fitted parameters plus per-charge offsets and the force RMSE (eV/Å)."""
+    r0 = float(np.median([pdist(a.get_positions()).min() for a in frames]))
+    charges = np.array([int(a.info.get("charge", 0)) for a in frames])
+    e_ref = np.array([a.info["REF_energy"] for a in frames])
+    f_ref = [a.arrays["REF_forces"] for a in frames]
+    n_atoms = np.array([len(a) for a in frames])
+    names = ["A", "xi", "p", "q"]
+    theta0 = np.array([GUPTA_START[k] for k in names])
+
+    def model(theta):
+        out = [_gupta(a.get_positions(), *theta, r0) for a in frames]
+        return np.array([e for e, _ in out]), [f for _, f in out]
+
+    def residuals(theta):
+        e, f = model(theta)
+        de = e_ref - e
+        for c in np.unique(charges):   # best constant offset per charge
+            de[charges == c] -= de[charges == c].mean()
+        res_f = np.concatenate([(fm - fr).ravel() for fm, fr in zip(f, f_ref)])
+        prior = prior_weight * np.log(np.asarray(theta) / theta0)
+        return np.concatenate([de / n_atoms, res_f, prior])
+
+    lo = [GUPTA_BOUNDS[k][0] for k in names]
+    hi = [GUPTA_BOUNDS[k][1] for k in names]
+    sol = least_squares(residuals, theta0, bounds=(lo, hi), x_scale="jac")
+    e, f = model(sol.x)
+    offsets = {int(c): float((e_ref - e)[charges == c].mean()) for c in np.unique(charges)}
+    rmse_f = float(np.sqrt(np.mean(np.concatenate([((fm - fr)**2).ravel() for fm, fr in zip(f, f_ref)]))))
+    return {**dict(zip(names, map(float, sol.x))), "r0": r0, "offsets": offsets, "force_rmse": rmse_f,
+            "n_frames": len(frames)}
+
+
+def cheap_calculator(cfg: dict, iteration: int) -> Optional[GuptaCalculator]:
+    """Gupta calculator fitted to iteration's dataset (cached), or None if there is no data."""
+    cc = cascade_cfg(cfg)
+    if cc["potential"] != "gupta":
+        raise ValueError(f"Unknown ga.cascade.potential '{cc['potential']}' (expected 'gupta')")
+    dataset = Path(cfg["data"]["dataset_pattern"].format(iter=iteration))
+    if not dataset.exists():
+        print(f"[Cascade] {dataset} not found; relaxing with the committee only")
+        return None
+    cache = dataset.with_name("gupta_fit.json")
+    digest = file_sha256(dataset)
+    params = None
+    if cache.exists():
+        saved = json.loads(cache.read_text())
+        if saved.get("dataset_sha256") == digest and saved.get("fit") == [cc["max_frames"], cc["prior_weight"]]:
+            params = saved["params"]
+    if params is None:
+        frames = read(str(dataset), ":")
+        n_atoms = cfg["initialization"]["n_atoms"]
+        frames = [a for a in frames if len(a) == n_atoms and "REF_forces" in a.arrays] or frames
+        if len(frames) > cc["max_frames"]:
+            rng = np.random.default_rng(0)
+            frames = [frames[i] for i in sorted(rng.choice(len(frames), cc["max_frames"], replace=False))]
+        params = fit_gupta(frames, cc["prior_weight"])
+        cache.write_text(json.dumps({"dataset_sha256": digest, "fit": [cc["max_frames"], cc["prior_weight"]], "params": params},
+                                    indent=2))
+        print(f"[Cascade] Gupta fit on {params['n_frames']} frames: force RMSE {params['force_rmse']:.3f} eV/Å")
+    return GuptaCalculator(**{k: params[k] for k in ("A", "xi", "p", "q", "r0")})
+
+
+def prerelax(atoms: Atoms, calc: Calculator, fmax: float, steps: int, blmin: Dict = None,
+             logfile=None) -> int:
+    """
+    Relax atoms in place with the cheap calculator; returns the number of steps. If the
+    result has a pair closer than half of blmin (the fit failing far from its data), the
+    original positions are restored.
+    """
+    start = atoms.get_positions()
+    saved_calc = atoms.calc
+    atoms.calc = calc
+    dyn = BFGS(atoms, logfile=logfile)
+    dyn.run(fmax, steps)
+    atoms.calc = saved_calc
+    if blmin is not None:
+        z = atoms.get_atomic_numbers()[0]
+        if len(atoms) > 1 and pdist(atoms.get_positions()).min() < 0.5 * blmin[(z, z)]:
+            atoms.set_positions(start)
+    return dyn.nsteps
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fit (or show the cached) Gupta potential for an iteration's dataset")
+    ap.add_argument("--config", "-c", required=True, help="Path to project config.yaml")
+    ap.add_argument("--iter", "-i", required=True, type=int)
+    args = ap.parse_args()
+    cfg = yaml.safe_load(open(args.config))
+    calc = cheap_calculator(cfg, args.iter)
+    print(calc.params if calc is not None else "no dataset")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,32 +4,49 @@ import numpy as np
 from ase.calculators.calculator import Calculator, all_changes
 from mace.calculators import MACECalculator
 from pathlib import Path
+from scripts.tracing import span
+
+
+def committee_model_paths(iteration: int):
+    pattern = str(Path("runs")/ f"iter{iteration:03d}" / "boot_*" / "checkpoints" / f"MACE_iter{iteration:03d}_boot*_run-123_stagetwo.model")
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise FileNotFoundError(f"No models found with pattern {pattern}")
+    return paths
 
 
 class CommitteeCalculator(Calculator):
     """
     Loads only files named like:
       checkpoints/MACE_iter{iteration:03d}_boot*_run-123.model
+    or an explicit list of model_paths (benchmarks, stand-in models).
     """
     implemented_properties= ["energy", "forces", "sigma_E_pa","sigma_F_mean"]
 
-    def __init__(self, iteration: int, use_forces=True, **kwargs):
+    def __init__(self, iteration: int = None, use_forces=True, model_paths=None, device="cpu",
+                 default_dtype=None, **kwargs):
         super().__init__(**kwargs)  #optional, it forwards optional ASE Calculator init args like label, directory
         #if you dont need these arguments, call with no kwargs
         # iteration directory relative to project root
         # look inside every boot_xxx/checkpoints/ for model files
-        pattern = str(Path("runs")/ f"iter{iteration:03d}" / "boot_*" / "checkpoints" / f"MACE_iter{iteration:03d}_boot*_run-123_stagetwo.model")
-        paths = sorted(glob.glob(pattern))
+        paths = list(model_paths) if model_paths is not None else committee_model_paths(iteration)
         #pattern=f"checkpoints/MACE_iter{iteration:03d}_boot*_run-123.model"
         #paths= sorted(glob.glob(pattern))
-        if not paths:
-            raise FileNotFoundError(f"No models found with pattern {pattern}")
-        self.members= [MACECalculator(model_path=p, device="cpu")for p in paths]
+        dtype_kw = {"default_dtype": default_dtype} if default_dtype else {}
+        self.members= [MACECalculator(model_path=p, device=device, **dtype_kw)for p in paths]
         self.use_forces= use_forces
+        # number of committee evaluations (one per structure, batched or not)
+        self.n_calls = 0
+        self._batch_supported = True
 
 
     def calculate(self, atoms=None, properties=("energy","forces"),system_changes=all_changes):
+        with span("committee.calculate", cat="committee", n_atoms=len(atoms)):
+            self._calculate(atoms, properties, system_changes)
+
+    def _calculate(self, atoms, properties, system_changes):
         super().calculate(atoms, properties, system_changes)
+        self.n_calls += 1
         Es, Fs= [], []
         for model in self.members:
             Es.append(model.get_potential_energy(atoms))
@@ -63,4 +80,94 @@ class CommitteeCalculator(Calculator):
         kv.update({
             "sigma_E_pa": float(sigma_E_pa),
             "sigma_F_mean": float(sigma_F_mean)
-        })
\ No newline at end of file
+        })
+
+    # ---- batched evaluation ----
+    def _member_batch(self, member, atoms_list):
+        """All structures in one MACE batch, built the way MACECalculator builds a single one."""
+        from mace import data as mace_data
+        from mace.tools import torch_geometric
+
+        arrays_keys = dict(member.arrays_keys)
+        arrays_keys[member.charges_key] = "charges"
+        keyspec = mace_data.KeySpecification(info_keys=member.info_keys, arrays_keys=arrays_keys)
+        dataset = [
+            mace_data.AtomicData.from_config(
+                mace_data.config_from_atoms(a, key_specification=keyspec, head_name=member.head),
+                z_table=member.z_table, cutoff=member.r_max, heads=member.available_heads,
+            )
+            for a in atoms_list
+        ]
+        loader = torch_geometric.dataloader.DataLoader(dataset=dataset, batch_size=len(dataset),
+                                                       shuffle=False, drop_last=False)
+        return next(iter(loader)).to(member.device)
+
+    def _predict_batch(self, atoms_list):
+        """Energies (n_members, n_structs) and per-structure force arrays (n_members, n_atoms, 3)."""
+        n_atoms = [len(a) for a in atoms_list]
+        splits = np.cumsum(n_atoms)[:-1]
+        E = np.zeros((len(self.members), len(atoms_list)))
+        F = [[None] * len(self.members) for _ in atoms_list]
+        batch, batch_key = None, None
+        for k, member in enumerate(self.members):
+            key = (float(member.r_max), tuple(member.z_table.zs))
+            if key != batch_key:    # members of one committee normally share the graph
+                batch, batch_key = self._member_batch(member, atoms_list), key
+            # a member with several models predicts their mean, as MACECalculator.calculate does
+            energies, forces = [], []
+            for model in member.models:
+                out = model(batch.clone().to_dict(), compute_stress=False, training=False)
+                energies.append(out["energy"].detach().cpu().numpy())
+                if self.use_forces:
+                    forces.append(out["forces"].detach().cpu().numpy())
+            E[k] = np.mean(energies, axis=0) * member.energy_units_to_eV
+            if self.use_forces:
+                mean_forces = np.mean(forces, axis=0) * member.energy_units_to_eV / member.length_units_to_A
+                for s, f in enumerate(np.split(mean_forces, splits)):
+                    F[s][k] = f
+        return E, F
+
+    def calculate_batch(self, atoms_list):
+        """
+        Committee energies, forces and uncertainties for many structures with one forward
+        pass per member. Results are written to atoms.info["key_value_pairs"] like calculate()
+        and returned as a list of dicts. Falls back to one structure at a time if this MACE
+        version can't build the batch.
+        """
+        atoms_list = list(atoms_list)
+        if not atoms_list:
+            return []
+        with span("committee.calculate_batch", cat="committee", n_structures=len(atoms_list)):
+            return self._calculate_batch(atoms_list)
+
+    def _calculate_batch(self, atoms_list):
+        self.n_calls += len(atoms_list)
+        if self._batch_supported:
+            try:
+                E, F = self._predict_batch(atoms_list)
+            except (AttributeError, TypeError) as e:
+                print(f"[Committee] Batched evaluation not available ({e}); evaluating one by one.")
+                self._batch_supported = False
+        if not self._batch_supported:
+            E = np.zeros((len(self.members), len(atoms_list)))
+            F = [[None] * len(self.members) for _ in atoms_list]
+            for s, a in enumerate(atoms_list):
+                for k, model in enumerate(self.members):
+                    E[k, s] = model.get_potential_energy(a)
+                    if self.use_forces:
+                        F[s][k] = model.get_forces(a)
+
+        results = []
+        for s, a in enumerate(atoms_list):
+            res = {"energy": float(E[:, s].mean()), "sigma_E_pa": float(E[:, s].std() / len(a))}
+            if self.use_forces:
+                F_arr = np.stack(F[s], axis=0)
+                res["forces"] = F_arr.mean(axis=0)
+                res["sigma_F_mean"] = float(F_arr.std(axis=0).mean())
+            else:
+                res["forces"] = None
+                res["sigma_F_mean"] = 0
+            kv = a.info.setdefault("key_value_pairs", {})
+            kv.update({"sigma_E_pa": res["sigma_E_pa"], "sigma_F_mean": res["sigma_F_mean"]})
+            results.append(res)
+        return results
@@ -1,26 +1,45 @@
-from ase.data import atomic_numbers 
+from ase.data import atomic_numbers, covalent_radii
 from ase import Atoms
 from ase.db import connect
 from ase.ga.startgenerator import StartGenerator
 from ase.ga.utilities import closest_distances_generator
-from ase.ga.data import PrepareDB
+from ase.ga.data import DataConnection, PrepareDB
 import numpy as np
 import argparse, yaml
 from pathlib import Path
+from scripts.ga_db import ga_db_cfg, set_journal_mode
 
-def create_db(cfg:dict,iteration):
+def ga_db_name(cfg: dict, iteration) -> str:
+    n_atoms=cfg["initialization"]["n_atoms"]
+    charge=cfg["initialization"]["charge"]
+    element=cfg["initialization"]["element"]
+    return f"data/iter{iteration:03d}/iter{iteration:03d}_{element}{n_atoms}_q{charge}.db"
+
+
+def create_db(cfg:dict,iteration, seeds=None, db_name=None):
+    """
+    Initial GA population. seeds (optional list of Atoms) come first: seeds that carry a
+    calculator and key_value_pairs["raw_score"] are stored as already relaxed candidates,
+    the others as unrelaxed ones that run_ga relaxes. Random structures fill up the rest
+    of initialization.n_to_generate.
+    """
     #Parameters
     n_atoms=cfg["initialization"]["n_atoms"]
     charge=cfg["initialization"]["charge"]
     n_to_generate=cfg["initialization"]["n_to_generate"]
     element=cfg["initialization"]["element"]
-    db_name = f"data/iter{iteration:03d}/iter{iteration:03d}_{element}{n_atoms}_q{charge}.db"
+    db_name = db_name or ga_db_name(cfg, iteration)
+    seeds = list(seeds or [])[:n_to_generate]
 
     Z=atomic_numbers[element]
 
     # Compute bounding cube side length
     #side = 2 * (0.5 + ((3 * n_atoms) / (4 * np.pi * np.sqrt(2))) ** (1/3))
-    side=7
+    side=cfg["initialization"].get("box_side", 7)
+    if side == "auto":
+        # spheres of the covalent radius filling ~20% of the box, loose enough for random placement
+        r_cov = covalent_radii[atomic_numbers[element]]
+        side = float((n_atoms * 4 / 3 * np.pi * r_cov**3 / 0.2) ** (1/3))
 
     # 1. Define a fake slab (empty unit cell with no atoms)
     # This is the simulation box
@@ -47,6 +66,7 @@ def create_db(cfg:dict,iteration):
             [0, 0, side]]]
 
     db_path = Path(db_name)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
     if db_path.exists():
         db_path.unlink()
 
@@ -61,17 +81,44 @@ def create_db(cfg:dict,iteration):
         box_to_place_in=box,
     )
 
-    # 7. Generate and write the clusters
-    for _ in range(n_to_generate):
+    # 7. Seeds from earlier exploration
+    relaxed_seeds, unrelaxed = [], []
+    for a in seeds:
+        a.info["charge"] = charge
+        if a.calc is not None and "raw_score" in a.info.get("key_value_pairs", {}):
+            relaxed_seeds.append(a)
+        else:
+            a = a.copy()
+            a.set_cell(slab.get_cell())
+            a.set_pbc(False)
+            a.center()  # into this iteration's box, the seed may come from an earlier one
+            unrelaxed.append(a)
+    if seeds:
+        print(f"Seeded {len(seeds)} structures ({len(relaxed_seeds)} already relaxed).")
+
+    # 8. Generate the clusters
+    for _ in range(n_to_generate - len(seeds)):
         print("Starting to create structure ", _)
         atoms = sg.get_new_candidate()
         print("Start generator for structure ", _ , "is completed.")
         atoms.charge = charge
         atoms.info["charge"] = charge
         atoms.set_initial_charges([charge / n_atoms] * n_atoms)
-        d.add_unrelaxed_candidate(atoms)
+        unrelaxed.append(atoms)
         #print("Structure ", _ , " is sucessfully created.")
 
+    # 9. Write everything in one transaction per connection
+    set_journal_mode(db_name, ga_db_cfg(cfg)["journal_mode"])
+    with d.c:
+        for atoms in unrelaxed:
+            d.add_unrelaxed_candidate(atoms)
+    if relaxed_seeds:
+        db = DataConnection(db_name)
+        with db.c:
+            for a in relaxed_seeds:
+                a.info.setdefault("data", {})
+                db.add_relaxed_candidate(a)
+
     return db_name
 
 def main():
@@ -0,0 +1,157 @@
+# dft_cache.py
+# Persistent cache of DFT labels, keyed by a canonical structure hash + DFT settings.
+# GA retries on the same DB often re-select the same confids, so submit_dft looks
+# structures up here before relabelling them from scratch.
+import copy
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+from ase import Atoms
+from ase.io import read, write
+
+
+# info flag of structures to be labelled by a DFT single point instead of a relaxation:
+# intermediate relaxation frames and MD snapshots would relax back into a minimum
+SINGLE_POINT = "dft_single_point"
+
+
+def is_single_point(atoms: Atoms) -> bool:
+    return bool(atoms.info.get(SINGLE_POINT, False))
+
+
+# info entries of a cached frame that are DFT results; everything else in a hit's info
+# (confid, ga_iteration, harvest flags, traj_file, ...) comes from the current request
+RESULT_INFO = ("REF_energy", "charge")
+
+
+def structure_hash(atoms: Atoms, decimals: int = 4) -> str:
+    """Hash that does not depend on atom order or on a rigid translation of the cluster."""
+    numbers = atoms.get_atomic_numbers()
+    pos = atoms.get_positions()
+    pos = np.round(pos - pos.mean(axis=0), decimals) + 0.0   # + 0.0 turns -0.0 into 0.0
+    order = np.lexsort((pos[:, 2], pos[:, 1], pos[:, 0], numbers))
+
+    h = hashlib.sha256()
+    h.update(numbers[order].astype(np.int64).tobytes())
+    h.update(pos[order].astype(np.float64).tobytes())
+    return h.hexdigest()
+
+
+def settings_hash(settings: Dict) -> str:
+    blob = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def dft_settings_from_cfg(cfg: dict) -> Dict:
+    """Everything that changes the DFT label of a given input structure."""
+    dft = cfg["dft"]
+    settings = {
+        "total_charge": dft["total_charge"],
+        "multiplicity": dft["multiplicity"],
+        "basis_set": dft["basis_set"],
+        "density_func": dft["density_func"],
+        "scf_iter": dft["scf_iter"],
+        "fmax": dft["fmax"],
+        "opt_steps": dft["opt_steps"],
+    }
+    backend = dft.get("backend", "turbomole")
+    if backend != "turbomole":
+        # keep stand-in labels apart from real ones
+        settings["backend"] = backend
+        settings["fake"] = dft.get("fake") or {}
+    return settings
+
+
+class DFTCache:
+    """
+    One extxyz file per cached label:
+      <cache_dir>/<structure_hash[:2]>/<structure_hash>_<settings_hash[:16]>.extxyz
+    Single-point labels (info[SINGLE_POINT]) hash the settings with single_point=True, so
+    they never stand in for a relaxation of the same input structure or vice versa.
+    Only successful labels are cached by default: SCF and define failures are often
+    transient, and a cached failure would be replayed on every retry. With
+    cache_failures=True failed relaxations are stored too (info["dft_ok"] = False).
+    """
+
+    def __init__(self, cache_dir, settings: Dict, cache_failures: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.settings = settings
+        self.settings_key = settings_hash(settings)[:16]
+        self.single_point_key = settings_hash({**settings, "single_point": True})[:16]
+        self.cache_failures = cache_failures
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    def _path(self, atoms: Atoms) -> Path:
+        s = structure_hash(atoms)
+        key = self.single_point_key if is_single_point(atoms) else self.settings_key
+        return self.cache_dir / s[:2] / f"{s}_{key}.extxyz"
+
+    def get(self, atoms: Atoms) -> Optional[tuple]:
+        """Return (ok_flag, labelled atoms) or None on a miss."""
+        path = self._path(atoms)
+        if not path.exists():
+            self.misses += 1
+            return None
+        cached = read(str(path), format="extxyz")
+        ok_flag = bool(cached.info.pop("dft_ok", True))
+        if not ok_flag and not self.cache_failures:
+            self.misses += 1    # failure stored by a run with cache_failures on: try again
+            return None
+        self.hits += 1
+        # serve it under the provenance of the current request: the pool and merge match
+        # labels on confid and ga_iteration
+        info = copy.deepcopy(atoms.info)
+        info.update({k: cached.info[k] for k in RESULT_INFO if k in cached.info})
+        kvp = info.setdefault("key_value_pairs", {})
+        if "raw_score" in cached.info.get("key_value_pairs", {}):
+            kvp["raw_score"] = cached.info["key_value_pairs"]["raw_score"]
+        info.setdefault("confid", "N/A")
+        info["cache_hit"] = True
+        cached.info = info
+        return ok_flag, cached
+
+    def put(self, atoms: Atoms, ok_flag: bool, result: Atoms) -> Optional[Path]:
+        """Store the label for input structure `atoms` (the structure before DFT relaxation)."""
+        if not ok_flag and not self.cache_failures:
+            return None
+        path = self._path(atoms)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        frame = result.copy()
+        frame.calc = result.calc
+        frame.info["dft_ok"] = bool(ok_flag)
+        tmp = path.with_suffix(f".tmp{os.getpid()}")
+        write(str(tmp), frame, format="extxyz")
+        os.replace(tmp, path)   # atomic, so readers never see half-written entries
+        self.stored += 1
+        return path
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def record_cache_stats(iterdir: Path, stats: Dict) -> Dict:
+    """Append stats of one submit_dft call to data/iterXXX/dft_cache_stats.json and return the iteration totals."""
+    path = Path(iterdir) / "dft_cache_stats.json"
+    calls = json.loads(path.read_text()) if path.exists() else {"calls": []}
+    calls["calls"].append(stats)
+    hits = sum(c["hits"] for c in calls["calls"])
+    misses = sum(c["misses"] for c in calls["calls"])
+    calls["total"] = {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+    }
+    path.write_text(json.dumps(calls, indent=2), encoding="utf-8")
+    return calls["total"]
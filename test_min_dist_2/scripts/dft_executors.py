@@ -0,0 +1,231 @@
+# dft_executors.py
+# Backends that run a list of DFTTask objects. All of them use the same file-based
+# completion protocol: a task is finished once status.json appears in its working
+# directory (written atomically by scripts/dft_task.py after dft_result.extxyz).
+#
+#   local        thread pool driving one subprocess per task, inside the current allocation
+#   asyncio      asyncio subprocess runner, same resources as local
+#   slurm        one `sbatch --array` job, one array element per task, can span many nodes
+#   fake_sbatch  runs the generated array script locally with SLURM_ARRAY_TASK_ID set,
+#                for testing the slurm path without a scheduler
+import os
+import shlex
+import subprocess
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ase import Atoms
+
+from scripts.dft_task import PROJECT_ROOT, DFTTask, run_tasks_asyncio
+
+
+def wait_for_tasks(tasks: List[DFTTask], poll_interval=30.0, is_alive=None, timeout=None) -> None:
+    """
+    Block until every task has written status.json, the job disappeared (is_alive() is False)
+    or the timeout ran out. Only stats a few small files per poll, so waiting is cheap.
+    """
+    start = time.time()
+    pending = [t for t in tasks if not t.completed()]
+    while pending:
+        if is_alive is not None and not is_alive():
+            # one last look: the job may have finished between the two checks
+            pending = [t for t in pending if not t.completed()]
+            if pending:
+                print(f"[DFT] Job ended with {len(pending)} task(s) not reporting a result.")
+            return
+        if timeout is not None and time.time() - start > timeout:
+            print(f"[DFT] Timed out waiting for {len(pending)} task(s).")
+            return
+        time.sleep(poll_interval)
+        n_before = len(pending)
+        pending = [t for t in pending if not t.completed()]
+        if len(pending) != n_before:
+            print(f"[DFT] {len(tasks) - len(pending)}/{len(tasks)} tasks finished")
+
+
+class DFTExecutor:
+    name = "base"
+
+    def __init__(self, dft_cfg: Dict, iterdir: Path):
+        self.dft_cfg = dft_cfg
+        self.iterdir = Path(iterdir)
+        self.n_workers = int(dft_cfg.get("n_workers", 10))
+        self.poll_interval = float(dft_cfg.get("poll_interval", 30))
+        self.timeout = dft_cfg.get("timeout")
+
+    def run(self, tasks: List[DFTTask]) -> List[Tuple[bool, Atoms]]:
+        if not tasks:
+            return []
+        return self._run(tasks)
+
+    def _run(self, tasks):
+        raise NotImplementedError
+
+
+class LocalExecutor(DFTExecutor):
+    name = "local"
+
+    def _run(self, tasks):
+        with ThreadPool(min(self.n_workers, len(tasks))) as p:
+            return p.map(lambda task: task(), tasks)
+
+
+class AsyncioExecutor(DFTExecutor):
+    name = "asyncio"
+
+    def _run(self, tasks):
+        return run_tasks_asyncio(tasks, self.n_workers)
+
+
+class SlurmArrayExecutor(DFTExecutor):
+    """Submits all tasks as one job array and polls the task directories for status.json."""
+    name = "slurm"
+    default_python = "python"   # resolved on the compute node after the setup lines
+    use_setup = True
+
+    def __init__(self, dft_cfg, iterdir):
+        super().__init__(dft_cfg, iterdir)
+        self.slurm_cfg = dft_cfg.get("slurm", {}) or {}
+
+    def write_array_script(self, tasks: List[DFTTask]) -> Path:
+        task_list = self.iterdir / "dft_tasks.txt"
+        task_list.write_text("".join(f"{t.workdir}\n" for t in tasks), encoding="utf-8")
+
+        s = self.slurm_cfg
+        log_dir = (self.iterdir / "slurm_dft").resolve()
+        log_dir.mkdir(parents=True, exist_ok=True)
+        lines = [
+            "#!/bin/bash",
+            f"#SBATCH --job-name={s.get('job_name', 'dft_' + self.iterdir.name)}",
+            f"#SBATCH --array=1-{len(tasks)}%{self.n_workers}",
+            "#SBATCH --ntasks=1",
+            f"#SBATCH --cpus-per-task={s.get('cpus_per_task', 1)}",
+            f"#SBATCH --time={s.get('time', '04:00:00')}",
+            f"#SBATCH --output={log_dir}/%A_%a.out",
+        ]
+        if s.get("partition"):
+            lines.append(f"#SBATCH --partition={s['partition']}")
+        if s.get("mem"):
+            lines.append(f"#SBATCH --mem={s['mem']}")
+        lines += [f"#SBATCH {opt}" for opt in s.get("extra_options", [])]
+        lines += [""] + (list(s.get("setup", [])) if self.use_setup else []) + [
+            "",
+            f'WORKDIR=$(sed -n "${{SLURM_ARRAY_TASK_ID}}p" {shlex.quote(str(task_list.resolve()))})',
+            'cd "$WORKDIR"',
+            f"export PYTHONPATH={shlex.quote(str(PROJECT_ROOT))}${{PYTHONPATH:+:$PYTHONPATH}}",
+            f'{s.get("python", self.default_python)} -m scripts.dft_task "$WORKDIR"',
+            "",
+        ]
+        script = self.iterdir / "dft_array.sh"
+        script.write_text("\n".join(lines), encoding="utf-8")
+        return script
+
+    def submit(self, script: Path) -> str:
+        out = subprocess.run([self.slurm_cfg.get("sbatch", "sbatch"), "--parsable", str(script)],
+                             check=True, capture_output=True, text=True)
+        job_id = out.stdout.strip().split(";")[0]
+        print(f"[DFT] Submitted job array {job_id} ({script})")
+        return job_id
+
+    # sacct states of array elements that may still write a result
+    ACTIVE_STATES = ("PENDING", "RUNNING", "REQUEUED", "RESIZING", "SUSPENDED", "CONFIGURING", "COMPLETING")
+
+    def _squeue(self, job_id: str) -> Optional[bool]:
+        """True/False if squeue says the job is queued/gone, None if squeue itself failed."""
+        out = subprocess.run([self.slurm_cfg.get("squeue", "squeue"), "-h", "-j", job_id],
+                             capture_output=True, text=True)
+        if out.returncode == 0:
+            return bool(out.stdout.strip())
+        if "invalid job id" in (out.stderr + out.stdout).lower():
+            return False    # squeue errors out once the job is gone from the queue
+        print(f"[DFT] squeue failed (exit {out.returncode}): {out.stderr.strip()}")
+        return None
+
+    def _sacct_active(self, job_id: str) -> Optional[bool]:
+        """True if any array element is still active per sacct, None if accounting is unavailable."""
+        out = subprocess.run([self.slurm_cfg.get("sacct", "sacct"), "-n", "-X", "-P", "-o", "State", "-j", job_id],
+                             capture_output=True, text=True)
+        states = [line.split()[0] for line in out.stdout.splitlines() if line.strip()]
+        if out.returncode != 0 or not states:
+            return None
+        return any(state in self.ACTIVE_STATES for state in states)
+
+    def job_alive(self, job_id: str) -> bool:
+        """
+        A failing squeue (slurmctld busy or restarting) is retried; if it keeps failing the
+        job counts as alive and dft.timeout is the backstop. A job squeue no longer lists is
+        only reported gone once sacct (where available) agrees.
+        """
+        retries = int(self.slurm_cfg.get("squeue_retries", 3))
+        for attempt in range(retries + 1):
+            queued = self._squeue(job_id)
+            if queued is not None:
+                break
+            if attempt < retries:
+                time.sleep(min(self.poll_interval, 2.0**attempt * 5))
+        if queued is None:
+            return True
+        if queued:
+            return True
+        return bool(self._sacct_active(job_id))
+
+    def _run(self, tasks):
+        for t in tasks:
+            t.prepare()
+        job_id = self.submit(self.write_array_script(tasks))
+        wait_for_tasks(tasks, self.poll_interval, lambda: self.job_alive(job_id), self.timeout)
+        return [t.load_result() for t in tasks]
+
+
+class FakeSbatchExecutor(SlurmArrayExecutor):
+    """
+    Stand-in for `sbatch --array`: runs the generated array script locally, at most
+    n_workers array elements at a time, with the SLURM_ARRAY_* variables set.
+    Everything else (script, task list, completion protocol) is the slurm path.
+    """
+    name = "fake_sbatch"
+    default_python = sys.executable
+    use_setup = False   # module load / conda activate lines are cluster specific
+
+    def _run(self, tasks):
+        for t in tasks:
+            t.prepare()
+        script = self.write_array_script(tasks)
+        job_id = f"fake{os.getpid()}"
+        log_dir = self.iterdir / "slurm_dft"
+        queue = list(range(1, len(tasks) + 1))
+        running: List[subprocess.Popen] = []
+
+        def alive():
+            # keep the "scheduler" going between polls
+            nonlocal running
+            running = [p for p in running if p.poll() is None]
+            while queue and len(running) < self.n_workers:
+                idx = queue.pop(0)
+                env = dict(os.environ, SLURM_ARRAY_JOB_ID=job_id, SLURM_ARRAY_TASK_ID=str(idx),
+                           SLURM_JOB_ID=f"{job_id}_{idx}")
+                log = open(log_dir / f"{job_id}_{idx}.out", "w")
+                running.append(subprocess.Popen(["bash", str(script)], env=env, stdout=log,
+                                                stderr=subprocess.STDOUT))
+                log.close()
+            return bool(running or queue)
+
+        print(f"[DFT] fake_sbatch: running {script} locally as job {job_id}")
+        alive()
+        wait_for_tasks(tasks, min(self.poll_interval, 1.0), alive, self.timeout)
+        return [t.load_result() for t in tasks]
+
+
+EXECUTORS = {cls.name: cls for cls in (LocalExecutor, AsyncioExecutor, SlurmArrayExecutor, FakeSbatchExecutor)}
+
+
+def get_executor(dft_cfg: Dict, iterdir: Path) -> DFTExecutor:
+    if "runner" in dft_cfg:
+        raise ValueError("dft.runner was replaced by dft.executor (threads -> local, asyncio -> asyncio)")
+    backend = dft_cfg.get("executor", "local")
+    if backend not in EXECUTORS:
+        raise ValueError(f"Unknown dft.executor '{backend}' (choose from {sorted(EXECUTORS)})")
+    return EXECUTORS[backend](dft_cfg, iterdir)
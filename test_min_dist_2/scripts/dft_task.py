@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# dft_task.py
+# Self-contained DFT relaxation task. Everything the job needs (structure, Turbomole
+# parameters, convergence settings, working directory) lives on the task object, so it
+# pickles cleanly and can be driven from threads, process pools (fork or spawn) or asyncio.
+# Structures flagged with info[SINGLE_POINT] (harvested relaxation frames, MD snapshots)
+# get a single point instead of a relaxation.
+#
+# ASE's Turbomole calculator only works in the current working directory, so the task
+# runs in its own Python subprocess started with cwd=workdir. The controller never chdirs.
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ase import Atoms
+from ase.calculators.singlepoint import SinglePointCalculator
+from ase.calculators.turbomole import Turbomole
+from ase.io import read, write
+from ase.optimize import BFGS
+
+from scripts.dft_cache import is_single_point, structure_hash
+from scripts.fake_dft import FakeDFTCalculator
+from scripts.scratch import TurbomoleScratch
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+TASK_FILE = "task.pkl"
+RESULT_FILE = "dft_result.extxyz"
+STATUS_FILE = "status.json"
+
+
+def tm_params_from_cfg(cfg: dict) -> Dict:
+    return {
+        "total charge": cfg["dft"]["total_charge"],
+        "multiplicity": cfg["dft"]["multiplicity"],
+        "scf iterations": cfg["dft"]["scf_iter"],
+        "basis set name": cfg["dft"]["basis_set"],
+        "density functional": cfg["dft"]["density_func"],
+    }
+
+
+@dataclass
+class DFTTask:
+    index: int
+    atoms: Atoms
+    workdir: Path                      # data/iterXXX/atoms_XXX, stored absolute
+    tm_params: Dict
+    fmax: float
+    steps: int
+    charge: int
+    scratch: Optional[Dict] = None
+    backend: str = "turbomole"         # turbomole | fake
+    fake: Optional[Dict] = None        # FakeDFTCalculator settings for backend "fake"
+    single_point: bool = False         # label the structure as it is, no relaxation
+
+    @classmethod
+    def from_cfg(cls, cfg: dict, index: int, atoms: Atoms, iterdir: Path) -> "DFTTask":
+        return cls(
+            index=index,
+            atoms=atoms,
+            workdir=(Path(iterdir) / f"atoms_{index:03d}").resolve(),
+            tm_params=tm_params_from_cfg(cfg),
+            fmax=cfg["dft"]["fmax"],
+            steps=cfg["dft"]["opt_steps"],
+            charge=cfg["initialization"]["charge"],
+            scratch=cfg["dft"].get("scratch"),
+            backend=cfg["dft"].get("backend", "turbomole"),
+            fake=cfg["dft"].get("fake"),
+            single_point=is_single_point(atoms),
+        )
+
+    # ---- controller side ----
+    def prepare(self) -> Path:
+        """Write the pickled task into its working directory and clear old results."""
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        for name in (RESULT_FILE, STATUS_FILE):
+            (self.workdir / name).unlink(missing_ok=True)
+        with open(self.workdir / TASK_FILE, "wb") as f:
+            pickle.dump(self, f)
+        return self.workdir / TASK_FILE
+
+    def command(self) -> List[str]:
+        return [sys.executable, "-m", "scripts.dft_task", str(self.workdir)]
+
+    def env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in [str(PROJECT_ROOT), env.get("PYTHONPATH", "")] if p)
+        return env
+
+    def __call__(self) -> Tuple[bool, Atoms]:
+        """Blocking run in a subprocess. Safe to call from threads and pool workers."""
+        self.prepare()
+        subprocess.run(self.command(), cwd=self.workdir, env=self.env(), check=False)
+        return self.load_result()
+
+    async def run_async(self) -> Tuple[bool, Atoms]:
+        self.prepare()
+        proc = await asyncio.create_subprocess_exec(*self.command(), cwd=self.workdir, env=self.env())
+        await proc.wait()
+        return self.load_result()
+
+    def completed(self) -> bool:
+        """True once the task process wrote its result (converged or SCF failure)."""
+        return (self.workdir / STATUS_FILE).exists()
+
+    def settings(self) -> Dict:
+        """Everything besides the structure that determines the result."""
+        return {"tm_params": self.tm_params, "fmax": self.fmax, "steps": self.steps, "charge": self.charge,
+                "backend": self.backend, "fake": self.fake, "single_point": self.single_point}
+
+    def matches_previous(self) -> bool:
+        """True if workdir holds a finished result for this structure with the same settings."""
+        task_path = self.workdir / TASK_FILE
+        if not (self.completed() and (self.workdir / RESULT_FILE).exists() and task_path.exists()):
+            return False
+        try:
+            prev = load_task(self.workdir)
+        except Exception:   # unreadable or from an older code version
+            return False
+        return prev.settings() == self.settings() and structure_hash(prev.atoms) == structure_hash(self.atoms)
+
+    def timing(self) -> Dict:
+        """Start time, wall and CPU seconds, host and pid reported by the task process."""
+        status_path = self.workdir / STATUS_FILE
+        if not status_path.exists():
+            return {}
+        return json.loads(status_path.read_text()).get("timing", {})
+
+    def load_result(self) -> Tuple[bool, Atoms]:
+        status_path = self.workdir / STATUS_FILE
+        result_path = self.workdir / RESULT_FILE
+        if not status_path.exists() or not result_path.exists():
+            # the subprocess died before writing anything (e.g. Turbomole missing)
+            print(f"[DFT] atoms_{self.index:03d}: no result found in {self.workdir}")
+            return False, self.failed_frame(self.atoms.copy())
+        status = json.loads(status_path.read_text())
+        return bool(status["ok"]), read(str(result_path), format="extxyz")
+
+    # ---- worker side ----
+    def make_calculator(self):
+        if self.backend == "turbomole":
+            return Turbomole(**self.tm_params)
+        if self.backend == "fake":
+            return FakeDFTCalculator(self.fake, total_charge=self.tm_params["total charge"])
+        raise ValueError(f"Unknown dft.backend '{self.backend}' (expected 'turbomole' or 'fake')")
+
+    def failed_frame(self, a: Atoms) -> Atoms:
+        # write a placeholder energy so file remains readable
+        a.calc = SinglePointCalculator(a, energy=1e6)
+        a.info.setdefault("key_value_pairs", {})["raw_score"] = float(-1e6)
+        a.info["confid"] = self.atoms.info.get("confid", "N/A")
+        a.info["charge"] = self.charge
+        return a
+
+    def execute(self) -> Tuple[bool, Atoms]:
+        """Relax the structure (or only evaluate it). Runs inside the dedicated task process."""
+        i = self.index
+        a = self.atoms.copy()
+        confid = a.info.get("confid", "N/A")
+
+        with TurbomoleScratch(self.workdir, self.scratch) as scratch:
+            # This process runs exactly one task, so entering scratch does not affect anyone else
+            os.chdir(scratch.path)
+            a.calc = self.make_calculator()
+            try:
+                if self.single_point:
+                    print(f"[DFT] Single point for confid={confid} in {scratch.path}")
+                else:
+                    print(f"[DFT] Relaxing confid={confid} in {scratch.path}")
+                    BFGS(a, logfile=f"dft{i}_opt.log").run(fmax=self.fmax, steps=self.steps)
+                E = a.get_potential_energy()
+                # keep handy metadata in XYZ comment; energy/forces also come with the calculator
+                # results, under the keys the training datasets use
+                a.info["REF_energy"] = float(E)
+                a.arrays["REF_forces"] = a.get_forces().copy()
+                a.info.setdefault("key_value_pairs", {})["raw_score"] = -E
+                a.info["confid"] = confid
+                a.info["charge"] = self.charge
+                ok_flag = True
+                print(f"[DFT] confid={confid}, atoms_{i:03d} {'done' if self.single_point else 'converged'}; E={E:.6f} eV")
+            except RuntimeError as e:
+                print(f"[DFT] confid={confid}, atoms_{i:03d} FAILED (SCF): {e}")
+                scratch.failed = True
+                a = self.failed_frame(a)
+                ok_flag = False
+            finally:
+                os.chdir(self.workdir)
+        return ok_flag, a
+
+    def write_result(self, ok_flag: bool, a: Atoms, timing: Optional[Dict] = None) -> None:
+        """Result first, status last: a present status.json means the result is complete."""
+        write(str(self.workdir / RESULT_FILE), a, format="extxyz")
+        tmp = self.workdir / (STATUS_FILE + ".tmp")
+        tmp.write_text(json.dumps({"ok": bool(ok_flag), "index": self.index,
+                                   "confid": str(a.info.get("confid", "N/A")),
+                                   "timing": timing or {}}))
+        os.replace(tmp, self.workdir / STATUS_FILE)
+
+
+def load_task(workdir: Path) -> DFTTask:
+    with open(Path(workdir) / TASK_FILE, "rb") as f:
+        return pickle.load(f)
+
+
+def run_tasks_asyncio(tasks: List[DFTTask], max_parallel: int) -> List[Tuple[bool, Atoms]]:
+    """Overlap many Turbomole subprocesses from one controller, at most max_parallel at a time."""
+    async def _run_all():
+        sem = asyncio.Semaphore(max_parallel)
+
+        async def _one(task):
+            async with sem:
+                return await task.run_async()
+
+        return await asyncio.gather(*(_one(t) for t in tasks))
+
+    return asyncio.run(_run_all())
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run one pickled DFT task (started by submit_dft)")
+    ap.add_argument("workdir", help="Task directory containing task.pkl")
+    args = ap.parse_args()
+
+    task = load_task(Path(args.workdir))
+    ts, t0, c0 = time.time(), time.perf_counter(), time.process_time()
+    ok_flag, a = task.execute()
+    # Turbomole runs as child processes of this one
+    t = os.times()
+    timing = {"ts": ts, "wall_s": time.perf_counter() - t0,
+              "cpu_s": time.process_time() - c0 + t.children_user + t.children_system,
+              "host": socket.gethostname(), "pid": os.getpid()}
+    task.write_result(ok_flag, a, timing)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+# explore.py
+# The exploration stage selected by the top-level explore key. Both engines take
+# (cfg, iteration, model_iteration=None, db_name=None, out_xyz=None, attempt=0) and write
+# the selection to data/iterXXX/selected_for_dft.extxyz for submit_dft. attempt counts the
+# reruns of one iteration (loop retries, async rounds), so a rerun explores afresh:
+#
+#   ga  run_ga (scripts/run_ga.py)
+#   md  explore_md, multi-replica Langevin MD (scripts/md_explore.py)
+from typing import Callable
+
+from scripts.md_explore import explore_md
+from scripts.run_ga import run_ga
+
+ENGINES = ("ga", "md")
+
+
+def explorer(cfg: dict) -> Callable:
+    """run_ga or explore_md, by cfg["explore"] (default ga)."""
+    engine = cfg.get("explore", "ga")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown explore '{engine}' (expected one of {ENGINES})")
+    return explore_md if engine == "md" else _run_ga
+
+
+def _run_ga(cfg: dict, iteration, attempt: int = 0, **kwargs):
+    # the GA draws from the unseeded global random generators, every attempt differs anyway
+    return run_ga(cfg, iteration, **kwargs)
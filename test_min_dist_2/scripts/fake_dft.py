@@ -0,0 +1,80 @@
+# fake_dft.py
+# Deterministic stand-in for Turbomole (dft.backend: fake) so the whole loop can be run,
+# benchmarked and profiled without a DFT licence. A cheap Na pair potential gives energies
+# and forces; latency and SCF failures are simulated on top.
+import time
+from typing import Dict
+
+import numpy as np
+from ase.calculators.calculator import Calculator, all_changes
+from ase.calculators.lj import LennardJones
+from ase.calculators.morse import MorsePotential
+
+from scripts.dft_cache import structure_hash
+
+# Na2-like parameters: well depth ~0.73 eV at ~3.08 Å
+DEFAULT_FAKE = {
+    "potential": "morse",     # morse | lj
+    "epsilon": 0.73,          # eV
+    "r0": 3.08,               # Å, equilibrium pair distance
+    "rho0": 2.6,              # Morse stiffness (alpha * r0)
+    "latency": 0.0,           # seconds added to every single point
+    "latency_jitter": 0.0,    # uniform random extra latency in [0, jitter]
+    "failure_rate": 0.0,      # fraction of structures whose "SCF" never converges
+    "seed": 0,
+}
+
+
+class FakeDFTCalculator(Calculator):
+    """
+    Pair potential with DFT-like behaviour:
+      - every single point sleeps for latency (+ jitter) seconds
+      - a fixed fraction of input structures fails with RuntimeError, like a
+        non-converging SCF in Turbomole. Whether a structure fails only depends on the
+        seed and the structure it started from, so reruns fail the same way.
+    """
+    implemented_properties = ["energy", "forces"]
+
+    def __init__(self, fake_cfg: Dict = None, total_charge: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        p = dict(DEFAULT_FAKE)
+        p.update(fake_cfg or {})
+        self.p = p
+        self.total_charge = total_charge
+        if p["potential"] == "lj":
+            sigma = p["r0"] / 2 ** (1 / 6)
+            self.pair = LennardJones(epsilon=p["epsilon"], sigma=sigma, rc=3 * sigma, smooth=True)
+        elif p["potential"] == "morse":
+            self.pair = MorsePotential(epsilon=p["epsilon"], r0=p["r0"], rho0=p["rho0"])
+        else:
+            raise ValueError(f"Unknown fake potential '{p['potential']}' (expected 'morse' or 'lj')")
+        self.n_calls = 0
+        self._fails = None   # decided on the first call, from the starting structure
+
+    def will_fail(self, atoms) -> bool:
+        if self.p["failure_rate"] <= 0:
+            return False
+        digest = structure_hash(atoms)
+        rng = np.random.default_rng([int(self.p["seed"]), int(digest[:12], 16)])
+        return bool(rng.random() < self.p["failure_rate"])
+
+    def calculate(self, atoms=None, properties=("energy", "forces"), system_changes=all_changes):
+        super().calculate(atoms, properties, system_changes)
+        if self._fails is None:
+            self._fails = self.will_fail(self.atoms)
+        self.n_calls += 1
+
+        delay = self.p["latency"]
+        if self.p["latency_jitter"] > 0:
+            delay += np.random.default_rng().uniform(0, self.p["latency_jitter"])
+        if delay > 0:
+            time.sleep(delay)
+
+        if self._fails:
+            raise RuntimeError("fake SCF did not converge")
+
+        a = self.atoms.copy()
+        a.calc = self.pair
+        # small charge dependent offset so charged and neutral clusters are distinguishable
+        self.results["energy"] = float(a.get_potential_energy()) + 0.1 * self.total_charge ** 2
+        self.results["forces"] = a.get_forces()
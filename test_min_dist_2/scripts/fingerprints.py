@@ -0,0 +1,167 @@
+# fingerprints.py
+# Structure fingerprints for clusters: the sorted list of all interatomic distances.
+# Invariant to translation, rotation and atom order; two structures are compared with the
+# same normalised cumulative difference ASE's InteratomicDistanceComparator uses
+# (pair_cor_cum_diff), so tolerances carry over.
+from typing import List, Optional, Sequence
+
+import numpy as np
+from ase import Atoms
+from scipy.spatial.distance import pdist
+
+
+def pair_distance_fingerprint(atoms: Atoms) -> np.ndarray:
+    return np.sort(pdist(atoms.get_positions()))
+
+
+def fingerprint_matrix(atoms_list: Sequence[Atoms]) -> np.ndarray:
+    """(n_structures, n_pairs); all structures must have the same number of atoms."""
+    if not atoms_list:
+        return np.zeros((0, 0))
+    return np.stack([pair_distance_fingerprint(a) for a in atoms_list])
+
+
+def fingerprint_distances(fp: np.ndarray, fps: np.ndarray) -> np.ndarray:
+    """Normalised cumulative difference between one fingerprint and each row of fps."""
+    if len(fps) == 0:
+        return np.zeros(0)
+    fps = np.atleast_2d(fps)
+    return np.abs(fps - fp).sum(axis=1) / (0.5 * (fps.sum(axis=1) + fp.sum()))
+
+
+def unique_indices(fps: np.ndarray, tol: float = 0.015) -> List[int]:
+    """Indices of the first occurrence of every distinct structure, in order."""
+    keep: List[int] = []
+    for i, fp in enumerate(fps):
+        if not keep or fingerprint_distances(fp, fps[keep]).min() > tol:
+            keep.append(i)
+    return keep
+
+
+def farthest_point_order(fps: np.ndarray, n: int, chosen: Optional[List[int]] = None) -> List[int]:
+    """
+    Greedy farthest-point selection: n further indices, each the one farthest from
+    everything chosen so far. With nothing chosen, starts from index 0.
+    """
+    chosen = list(chosen or [])
+    n = min(n, len(fps) - len(chosen))
+    if n <= 0:
+        return []
+    picked: List[int] = []
+    if not chosen:
+        picked.append(0)
+        n -= 1
+    min_dist = np.full(len(fps), np.inf)
+    for c in chosen + picked:
+        min_dist = np.minimum(min_dist, fingerprint_distances(fps[c], fps))
+    for _ in range(n):
+        min_dist[chosen + picked] = -np.inf
+        nxt = int(np.argmax(min_dist))
+        picked.append(nxt)
+        min_dist = np.minimum(min_dist, fingerprint_distances(fps[nxt], fps))
+    return picked
+
+
+def fingerprint_distance_matrix(fps: np.ndarray) -> np.ndarray:
+    """Symmetric (n, n) matrix of fingerprint_distances, one row at a time to bound memory."""
+    n = len(fps)
+    dist = np.zeros((n, n))
+    for i in range(n):
+        dist[i, i + 1:] = fingerprint_distances(fps[i], fps[i + 1:])
+    return dist + dist.T
+
+
+def _energy(a: Atoms) -> float:
+    if a.calc is not None:
+        return a.get_potential_energy()
+    return -float(a.info.get("key_value_pairs", {}).get("raw_score", np.nan))
+
+
+class FingerprintComparator:
+    """
+    Drop-in for ASE's InteratomicDistanceComparator with the same three criteria
+    (|dE| < dE, cumulative pair-distance difference < pair_cor_cum_diff, largest single
+    difference < pair_cor_max); identical results for single-element clusters, which is
+    what the GA builds. Fingerprints are computed once per structure and cached by the
+    raw positions, so Population's pairwise looks_like calls only compare arrays.
+    """
+
+    def __init__(self, n_top=None, pair_cor_cum_diff=0.015, pair_cor_max=0.7, dE=0.02, mic=False,
+                 cache_size=100000):
+        if mic:
+            raise ValueError("FingerprintComparator is for clusters; use InteratomicDistanceComparator with mic=True")
+        self.n_top = n_top or 0
+        self.pair_cor_cum_diff = pair_cor_cum_diff
+        self.pair_cor_max = pair_cor_max
+        self.dE = dE
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def fingerprint(self, a: Atoms) -> np.ndarray:
+        top = a[-self.n_top:] if self.n_top else a
+        key = top.get_positions().tobytes()
+        fp = self._cache.get(key)
+        if fp is None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            fp = self._cache[key] = pair_distance_fingerprint(top)
+        return fp
+
+    def match(self, fp: np.ndarray, energy: float, fps: np.ndarray, energies: np.ndarray) -> np.ndarray:
+        """Boolean mask over the rows of fps that look like (fp, energy)."""
+        if len(fps) == 0:
+            return np.zeros(0, dtype=bool)
+        d = np.abs(fps - fp)
+        return ((np.abs(energies - energy) < self.dE)
+                & (d.sum(axis=1) / fp.sum() < self.pair_cor_cum_diff)
+                & (d.max(axis=1) < self.pair_cor_max))
+
+    def looks_like(self, a1: Atoms, a2: Atoms) -> bool:
+        if len(a1) != len(a2):
+            raise Exception('The two configurations are not the same size')
+        return bool(self.match(self.fingerprint(a1), _energy(a1), self.fingerprint(a2)[None, :],
+                               np.array([_energy(a2)]))[0])
+
+
+class FingerprintIndex:
+    """
+    Fingerprints and energies of a growing set of structures in one preallocated array, for
+    "does anything in the set look like this?" queries in a single NumPy pass.
+    """
+
+    def __init__(self, comparator: FingerprintComparator):
+        self.comparator = comparator
+        self.keys: List = []
+        self._fps: Optional[np.ndarray] = None
+        self._energies = np.zeros(0)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, a: Atoms):
+        fp = self.comparator.fingerprint(a)
+        n = len(self.keys)
+        if self._fps is None:
+            self._fps = np.zeros((16, len(fp)))
+            self._energies = np.zeros(16)
+        elif n == len(self._fps):    # grow geometrically
+            self._fps = np.concatenate([self._fps, np.zeros_like(self._fps)])
+            self._energies = np.concatenate([self._energies, np.zeros_like(self._energies)])
+        self._fps[n] = fp
+        self._energies[n] = _energy(a)
+        self.keys.append(key)
+
+    def remove(self, key):
+        i = self.keys.index(key)
+        last = len(self.keys) - 1
+        self._fps[i], self._energies[i] = self._fps[last], self._energies[last]
+        self.keys[i] = self.keys[last]
+        self.keys.pop()
+
+    def find(self, a: Atoms) -> List:
+        """Keys of all indexed structures that look like a."""
+        n = len(self.keys)
+        if n == 0:
+            return []
+        mask = self.comparator.match(self.comparator.fingerprint(a), _energy(a), self._fps[:n], self._energies[:n])
+        return [self.keys[i] for i in np.flatnonzero(mask)]
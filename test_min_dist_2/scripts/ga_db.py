@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# ga_db.py
+# SQLite settings and placement for the GA databases (data/iterXXX/iterXXX_<el><n>_q<q>.db).
+# ASE's DataConnection opens, commits and closes a connection for every add_* call, and the
+# file sits on the shared filesystem, so each write pays a lock round-trip and an fsync.
+#
+#   journal_mode  "wal": readers no longer block the writer (and vice versa); with WAL the
+#                 per-commit fsync is relaxed to synchronous=NORMAL. WAL relies on shared
+#                 memory, so every process that opens the file must run on the same host;
+#                 the canonical file is switched back to "delete" when the GA closes it.
+#   location      "direct": work on the canonical file. "scratch": work on a copy under
+#                 scratch_dir (default $TMPDIR) and copy it back every checkpoint_every
+#                 seconds and on close. "memory": the same, in /dev/shm.
+#   batch_size    writes grouped into one transaction by the background writer.
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+
+from ase.db.sqlite import SQLite3Database
+from ase.ga.data import DataConnection
+
+DEFAULT_GA_DB = {
+    "journal_mode": "wal",
+    "location": "direct",
+    "scratch_dir": None,
+    "batch_size": 20,
+    "checkpoint_every": 60,
+}
+
+LOCATIONS = ("direct", "scratch", "memory")
+
+
+def ga_db_cfg(cfg: dict) -> Dict:
+    return {**DEFAULT_GA_DB, **(cfg.get("ga_db") or {})}
+
+
+def set_journal_mode(path, mode: str) -> str:
+    con = sqlite3.connect(str(path), timeout=60)
+    try:
+        return con.execute(f"PRAGMA journal_mode={mode}").fetchone()[0]
+    finally:
+        con.close()
+
+
+def _copy_db(src, dst, journal_mode: str = "delete"):
+    """Consistent copy via the SQLite backup API (safe while src is being written)."""
+    tmp = Path(f"{dst}.tmp{os.getpid()}")
+    s, d = sqlite3.connect(str(src), timeout=60), sqlite3.connect(str(tmp))
+    try:
+        s.backup(d)
+        d.execute(f"PRAGMA journal_mode={journal_mode}")
+    finally:
+        s.close()
+        d.close()
+    os.replace(tmp, dst)
+
+
+def update_relaxed(dc: DataConnection, atoms):
+    """Replace the stored relaxed structure (and key_value_pairs) of atoms' candidate."""
+    ids = [row.id for row in dc.c.select(relaxed=1, gaid=atoms.info["confid"])]
+    for i in ids:
+        dc.c.update(i, atoms=atoms, **atoms.info["key_value_pairs"])
+
+
+class GASQLiteDatabase(SQLite3Database):
+    """ase.db's SQLite backend with a longer lock timeout, synchronous=NORMAL under WAL, and
+    no connections left open by select() generators that are abandoned early."""
+
+    def __init__(self, filename, wal=False):
+        super().__init__(filename)
+        self.wal = wal
+
+    def _connect(self):
+        con = sqlite3.connect(self.filename, timeout=60)
+        if self.wal:
+            con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    @contextmanager
+    def managed_connection(self, commit_frequency=5000):
+        owned = self.connection is None
+        with super().managed_connection(commit_frequency) as con:
+            try:
+                yield con
+            except GeneratorExit:
+                # e.g. next(select(...)) or the sort-table probe in _select: ase only closes
+                # the connection of a select() that ran to the end, and leaves this one to the GC
+                if owned:
+                    con.close()
+                raise
+
+
+class GADataConnection(DataConnection):
+    """DataConnection on a GASQLiteDatabase."""
+
+    def __init__(self, db_file_name, wal=False):
+        super().__init__(db_file_name)
+        self.c = GASQLiteDatabase(db_file_name, wal=wal)
+
+
+class GADatabase:
+    def __init__(self, path, journal_mode="wal", location="direct", scratch_dir=None, batch_size=20,
+                 checkpoint_every=60):
+        if location not in LOCATIONS:
+            raise ValueError(f"Unknown ga_db.location '{location}' (expected one of {LOCATIONS})")
+        self.path = Path(path)
+        self.journal_mode = journal_mode.lower()
+        self.location = location
+        self.batch_size = max(1, int(batch_size))
+        self.checkpoint_every = checkpoint_every
+        self._workdir = None
+        if location == "direct":
+            self.work_path = self.path
+            set_journal_mode(self.work_path, self.journal_mode)
+        else:
+            if location == "memory" and Path("/dev/shm").is_dir():
+                scratch_dir = "/dev/shm"
+            self._workdir = Path(tempfile.mkdtemp(prefix="ga_db_", dir=scratch_dir))
+            self.work_path = self._workdir / self.path.name
+            _copy_db(self.path, self.work_path, self.journal_mode)
+        self._last_checkpoint = time.monotonic()
+
+    @classmethod
+    def from_cfg(cls, cfg: dict, path) -> "GADatabase":
+        return cls(path, **ga_db_cfg(cfg))
+
+    def connect(self) -> GADataConnection:
+        """A DataConnection on the working copy. Use one per thread."""
+        return GADataConnection(str(self.work_path), wal=self.journal_mode == "wal")
+
+    def maybe_checkpoint(self):
+        if self._workdir is not None and time.monotonic() - self._last_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Copy the working database back to its canonical path."""
+        if self._workdir is not None:
+            _copy_db(self.work_path, self.path)
+        self._last_checkpoint = time.monotonic()
+
+    def close(self):
+        if self._workdir is not None:
+            self.checkpoint()
+            shutil.rmtree(self._workdir, ignore_errors=True)
+            self._workdir = None
+        elif self.journal_mode == "wal":
+            # fold the WAL back in, so the file is self-contained on the shared filesystem
+            set_journal_mode(self.path, "delete")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Show the journal mode and size of a GA database")
+    ap.add_argument("db", help="Path to a GA .db file")
+    args = ap.parse_args()
+    con = sqlite3.connect(args.db)
+    mode = con.execute("PRAGMA journal_mode").fetchone()[0]
+    n = con.execute("SELECT COUNT(*) FROM systems").fetchone()[0]
+    con.close()
+    print(f"{args.db}: journal_mode={mode}, rows={n}, {os.path.getsize(args.db) / 2**20:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
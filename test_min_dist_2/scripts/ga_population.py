@@ -0,0 +1,219 @@
+# ga_population.py
+# In-memory GA population. ASE's Population.update() re-queries the database and compares
+# every new candidate against the population with Python-level looks_like calls; over a
+# long run each update costs O(all candidates). IncrementalPopulation reads the database
+# once, then only inserts the new child: duplicates and looks_like counts come from
+# FingerprintIndex lookups, the elite set stays sorted by raw_score, and pairing history is
+# tracked in memory. Fitness and parent selection are the same as ASE's Population
+# (Vilhelmsen et al., JACS 134, 12807 (2012); roulette wheel).
+#
+# AsyncDBWriter moves database writes whose results the GA does not need right away
+# (relaxed steps, mutation steps) onto one background thread and commits them in batches.
+import bisect
+import contextlib
+import copy
+import queue
+import threading
+from math import sqrt, tanh
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from ase import Atoms
+from ase.calculators.singlepoint import SinglePointCalculator
+from ase.ga import get_raw_score
+
+from scripts.fingerprints import FingerprintComparator, FingerprintIndex
+
+
+class IncrementalPopulation:
+    def __init__(self, data_connection, population_size: int, comparator: FingerprintComparator, rng=np.random):
+        if not isinstance(comparator, FingerprintComparator):
+            raise TypeError("IncrementalPopulation needs a FingerprintComparator")
+        self.dc = data_connection
+        self.pop_size = population_size
+        self.comparator = comparator
+        self.rng = rng
+        self.pop: List[Atoms] = []
+        self.all_cand: List[Atoms] = []
+        self._all_index = FingerprintIndex(comparator)
+        self._pop_index = FingerprintIndex(comparator)
+        self._neg_scores: List[float] = []     # -raw_score of self.pop, ascending
+
+        participation, pairs = data_connection.get_participation_in_pairing()
+        self.participation = dict(participation)
+        self.pairs = set(pairs)
+
+        cands = data_connection.get_all_relaxed_candidates()
+        cands.sort(key=get_raw_score, reverse=True)
+        for c in cands:
+            self._all_index.add(c.info["confid"], c)
+            self.all_cand.append(c)
+        for c in cands:
+            if len(self.pop) >= self.pop_size:
+                break
+            if not self._pop_index.find(c):
+                self._insert(c)
+        for a in self.pop:
+            a.info["looks_like"] = self._count_looks_like(a)
+        self._refresh_paired()
+
+    # ---- bookkeeping ----
+    def _count_looks_like(self, a: Atoms) -> int:
+        return sum(1 for k in self._all_index.find(a) if k != a.info["confid"])
+
+    def _insert(self, a: Atoms):
+        k = bisect.bisect_right(self._neg_scores, -get_raw_score(a))
+        self._neg_scores.insert(k, -get_raw_score(a))
+        self.pop.insert(k, a)
+        self._pop_index.add(a.info["confid"], a)
+
+    def _remove(self, i: int):
+        a = self.pop.pop(i)
+        del self._neg_scores[i]
+        self._pop_index.remove(a.info["confid"])
+
+    def _refresh_paired(self):
+        for a in self.pop:
+            a.info["n_paired"] = self.participation.get(a.info["confid"], 0)
+
+    def _add_candidate(self, a: Atoms):
+        raw_score = get_raw_score(a)
+        if len(self.pop) == self.pop_size and raw_score < get_raw_score(self.pop[-1]):
+            return
+        similar = self._pop_index.find(a)
+        if similar:
+            # replace the similar member if the new candidate is better
+            i = next(i for i, b in enumerate(self.pop) if b.info["confid"] == similar[0])
+            if get_raw_score(self.pop[i]) < raw_score:
+                self._remove(i)
+                a.info["looks_like"] = self._count_looks_like(a)
+                self._insert(a)
+            return
+        if len(self.pop) == self.pop_size:
+            self._remove(len(self.pop) - 1)
+        a.info["looks_like"] = self._count_looks_like(a)
+        self._insert(a)
+
+    def record_pairing(self, parent1: Atoms, parent2: Atoms):
+        c1, c2 = parent1.info["confid"], parent2.info["confid"]
+        for c in (c1, c2):
+            self.participation[c] = self.participation.get(c, 0) + 1
+        self.pairs.add(tuple(sorted([c1, c2])))
+
+    def update(self, new_cand: Optional[Sequence[Atoms]] = None, parents: Optional[Tuple[Atoms, Atoms]] = None):
+        """Insert new relaxed candidates; without new_cand they are read from the database."""
+        if new_cand is None:
+            new_cand = self.dc.get_all_relaxed_candidates(only_new=True)
+        if parents is not None:
+            self.record_pairing(*parents)
+        for a in new_cand:
+            self._all_index.add(a.info["confid"], a)
+            self.all_cand.append(a)
+            self._add_candidate(a)
+        self._refresh_paired()
+
+    # ---- selection, as in ase.ga.population.Population ----
+    def _fitness(self, with_history=True) -> List[float]:
+        scores = [get_raw_score(x) for x in self.pop]
+        min_s, max_s = min(scores), max(scores)
+        T = min_s - max_s
+        if T == 0:
+            f = [1.0] * len(scores)
+        else:
+            f = [0.5 * (1. - tanh(2. * (s - max_s) / T - 1.)) for s in scores]
+        if with_history:
+            f = [fi / sqrt(1. + a.info["n_paired"]) / sqrt(1. + a.info["looks_like"]) for fi, a in zip(f, self.pop)]
+        return f
+
+    def _roulette(self, fit, fmax) -> Atoms:
+        while True:
+            t = self.rng.randint(len(self.pop))
+            if fit[t] > self.rng.random() * fmax:
+                return self.pop[t]
+
+    def get_two_candidates(self, with_history=True):
+        if len(self.pop) < 2:
+            return None
+        fit = self._fitness(with_history)
+        fmax = max(fit)
+        c1 = c2 = self.pop[0]
+        used_before = False
+        while c1.info["confid"] == c2.info["confid"] and not used_before:
+            c1 = self._roulette(fit, fmax)
+            c2 = self._roulette(fit, fmax)
+            c1id, c2id = c1.info["confid"], c2.info["confid"]
+            used_before = (min(c1id, c2id), max(c1id, c2id)) in self.pairs
+        return c1.copy(), c2.copy()
+
+    def get_one_candidate(self, with_history=True):
+        if len(self.pop) < 1:
+            return None
+        fit = self._fitness(with_history)
+        return self._roulette(fit, max(fit)).copy()
+
+
+def detached_copy(a: Atoms) -> Atoms:
+    """Copy with its own info dict and a SinglePointCalculator, safe to hand to another thread."""
+    b = a.copy()
+    b.info = copy.deepcopy(a.info)
+    if a.calc is not None:
+        b.calc = SinglePointCalculator(b, **{k: v for k, v in a.calc.results.items()
+                                              if k in ("energy", "forces", "free_energy")})
+    return b
+
+
+class AsyncDBWriter:
+    """
+    Runs database calls in submission order on one background thread. Calls are grouped
+    batch_size at a time and each group runs inside `transaction` (e.g. an ase.db Database,
+    whose context manager holds one connection and commits once), so the database sees one
+    commit per batch instead of one per call.
+    """
+
+    def __init__(self, transaction=None, batch_size: int = 1):
+        self._transaction = transaction
+        self.batch_size = max(1, batch_size)
+        self._pending: List = []
+        self._queue: "queue.Queue" = queue.Queue()
+        self._errors: List[BaseException] = []
+        self._thread = threading.Thread(target=self._work, name="ga-db-writer", daemon=True)
+        self._thread.start()
+
+    def _work(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                self._queue.task_done()
+                return
+            try:
+                with (self._transaction if self._transaction is not None else contextlib.nullcontext()):
+                    for fn, args in batch:
+                        fn(*args)
+            except BaseException as e:
+                self._errors.append(e)
+            self._queue.task_done()
+
+    def submit(self, fn, *args):
+        self._pending.append((fn, args))
+        if len(self._pending) >= self.batch_size:
+            self._queue.put(self._pending)
+            self._pending = []
+
+    def flush(self):
+        """Block until every submitted write is done; re-raise the first failure."""
+        if self._pending:
+            self._queue.put(self._pending)
+            self._pending = []
+        self._queue.join()
+        if self._errors:
+            raise self._errors.pop(0)
+
+    def close(self):
+        """Flush and stop the thread; calling it again is a no-op."""
+        if not self._thread.is_alive():
+            return
+        try:
+            self.flush()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
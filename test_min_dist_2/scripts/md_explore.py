@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# md_explore.py
+# Finite-temperature exploration as an alternative to the GA (explore: md). Many replicas
+# of committee-driven Langevin MD run in lockstep over a temperature ladder; every MD step
+# is one batched committee call (CommitteeCalculator.calculate_batch) for all replicas.
+# The committee uncertainty comes with every force evaluation, so each step is also an
+# uncertainty check: a frame whose uncertainty (ga.acquisition.uncertainty_key) exceeds
+# sigma_threshold is snapshot, at most once per min_gap steps per replica. The snapshots go
+# through the same acquisition as the GA candidates (ga.acquisition, ga.n_dft) and are
+# written to data/iterXXX/selected_for_dft.extxyz for submit_dft, flagged for a DFT single
+# point (dft_cache.SINGLE_POINT) so they are labelled where the MD found them.
+#
+# Replicas start from the structures in the iteration's GA database (create_db: random
+# and warm-start seeds), relaxed with batched FIRE to start_fmax; replica k of every
+# temperature starts from the k-th lowest. A replica that fragments, or whose uncertainty
+# exceeds reset_sigma (the committee is far outside its training data), restarts from its
+# start structure with fresh velocities.
+#
+#   python -m scripts.md_explore -c config.yaml -i 3
+import argparse
+import heapq
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+import yaml
+from ase import Atoms, units
+from ase.data import atomic_numbers
+from ase.ga.utilities import closest_distances_generator, get_all_atom_types
+from ase.io import write
+from scipy.spatial.distance import pdist, squareform
+
+from scripts.acquisition import acquisition_cfg, select_batch
+from scripts.committee_calc import CommitteeCalculator
+from scripts.create_db import ga_db_name
+from scripts.dft_cache import SINGLE_POINT
+from scripts.ga_db import GADataConnection
+from scripts.optimizers import evaluate_batch, relax_batch
+from scripts.screening import blmin_matrix
+from scripts.tracing import span
+
+DEFAULT_MD_EXPLORE = {
+    "temperatures": [150, 300, 450],    # K
+    "replicas_per_temperature": 4,
+    "timestep": 2.0,                    # fs
+    "friction": 0.01,                   # 1/fs
+    "steps": 2000,
+    "sigma_threshold": 0.005,           # snapshot above this uncertainty
+    "min_gap": 50,                      # steps between two snapshots of one replica
+    "reset_sigma": None,                # restart a replica above this uncertainty (null: never)
+    "max_nn_ratio": 2.0,                # restart a replica that fragments (nearest neighbour > ratio * blmin)
+    "start_fmax": 0.2,                  # batched FIRE relaxation of the start structures
+    "start_steps": 300,
+    "batch_size": 16,                   # replicas per committee call
+    "max_snapshots": 500,               # stop early once this many frames were snapshot
+    "seed": 0,
+}
+
+def md_explore_cfg(cfg: dict) -> Dict:
+    return {**DEFAULT_MD_EXPLORE, **(cfg.get("md_explore") or {})}
+
+
+class ReplicaLangevin:
+    """
+    BAOAB Langevin dynamics for replicas of one composition, stepped together. Positions,
+    velocities and forces are (n_replicas, n_atoms, 3) arrays; every step evaluates the
+    forces of all replicas with batched calculator calls of at most batch_size structures.
+    """
+
+    def __init__(self, atoms_list: Sequence[Atoms], temperatures: Sequence[float], calc, timestep: float,
+                 friction: float, rng: np.random.Generator, batch_size: int = 16):
+        self.atoms = list(atoms_list)
+        self.calc = calc
+        self.batch_size = batch_size
+        self.rng = rng
+        self.dt = timestep * units.fs
+        self.c1 = np.exp(-friction / units.fs * self.dt)
+        self.c2 = np.sqrt(1.0 - self.c1**2)
+        self.temperatures = np.asarray(temperatures, dtype=float)
+        self.kT = (units.kB * self.temperatures)[:, None, None]
+        self.m = np.stack([a.get_masses() for a in self.atoms])[:, :, None]
+        self.x = np.stack([a.get_positions() for a in self.atoms])
+        self.v = np.zeros_like(self.x)
+        self.f = np.zeros_like(self.x)
+        self.energy = np.zeros(len(self.atoms))
+        self.results: List[Dict] = [{} for _ in self.atoms]
+        self.reset(range(len(self.atoms)), self.x)
+
+    def _thermal_velocities(self, idx: np.ndarray) -> np.ndarray:
+        v = self.rng.standard_normal(self.x[idx].shape) * np.sqrt(self.kT[idx] / self.m[idx])
+        p = (self.m[idx] * v).sum(axis=1, keepdims=True)
+        return v - p / self.m[idx].sum(axis=1, keepdims=True)    # no centre-of-mass drift
+
+    def _evaluate(self, idx: Sequence[int]):
+        idx = list(idx)
+        for i in idx:
+            self.atoms[i].set_positions(self.x[i])
+        results = []
+        for start in range(0, len(idx), self.batch_size):
+            results += evaluate_batch(self.calc, [self.atoms[i] for i in idx[start:start + self.batch_size]])
+        for i, res in zip(idx, results):
+            self.f[i] = res["forces"]
+            self.energy[i] = res["energy"]
+            self.results[i] = res
+
+    def reset(self, indices, positions):
+        """Put replicas at new positions with fresh thermal velocities."""
+        idx = np.asarray(list(indices), dtype=int)
+        if len(idx) == 0:
+            return
+        self.x[idx] = np.asarray(positions, dtype=float)
+        self.v[idx] = self._thermal_velocities(idx)
+        self._evaluate(idx)
+
+    def step(self):
+        half = 0.5 * self.dt
+        self.v += half * self.f / self.m
+        self.x += half * self.v
+        self.v = self.c1 * self.v + self.c2 * np.sqrt(self.kT / self.m) * self.rng.standard_normal(self.v.shape)
+        self.x += half * self.v
+        self._evaluate(range(len(self.atoms)))
+        self.v += half * self.f / self.m
+
+    def instantaneous_temperatures(self) -> np.ndarray:
+        ekin = 0.5 * (self.m * self.v**2).sum(axis=(1, 2))
+        return 2.0 * ekin / (3.0 * self.x.shape[1] * units.kB)
+
+
+def _start_structures(db_name, calc, charge, fmax: float, steps: int, batch_size: int) -> List[Atoms]:
+    db = GADataConnection(str(db_name))
+    starts = []
+    for a in db.get_all_relaxed_candidates() + db.get_all_unrelaxed_candidates():
+        s = Atoms(a.get_chemical_symbols(), positions=a.get_positions())
+        s.info = {"confid": a.info.get("confid"), "charge": charge}
+        starts.append(s)
+    if not starts:
+        raise RuntimeError(f"No structures in {db_name} to start the MD replicas from")
+    with span("md.start_relax", cat="md", n_structures=len(starts)):
+        relax_batch(starts, calc, fmax, steps, batch_size)
+    return sorted(starts, key=lambda a: a.get_potential_energy())
+
+
+def explore_md(cfg: dict, iteration, model_iteration=None, db_name=None, out_xyz=None, attempt: int = 0, **_):
+    # Same arguments as run_ga: model_iteration selects the committee, db_name the database the
+    # start structures come from, out_xyz the selection file; attempt (retries of the same
+    # iteration) goes into the seed, so a retry draws new velocities and snapshots
+    mc = md_explore_cfg(cfg)
+    acq = acquisition_cfg(cfg)
+    key = acq["uncertainty_key"]
+    n_atoms = cfg["initialization"]["n_atoms"]
+    charge = cfg["initialization"]["charge"]
+    element = cfg["initialization"]["element"]
+    db_name = db_name or ga_db_name(cfg, iteration)
+    rng = np.random.default_rng([mc["seed"], iteration, attempt])
+
+    committee_calc = CommitteeCalculator(
+        iteration=iteration if model_iteration is None else model_iteration,
+        use_forces=True
+    )
+    Z = atomic_numbers[element]
+    blmin = closest_distances_generator(get_all_atom_types(Atoms(), [Z] * n_atoms), ratio_of_covalent_radii=1)
+
+    starts = _start_structures(db_name, committee_calc, charge, mc["start_fmax"], mc["start_steps"], mc["batch_size"])
+    rpt = mc["replicas_per_temperature"]
+    temperatures = [float(T) for T in mc["temperatures"] for _ in range(rpt)]
+    origin = [starts[k % rpt % len(starts)] for k in range(len(temperatures))]
+    replicas = []
+    for s in origin:
+        a = s.copy()
+        a.info = {"charge": charge}
+        replicas.append(a)
+    bl = blmin_matrix(replicas[0].get_atomic_numbers(), blmin)
+    print(f"[MD] {len(replicas)} replicas at {sorted(set(temperatures))} K from {len(starts)} start structures "
+          f"(lowest committee energy {starts[0].get_potential_energy():.3f} eV)")
+
+    md = ReplicaLangevin(replicas, temperatures, committee_calc, mc["timestep"], mc["friction"], rng, mc["batch_size"])
+    last_snap = np.full(len(replicas), -np.inf)
+    snapshots: List[Atoms] = []
+    fallback: List = []    # min-heap of (sigma, seq, frame) over all replicas, n_dft most uncertain
+    n_dft = cfg["ga"]["n_dft"]
+    stats = Counter()
+
+    def frame(i, step):
+        res = md.results[i]
+        a = Atoms(replicas[i].get_chemical_symbols(), positions=md.x[i].copy())
+        a.info = {
+            "confid": f"md{iteration:03d}{f'a{attempt}' if attempt else ''}-T{temperatures[i]:g}-r{i}-s{step}",
+            "charge": charge,
+            SINGLE_POINT: True,     # relaxing a snapshot would only return a 0 K minimum
+            "key_value_pairs": {"raw_score": -float(res["energy"]), "sigma_E_pa": float(res["sigma_E_pa"]),
+                                "sigma_F_mean": float(res["sigma_F_mean"]), "temperature": temperatures[i]},
+        }
+        return a
+
+    step = 0
+    with span("md.run", cat="md", n_replicas=len(replicas), steps=mc["steps"]):
+        for step in range(1, mc["steps"] + 1):
+            md.step()
+            restart = []
+            for i, res in enumerate(md.results):
+                sigma = float(res.get(key, np.nan))
+                d = squareform(pdist(md.x[i]))
+                np.fill_diagonal(d, np.inf)
+                if (d / bl).min(axis=1).max() > mc["max_nn_ratio"]:
+                    stats["fragmented"] += 1
+                    restart.append(i)
+                    continue
+                if step - last_snap[i] < mc["min_gap"] or np.isnan(sigma):
+                    continue
+                if sigma > mc["sigma_threshold"]:
+                    snapshots.append(frame(i, step))
+                    last_snap[i] = step
+                    stats[f"T{temperatures[i]:g}"] += 1
+                elif step % mc["min_gap"] == 0 and n_dft:
+                    item = (sigma, step * len(replicas) + i, frame(i, step))
+                    if len(fallback) < n_dft:
+                        heapq.heappush(fallback, item)
+                    elif sigma > fallback[0][0]:
+                        heapq.heapreplace(fallback, item)
+                if mc["reset_sigma"] is not None and sigma > mc["reset_sigma"]:
+                    stats["too uncertain"] += 1
+                    restart.append(i)
+            if restart:
+                md.reset(restart, [origin[i].get_positions() for i in restart])
+            if len(snapshots) >= mc["max_snapshots"]:
+                print(f"[MD] {len(snapshots)} snapshots after {step} steps; stopping")
+                break
+
+    temps = md.instantaneous_temperatures()
+    print(f"[MD] {step} steps, {committee_calc.n_calls} committee evaluations, {len(snapshots)} snapshots above "
+          f"{key}={mc['sigma_threshold']}; restarts: fragmented {stats['fragmented']}, too uncertain {stats['too uncertain']}")
+    for T in sorted(set(temperatures)):
+        sel = [k for k, t in enumerate(temperatures) if t == T]
+        print(f"[MD]   T={T:g} K: {stats[f'T{T:g}']} snapshots, final kinetic temperature {temps[sel].mean():.0f} K")
+
+    candidates = list(snapshots)
+    if len(candidates) < n_dft and fallback:
+        extra = [f for _, _, f in sorted(fallback, key=lambda t: -t[0])][:n_dft - len(candidates)]
+        print(f"[MD] Topping up with the {len(extra)} most uncertain frames below the threshold")
+        candidates += extra
+
+    n_dft = min(n_dft, len(candidates))
+    with span("md.acquisition", cat="md", method=acq["method"], n_candidates=len(candidates)):
+        selected = select_batch(candidates, n_dft, **acq) if n_dft else []
+    print(f"[Acquisition] {acq['method']}: selected confids {[a.info.get('confid', 'N/A') for a in selected]}")
+
+    out_xyz = out_xyz or f"data/iter{iteration:03d}/selected_for_dft.extxyz"
+    Path(out_xyz).parent.mkdir(parents=True, exist_ok=True)
+    write(out_xyz, selected, format="extxyz")
+    print(f"Wrote {len(selected)} structures → {out_xyz}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Suggest structures for DFT labelling via multi-replica Langevin MD")
+    ap.add_argument("--config", "-c", required=True, help="Path to project config.yaml")
+    ap.add_argument("--iter", "-i", required=True, type=int, help="Iteration index")
+    args = ap.parse_args()
+    cfg = yaml.safe_load(open(args.config))
+    explore_md(cfg, args.iter)
+
+
+if __name__ == "__main__":
+    main()
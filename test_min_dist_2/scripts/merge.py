@@ -1,8 +1,11 @@
 import argparse
 from ase.io import read, write
 from pathlib import Path
+from scripts.dft_cache import structure_hash
 
 def merge_datasets(iter_idx: int, include_failed: bool = False, dedup_key: str = "confid"):
+    # dedup_key: an info key, or "structure" for the structure hash (confids of different
+    # GA databases collide, e.g. in the async loop)
     iterdir = Path(f"data/iter{iter_idx:03d}")
     nextdir = Path(f"data/iter{iter_idx + 1:03d}")
     nextdir.mkdir(parents=True, exist_ok=True)
@@ -23,7 +26,7 @@ def merge_datasets(iter_idx: int, include_failed: bool = False, dedup_key: str =
     seen, merged = set(), []
     # The order matters because it decides which to keep
     for a in (relaxed_frames + prev_frames  + failed_frames):
-        val = a.info.get(key)
+        val = structure_hash(a) if key == "structure" else a.info.get(key)
         # if confid is missing or "N/A", just treat it as None
         if val is None or (isinstance(val,str) and val.strip().upper()=="N/A"):
             merged.append(a)
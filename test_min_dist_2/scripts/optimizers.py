@@ -0,0 +1,131 @@
+# optimizers.py
+# Optimizers for the committee relaxations in run_ga (ga.optimizer):
+#
+#   bfgs          ase.optimize.BFGS (dense (3N)^2 Hessian, the previous behaviour)
+#   lbfgs         ase.optimize.LBFGS (limited memory)
+#   fire          ase.optimize.FIRE
+#   precon_lbfgs  ase.optimize.precon.PreconLBFGS with an Exp precon (bond-length aware
+#                 metric; fewer steps for soft, floppy clusters) and an Armijo line search
+#   batched_fire  FIRE run in lockstep on many structures; each step is one
+#                 CommitteeCalculator.calculate_batch call for all unconverged structures.
+#                 Used where run_ga has a list of structures (the initial population);
+#                 single structures fall back to fire.
+#
+# Optimizer logs are off unless ga.optimizer.logfile is set.
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from ase import Atoms
+from ase.calculators.singlepoint import SinglePointCalculator
+from ase.optimize import BFGS, FIRE, LBFGS
+from ase.optimize.precon import Exp, PreconLBFGS
+from scipy.spatial.distance import pdist, squareform
+
+DEFAULT_OPTIMIZER = {
+    "name": "bfgs",
+    "logfile": None,        # e.g. "opt.log"; null: no optimizer log
+    "precon_A": 3.0,        # Exp precon stiffness
+    "batch_size": 16,       # structures per batched committee call (batched_fire)
+}
+
+OPTIMIZERS = ("bfgs", "lbfgs", "fire", "precon_lbfgs", "batched_fire")
+
+
+def optimizer_cfg(cfg: dict) -> Dict:
+    oc = {**DEFAULT_OPTIMIZER, **(cfg.get("ga", {}).get("optimizer") or {})}
+    if oc["name"] not in OPTIMIZERS:
+        raise ValueError(f"Unknown ga.optimizer.name '{oc['name']}' (expected one of {OPTIMIZERS})")
+    return oc
+
+
+def make_optimizer(atoms: Atoms, name: str = "bfgs", logfile=None, precon_A: float = 3.0, **_):
+    """An ASE optimizer for one structure (batched_fire gives plain FIRE)."""
+    if name == "bfgs":
+        return BFGS(atoms, logfile=logfile)
+    if name == "lbfgs":
+        return LBFGS(atoms, logfile=logfile)
+    if name in ("fire", "batched_fire"):
+        return FIRE(atoms, logfile=logfile)
+    if name == "precon_lbfgs":
+        # nearest-neighbour scale from the structure itself: ASE's estimate needs a cell
+        d = squareform(pdist(atoms.get_positions()))
+        np.fill_diagonal(d, np.inf)
+        precon = Exp(A=precon_A, r_NN=float(np.median(d.min(axis=1))))
+        return PreconLBFGS(atoms, precon=precon, use_armijo=True, logfile=logfile)
+    raise ValueError(f"Unknown optimizer '{name}' (expected one of {OPTIMIZERS})")
+
+
+def evaluate_batch(calc, atoms_list: Sequence[Atoms]) -> List[Dict]:
+    if hasattr(calc, "calculate_batch"):
+        return calc.calculate_batch(atoms_list)
+    out = []
+    for a in atoms_list:
+        a.calc = calc
+        out.append({"energy": a.get_potential_energy(), "forces": a.get_forces().copy()})
+    return out
+
+
+class _FireState:
+    # ase.optimize.FIRE defaults
+    dtmax, Nmin, finc, fdec, astart, fa = 1.0, 5, 1.1, 0.5, 0.1, 0.99
+
+    def __init__(self, dt=0.1, maxstep=0.2):
+        self.dt, self.maxstep = dt, maxstep
+        self.a = self.astart
+        self.v: Optional[np.ndarray] = None
+        self.Nsteps = 0
+
+    def step(self, atoms: Atoms, f: np.ndarray):
+        if self.v is None:
+            self.v = np.zeros_like(f)
+        else:
+            vf = np.vdot(f, self.v)
+            if vf > 0.0:
+                self.v = (1.0 - self.a) * self.v + self.a * f / np.sqrt(np.vdot(f, f)) * np.sqrt(np.vdot(self.v, self.v))
+                if self.Nsteps > self.Nmin:
+                    self.dt = min(self.dt * self.finc, self.dtmax)
+                    self.a *= self.fa
+                self.Nsteps += 1
+            else:
+                self.v[:] = 0.0
+                self.a = self.astart
+                self.dt *= self.fdec
+                self.Nsteps = 0
+        self.v += self.dt * f
+        dr = self.dt * self.v
+        normdr = np.sqrt(np.vdot(dr, dr))
+        if normdr > self.maxstep:
+            dr = self.maxstep * dr / normdr
+        atoms.set_positions(atoms.get_positions() + dr)
+
+
+def relax_batch(atoms_list: Sequence[Atoms], calc, fmax: float, steps: int, batch_size: int = 16,
+                observer: Optional[Callable[[int, Atoms, Dict], None]] = None) -> List[int]:
+    """
+    FIRE on all structures in lockstep, one batched calculator call per step for the
+    unconverged ones. Structures are relaxed in place and get a SinglePointCalculator with
+    the final energy and forces (uncertainties are in info["key_value_pairs"] as usual).
+    observer(i, atoms, results) is called after every evaluation of structure i.
+    Returns the number of steps per structure.
+    """
+    atoms_list = list(atoms_list)
+    states = [_FireState() for _ in atoms_list]
+    nsteps = [0] * len(atoms_list)
+    active = list(range(len(atoms_list)))
+    while active:
+        results = []
+        for start in range(0, len(active), batch_size):
+            results += evaluate_batch(calc, [atoms_list[i] for i in active[start:start + batch_size]])
+        still = []
+        for i, res in zip(active, results):
+            a, f = atoms_list[i], np.asarray(res["forces"])
+            if observer is not None:
+                observer(i, a, res)
+            if np.sqrt((f**2).sum(axis=1).max()) < fmax or nsteps[i] >= steps:
+                a.calc = SinglePointCalculator(a, energy=res["energy"], forces=f)
+                continue
+            states[i].step(a, f)
+            nsteps[i] += 1
+            still.append(i)
+        active = still
+    return nsteps
@@ -1,10 +1,18 @@
 import yaml 
 import argparse
+from collections import Counter
 from random import random
 from scripts.committee_calc import CommitteeCalculator
-from ase.optimize import BFGS
+from scripts.acquisition import acquisition_cfg, select_batch
+from scripts.candidate_pool import CandidatePool, pool_cfg
+from scripts.create_db import ga_db_name
+from scripts.cheap_potential import cascade_cfg, cheap_calculator, prerelax
+from scripts.fingerprints import FingerprintComparator
+from scripts.ga_db import GADatabase, update_relaxed
+from scripts.optimizers import make_optimizer, optimizer_cfg, relax_batch
+from scripts.screening import OffspringScreen, mark_screened
+from scripts.ga_population import AsyncDBWriter, IncrementalPopulation, detached_copy
 from ase.ga.cutandsplicepairing import CutAndSplicePairing
-from ase.ga.data import DataConnection
 from ase.ga.offspring_creator import OperationSelector
 from ase.ga.population import Population
 from ase.ga.standard_comparators import InteratomicDistanceComparator
@@ -13,19 +21,43 @@ from ase.ga.utilities import closest_distances_generator, get_all_atom_types
 from ase.data import atomic_numbers
 from ase.io import write
 from pathlib import Path
-
-
-def run_ga(cfg:dict, iteration):
-
+from scripts.tracing import span
+from scripts.trajectories import TrajectorySink, harvest_cfg
+
+
+def run_ga(cfg:dict, iteration, model_iteration=None, db_name=None, out_xyz=None, use_pool=True):
+    # model_iteration: committee to explore with (default: this iteration's);
+    # db_name/out_xyz: override the iteration's GA database and selection file;
+    # use_pool: read/write the persistent candidate pool (if candidate_pool.enabled)
+    db_name = db_name or ga_db_name(cfg, iteration)
+
+    # Connect to database (ga_db: journal mode, working location; writes are batched on a
+    # background thread through their own connection). Closed even if the GA fails, so a
+    # scratch copy is written back and the writer thread stops.
+    gadb= GADatabase.from_cfg(cfg, db_name)
+    try:
+        writer_dc= gadb.connect()
+        writer= AsyncDBWriter(transaction=writer_dc.c, batch_size=gadb.batch_size)
+        try:
+            _run_ga(cfg, iteration, gadb, writer_dc, writer, model_iteration, db_name, out_xyz, use_pool)
+        finally:
+            writer.close()
+    finally:
+        gadb.close()
+
+
+def _run_ga(cfg, iteration, gadb, writer_dc, writer, model_iteration, db_name, out_xyz, use_pool):
     # Parameters
     n_atoms=cfg["initialization"]["n_atoms"]
     charge=cfg["initialization"]["charge"]
     n_to_generate=cfg["initialization"]["n_to_generate"]
     element=cfg["initialization"]["element"]
-    db_name = f"data/iter{iteration:03d}/iter{iteration:03d}_{element}{n_atoms}_q{charge}.db"
     offsprings= cfg["ga"]["offsprings"]
     mutation_probability= cfg["ga"]["mutation_prob"]
     fmax=cfg["ga"]["fmax"]
+    # staged convergence: everything is relaxed to screen_fmax for ranking and population
+    # membership, only the population members selected for DFT are tightened to fmax
+    loose_fmax=max(cfg["ga"].get("screen_fmax") or fmax, fmax)
     opt_steps= cfg["ga"]["opt_steps"]
     population_size=cfg["initialization"]["n_to_generate"]
     
@@ -34,8 +66,7 @@ def run_ga(cfg:dict, iteration):
     Z=atomic_numbers[element]
 
 
-    # Connect to database
-    db= DataConnection(db_name)
+    db= gadb.connect()
     atom_numbers= [Z] * n_atoms
 
     # Define geometric constraints
@@ -44,7 +75,10 @@ def run_ga(cfg:dict, iteration):
     blmin= closest_distances_generator(all_atom_types, ratio_of_covalent_radii=1)
 
     # Comparator: to get distinct canidadates
-    comparator= InteratomicDistanceComparator(
+    # "fingerprint" caches each candidate's sorted distance list and compares arrays;
+    # "ase" is ASE's InteratomicDistanceComparator (same criteria, recomputed on every call)
+    Comparator= FingerprintComparator if cfg["ga"].get("comparator", "fingerprint") == "fingerprint" else InteratomicDistanceComparator
+    comparator= Comparator(
         n_top=n_atoms,
         pair_cor_cum_diff=0.015,
         pair_cor_max=0.7,
@@ -66,38 +100,94 @@ def run_ga(cfg:dict, iteration):
     # Set MACE model as calculator 
 
     committee_calc= CommitteeCalculator(
-        iteration=iteration,
+        iteration=iteration if model_iteration is None else model_iteration,
         use_forces=True
     )
 
-    # Relax initial random structures
-
-    while db.get_number_of_unrelaxed_candidates()>0:
-        atoms= db.get_an_unrelaxed_candidate()
-        confid=atoms.info.get('confid', 'N/A')
+    # Relaxation cascade (ga.cascade): a Gupta potential fitted to the training set takes
+    # structures out of bad contacts, the committee tightens
+    cascade= cascade_cfg(cfg)
+    cheap_calc= cheap_calculator(cfg, iteration if model_iteration is None else model_iteration) if cascade["enabled"] else None
+    stage_steps= Counter()
+
+    def cheap_stage(atoms):
+        if cheap_calc is not None:
+            with span("ga.prerelax", cat="ga") as sp:
+                sp["steps"]= prerelax(atoms, cheap_calc, cascade["fmax"], cascade["steps"], blmin)
+            stage_steps["cheap"]+= sp["steps"]
+
+    # Optimizer (ga.optimizer); batched_fire relaxes the initial structures together
+    opt= optimizer_cfg(cfg)
+    # Trajectories (ga.trajectories): the last steps of every relaxation are kept in memory
+    # and written compressed only at the end (always) or for failed relaxations (failure);
+    # ga.harvest also keeps the most uncertain intermediate frames for acquisition
+    acq=acquisition_cfg(cfg)
+    sink= TrajectorySink.from_cfg(cfg, db_name, acq["uncertainty_key"], acq["dedup_tol"])
+
+    def committee_relax(atoms, target_fmax, stage):
+        confid= atoms.info.get('confid', 'N/A')
+        atoms.calc= committee_calc
+        dyn= make_optimizer(atoms, **opt)
+        rec= sink.recorder(atoms, f"{stage}_{confid}")
+        dyn.attach(rec)
+        with span(f"ga.{stage}", cat="ga", confid=confid) as sp, sink.on_failure(rec):
+            converged= dyn.run(target_fmax, opt_steps)
+            sp["steps"] = dyn.nsteps
+        sink.finish(rec, converged)
+        return dyn.nsteps
 
-        atoms.set_calculator(committee_calc)    # this gives a future warning
-        atoms.calc=committee_calc
-        print(f"[GA] Relaxing initial random structure confid={confid}")
-        dyn=BFGS(atoms,logfile="opt_initial.log")
-        dyn.run(fmax, opt_steps)
+    # Relax initial random structures
+    unrelaxed= db.get_all_unrelaxed_candidates()
+    for atoms in unrelaxed:
+        cheap_stage(atoms)
+    if opt["name"] == "batched_fire" and unrelaxed:
+        print(f"[GA] Relaxing {len(unrelaxed)} initial random structures together (batched FIRE)")
+        recs= [sink.recorder(a, f"relax_initial_{a.info.get('confid', 'N/A')}") for a in unrelaxed]
+        with span("ga.relax_initial", cat="ga", n_structures=len(unrelaxed)) as sp:
+            initial_steps= relax_batch(unrelaxed, committee_calc, loose_fmax, opt_steps, opt["batch_size"],
+                                       observer=lambda k, a, res: recs[k].record(a, res))
+            sp["steps"] = sum(initial_steps)
+        for rec, nsteps in zip(recs, initial_steps):
+            sink.finish(rec, nsteps < opt_steps)
+    else:
+        initial_steps= []
+        for atoms in unrelaxed:
+            print(f"[GA] Relaxing initial random structure confid={atoms.info.get('confid', 'N/A')}")
+            initial_steps.append(committee_relax(atoms, loose_fmax, "relax_initial"))
+
+    for atoms, nsteps in zip(unrelaxed, initial_steps):
+        stage_steps["committee"]+= nsteps
+        stage_steps["relaxed"]+= 1
 
         E=atoms.get_potential_energy()
         atoms.info['key_value_pairs']['raw_score'] = -E
-        db.add_relaxed_step(atoms)
+        writer.submit(writer_dc.add_relaxed_step, detached_copy(atoms))
+        gadb.maybe_checkpoint()
         
         energy= atoms.calc.results["energy"]
         print(f"[Relax] Energy from calculator = {energy}")
 
     # Build population from relaxed structures
-    population= Population(
-        data_connection=db,
-        population_size=population_size,
-        comparator=comparator
-    )
+    # "incremental": population kept in memory, only the new child is inserted per update;
+    # "ase": ase.ga Population, which re-reads the DB (so pending writes are flushed first)
+    incremental= cfg["ga"].get("population", "incremental") == "incremental" and isinstance(comparator, FingerprintComparator)
+    writer.flush()
+    with span("ga.population_init", cat="ga"):
+        if incremental:
+            population= IncrementalPopulation(db, population_size, comparator)
+        else:
+            population= Population(
+                data_connection=db,
+                population_size=population_size,
+                comparator=comparator
+            )
 
     print(f"\n[Population] Current population size: {len(population.pop)}")
 
+    # Screening (ga.screening): reject unreasonable, duplicate or clearly high-energy
+    # children before they get a committee relaxation
+    screen= OffspringScreen.from_cfg(cfg, blmin, comparator=comparator, calc=committee_calc)
+
 
     # Main GA loop
     for i in range(offsprings):
@@ -110,7 +200,8 @@ def run_ga(cfg:dict, iteration):
         print(f"   Parent 1: confid={confid1}")
         print(f"   Parent 2: confid={confid2}")
 
-        child, description = pairing.get_new_individual([parent1, parent2])
+        with span("ga.pairing", cat="ga"):
+            child, description = pairing.get_new_individual([parent1, parent2])
         if child is None:
             print("[GA] Pairing failed. Skipping.")
             continue
@@ -119,24 +210,64 @@ def run_ga(cfg:dict, iteration):
         if random() < mutation_probability:
             mutated_child, desc = mutations.get_new_individual([child])
             if mutated_child is not None:
-                db.add_unrelaxed_step(mutated_child, desc)
+                writer.submit(writer_dc.add_unrelaxed_step, detached_copy(mutated_child), desc)
                 child = mutated_child
                 print("[GA] Mutation applied.")
 
-        child.set_calculator(committee_calc)    # this gives a future warning
-        child.calc=committee_calc
-        dyn=BFGS(child, logfile="child_opt.log")
+        # the cheap stage goes first, so the screening single point is taken at the
+        # structure the committee relaxation starts from (and reused as its first step)
+        if cascade["apply_to"] == "all":
+            cheap_stage(child)
+        if screen is not None:
+            with span("ga.screen", cat="ga") as sp:
+                reason= screen.check(child, population.pop)
+                sp["result"]= reason or "passed"
+            if reason is not None:
+                print(f"[Screening] Child confid={child.info.get('confid', 'N/A')} rejected: {reason}")
+                writer.submit(mark_screened, writer_dc, detached_copy(child), reason)
+                continue
+
         print('Offspring relaxation starts.')
-        dyn.run(fmax, opt_steps)
+        stage_steps["committee"]+= committee_relax(child, loose_fmax, "relax_child")
+        stage_steps["relaxed"]+= 1
 
         E=child.get_potential_energy()
         child.info['key_value_pairs']['raw_score'] = -E
     
-        db.add_relaxed_step(child)
-        population.update()
+        writer.submit(writer_dc.add_relaxed_step, detached_copy(child))
+        with span("ga.population_update", cat="ga"):
+            if incremental:
+                population.update([child], parents=(parent1, parent2))
+            else:
+                writer.flush()
+                population.update()
+        gadb.maybe_checkpoint()
+
+    with span("ga.db_flush", cat="ga"):
+        writer.flush()      # the pool reads this run's relaxed candidates back
 
 
     candidates_list=list(population.pop)
+    for a in candidates_list:
+        a.info["ga_iteration"]=iteration    # with the confid, identifies the pool entry once DFT labelled it
+
+    # Persistent pool: keep every relaxed candidate, rescore older ones with this committee
+    # (one batched pass) and offer the most uncertain of them next to the fresh population
+    pcfg=pool_cfg(cfg)
+    pool=CandidatePool(pcfg["path"]) if (pcfg["enabled"] and use_pool) else None
+    if pool is not None:
+        model_it= iteration if model_iteration is None else model_iteration
+        added=pool.add(db.get_all_relaxed_candidates(), iteration, charge, scored_with=model_it)
+        rescored=pool.rescore(committee_calc, model_it, pcfg["batch_size"])
+        offered=pool.offer(pcfg["offer"], exclude=candidates_list)
+        candidates_list+= offered
+        print(f"[Pool] added {added}, rescored {rescored}, offering {len(offered)} of {len(pool)} pooled candidates")
+
+    # Intermediate relaxation frames the committee was most uncertain about (ga.harvest)
+    harvested= sink.most_uncertain(harvest_cfg(cfg)["offer"])
+    if harvested:
+        candidates_list+= harvested
+        print(f"[Harvest] offering {len(harvested)} of {len(sink.harvested)} intermediate frames from the relaxation paths")
 
 
     # Sort relaxed candidates by decreasing sigma_E_pa
@@ -156,16 +287,49 @@ def run_ga(cfg:dict, iteration):
 
 
     n_dft=cfg["ga"]["n_dft"]
-    # Save highest n_dft number of structures 
+    # Pick n_dft structures: uncertain, but distinct from each other (ga.acquisition)
     n_dft = min(n_dft, len(candidates_list))    #candidates list might be smaller than n_dft
-    selected = candidates_list[:n_dft]
-
-    out_xyz=f"data/iter{iteration:03d}/selected_for_dft.extxyz"
+    with span("ga.acquisition", cat="ga", method=acq["method"], n_candidates=len(candidates_list)):
+        selected = select_batch(candidates_list, n_dft, **acq)
+    print(f"[Acquisition] {acq['method']}: selected confids {[a.info.get('confid', 'N/A') for a in selected]}")
+
+    # Tighten the selected population members still relaxed only to screen_fmax; the rest of
+    # the population only ranks and breeds, for which screen_fmax is enough
+    if loose_fmax > fmax:
+        members={id(a) for a in population.pop}
+        finalists=[a for a in selected if id(a) in members and not a.info['key_value_pairs'].get('tight')]
+        for a in finalists:
+            stage_steps["tighten"]+= committee_relax(a, fmax, "tighten")
+            a.info['key_value_pairs']['raw_score'] = -a.get_potential_energy()
+            a.info['key_value_pairs']['tight'] = 1
+            writer.submit(update_relaxed, writer_dc, detached_copy(a))
+        if finalists:
+            per_structure= stage_steps["tighten"] / len(finalists)
+            left_loose= stage_steps["relaxed"] - len(finalists)
+            print(f"[Relax] tightened {len(finalists)} selected candidates from fmax={loose_fmax} to {fmax} "
+                  f"in {stage_steps['tighten']} steps ({per_structure:.1f} each); {left_loose} candidates left "
+                  f"at fmax={loose_fmax}, ~{per_structure * left_loose:.0f} committee steps saved")
+
+    with span("ga.db_flush", cat="ga"):
+        writer.close()
+    if screen is not None:
+        print(f"[Screening] {screen.summary()}")
+    if sink.written:
+        print(f"[Relax] {sink.written} trajectories written to {sink.directory}")
+    print(f"[Relax] steps per stage: {dict(stage_steps)}"
+          + (f" (cheap stage: {cascade['potential']}, applied to {cascade['apply_to']})" if cheap_calc is not None else ""))
+
+    out_xyz=out_xyz or f"data/iter{iteration:03d}/selected_for_dft.extxyz"
     Path(out_xyz).parent.mkdir(parents=True, exist_ok=True)
 
     write(out_xyz, selected, format="extxyz")  # classic XYZ, no structured metadata
     print(f"Wrote {len(selected)} structures → {out_xyz}")
 
+    # entries are marked labelled after submit_dft (candidate_pool.mark_dft_labelled)
+    if pool is not None:
+        pool.prune(pcfg["max_size"])
+        pool.save()
+
 
 def main():
     ap= argparse.ArgumentParser(description="Suggest structure for dft labeling via genetic algorithm")
@@ -0,0 +1,104 @@
+# scratch.py
+# Run Turbomole jobs in node-local scratch (or tmpfs) instead of data/iterXXX/atoms_XXX
+# on the shared filesystem. Only a small set of result/log files is copied back.
+import fnmatch
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# What is copied back to the shared folder after a successful job.
+# The big SCF intermediates (mos, alpha, beta, ddens, oldfock, errvec, ...) are not.
+DEFAULT_KEEP = [
+    "*_opt.log",          # BFGS log written by the DFT task
+    "coord",
+    "control",
+    "energy",
+    "dscf_problem",
+    "GEO_OPT_*",
+]
+# Last lines of the Turbomole program outputs, concatenated into one compact log
+LOG_TAIL_PATTERNS = ["ASE.TM.*.out"]
+LOG_TAIL_LINES = 200
+
+
+def resolve_scratch_root(root: Optional[str] = "auto") -> Path:
+    """
+    root: "auto"  -> $SCRATCH / $TMPDIR (node-local on SLURM nodes), else the system temp dir
+          "tmpfs" -> /dev/shm
+          anything else is taken as a path
+    """
+    if root in (None, "auto"):
+        for var in ("SCRATCH", "TMPDIR"):
+            val = os.environ.get(var)
+            if val and Path(val).is_dir():
+                return Path(val)
+        return Path(tempfile.gettempdir())
+    if root == "tmpfs":
+        return Path("/dev/shm")
+    return Path(os.path.expandvars(root))
+
+
+def _matches(name: str, patterns: List[str]) -> bool:
+    return any(fnmatch.fnmatch(name, pat) for pat in patterns)
+
+
+def write_log_tail(src_dir: Path, out_path: Path, patterns=LOG_TAIL_PATTERNS, n_lines=LOG_TAIL_LINES):
+    chunks = []
+    for f in sorted(src_dir.iterdir()):
+        if f.is_file() and _matches(f.name, patterns):
+            lines = f.read_text(errors="replace").splitlines()[-n_lines:]
+            chunks.append(f"===== {f.name} (last {len(lines)} lines) =====\n" + "\n".join(lines) + "\n")
+    if chunks:
+        out_path.write_text("".join(chunks), encoding="utf-8")
+
+
+class TurbomoleScratch:
+    """
+    Context manager handing out a working directory for one Turbomole job.
+
+        with TurbomoleScratch(final_dir, cfg["dft"].get("scratch")) as scratch:
+            ...run Turbomole inside scratch.path...
+            if failed: scratch.failed = True
+
+    If scratch is disabled, scratch.path is final_dir itself and nothing is copied.
+    On failure everything is copied back when keep_on_failure is set, so the
+    SCF problem can still be inspected.
+    """
+
+    def __init__(self, final_dir, scratch_cfg: Optional[Dict] = None):
+        scratch_cfg = scratch_cfg or {}
+        self.final_dir = Path(final_dir)
+        self.enabled = bool(scratch_cfg.get("enabled", False))
+        self.root = scratch_cfg.get("root", "auto")
+        self.keep = list(scratch_cfg.get("keep", DEFAULT_KEEP))
+        self.keep_on_failure = bool(scratch_cfg.get("keep_on_failure", True))
+        self.path: Optional[Path] = None
+        self.failed = False
+
+    def __enter__(self):
+        self.final_dir.mkdir(parents=True, exist_ok=True)
+        if not self.enabled:
+            self.path = self.final_dir
+            return self
+        root = resolve_scratch_root(self.root)
+        root.mkdir(parents=True, exist_ok=True)
+        self.path = Path(tempfile.mkdtemp(prefix=f"tm_{self.final_dir.name}_", dir=root))
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if not self.enabled:
+            return False
+        failed = self.failed or exc_type is not None
+        try:
+            self.copy_back(everything=failed and self.keep_on_failure)
+        finally:
+            shutil.rmtree(self.path, ignore_errors=True)
+        return False
+
+    def copy_back(self, everything=False):
+        write_log_tail(self.path, self.final_dir / "turbomole_tail.log")
+        for f in self.path.iterdir():
+            if f.is_file() and (everything or _matches(f.name, self.keep)):
+                shutil.copy2(f, self.final_dir / f.name)
@@ -0,0 +1,106 @@
+# screening.py
+# Cheap checks between pairing/mutation and the committee relaxation of a GA child, cheapest
+# first; the first failing check rejects the child:
+#
+#   overlap    a pair closer than blmin (the operators' own limit)
+#   fragment   an atom whose nearest neighbour is farther than max_nn_ratio * blmin
+#   duplicate  pair-distance fingerprint within dup_tol of a population member
+#   energy     one committee single point more than energy_window eV/atom above the
+#              population's highest energy, unless sigma_E_pa >= keep_sigma (those are
+#              worth relaxing for the training set)
+#
+# The single point is the first evaluation of the relaxation: the calculator keeps the
+# result, so a child that passes costs nothing extra.
+from collections import Counter
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from ase import Atoms
+from ase.ga import get_raw_score
+from scipy.spatial.distance import pdist, squareform
+
+from scripts.fingerprints import fingerprint_distances, pair_distance_fingerprint
+
+DEFAULT_SCREENING = {
+    "enabled": False,
+    "max_nn_ratio": 2.0,
+    "dup_tol": 0.015,
+    "energy_window": 0.3,   # eV/atom above the population's highest energy; null: no single point
+    "keep_sigma": None,     # sigma_E_pa (eV/atom) from which a child is kept whatever its energy
+}
+
+
+def screening_cfg(cfg: dict) -> Dict:
+    return {**DEFAULT_SCREENING, **(cfg.get("ga", {}).get("screening") or {})}
+
+
+def blmin_matrix(numbers: np.ndarray, blmin: Dict) -> np.ndarray:
+    """(n, n) minimum distances from an ase.ga blmin dict {(Z1, Z2): d}."""
+    out = np.zeros((len(numbers), len(numbers)))
+    for z1 in np.unique(numbers):
+        for z2 in np.unique(numbers):
+            out[np.ix_(numbers == z1, numbers == z2)] = blmin[tuple(sorted((int(z1), int(z2))))]
+    return out
+
+
+def mark_screened(dc, atoms: Atoms, reason: str):
+    """Record a rejected child so DataConnection no longer lists it as unrelaxed."""
+    dc.c.write(None, gaid=atoms.info["confid"], queued=1, screened=reason)
+
+
+class OffspringScreen:
+    def __init__(self, blmin: Dict, comparator=None, calc=None, max_nn_ratio=2.0, dup_tol=0.015,
+                 energy_window=0.3, keep_sigma=None):
+        self.blmin = blmin
+        self.comparator = comparator
+        self.calc = calc
+        self.max_nn_ratio = max_nn_ratio
+        self.dup_tol = dup_tol
+        self.energy_window = energy_window
+        self.keep_sigma = keep_sigma
+        self.counts = Counter()
+
+    @classmethod
+    def from_cfg(cls, cfg: dict, blmin: Dict, comparator=None, calc=None) -> Optional["OffspringScreen"]:
+        sc = screening_cfg(cfg)
+        if not sc.pop("enabled"):
+            return None
+        return cls(blmin, comparator=comparator, calc=calc, **sc)
+
+    def _fingerprint(self, a: Atoms) -> np.ndarray:
+        fingerprint = getattr(self.comparator, "fingerprint", None)
+        return fingerprint(a) if fingerprint is not None else pair_distance_fingerprint(a)
+
+    def check(self, atoms: Atoms, population: Sequence[Atoms]) -> Optional[str]:
+        """None if the child should be relaxed, else the reason it was rejected."""
+        reason = self._check(atoms, population)
+        self.counts[reason or "passed"] += 1
+        return reason
+
+    def _check(self, atoms, population):
+        d = squareform(pdist(atoms.get_positions()))
+        np.fill_diagonal(d, np.inf)
+        ratio = d / blmin_matrix(atoms.get_atomic_numbers(), self.blmin)
+        if ratio.min() < 1.0:
+            return "overlap"
+        if len(atoms) > 1 and ratio.min(axis=1).max() > self.max_nn_ratio:
+            return "fragment"
+
+        if population:
+            fps = np.stack([self._fingerprint(p) for p in population])
+            if fingerprint_distances(pair_distance_fingerprint(atoms), fps).min() < self.dup_tol:
+                return "duplicate"
+
+        if self.calc is not None and self.energy_window is not None and population:
+            atoms.calc = self.calc
+            e = atoms.get_potential_energy()
+            sigma = atoms.calc.results.get("sigma_E_pa", 0.0)
+            highest = max(-get_raw_score(p) for p in population)
+            if (e - highest) / len(atoms) > self.energy_window and (self.keep_sigma is None or sigma < self.keep_sigma):
+                return "energy"
+        return None
+
+    def summary(self) -> str:
+        total = sum(self.counts.values())
+        rejected = ", ".join(f"{k} {v}" for k, v in sorted(self.counts.items()) if k != "passed")
+        return f"{total} children screened, {self.counts['passed']} relaxed" + (f" (rejected: {rejected})" if rejected else "")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# speculative.py
+# Speculative exploration for the next iteration while DFT labels the current one.
+#
+# During submit_dft of iteration i, explore(cfg, i) runs a GA for iteration i+1 with the
+# committee of iteration i on a separate database and keeps its relaxed candidates in
+#   data/iter{i+1}/speculative/candidates.extxyz
+# It runs in its own process (like DFTTask), so it does not share torch's intra-op thread
+# pool or the interpreter with the main loop; speculative.threads caps its threads.
+# Once iteration i+1's committee is trained, rescored_seeds(cfg, i+1) re-evaluates them
+# with one batched committee call; create_db stores the best speculative.fraction of the
+# population as already relaxed candidates. The rest of the population is left to the
+# warm-start seeds (warm_start.fraction) and random structures.
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+from ase import Atoms
+from ase.calculators.singlepoint import SinglePointCalculator
+from ase.io import read, write
+
+from scripts.committee_calc import CommitteeCalculator
+from scripts.create_db import create_db
+from scripts.dft_task import PROJECT_ROOT
+from scripts.ga_db import GADataConnection
+from scripts.run_ga import run_ga
+from scripts.tracing import TRACER, span, print_summary
+
+DEFAULT_SPECULATIVE = {
+    "enabled": False,
+    "fraction": 0.5,        # share of initialization.n_to_generate seeded from the rescored candidates
+    "threads": None,        # OMP/MKL threads of the exploration process (null: inherit)
+}
+
+
+def speculative_cfg(cfg: dict) -> Dict:
+    return {**DEFAULT_SPECULATIVE, **(cfg.get("speculative") or {})}
+
+
+def speculative_dir(cfg: dict, iteration: int) -> Path:
+    return Path(cfg["data"]["iterdir_pattern"].format(iter=iteration)) / "speculative"
+
+
+def candidates_file(cfg: dict, iteration: int) -> Path:
+    return speculative_dir(cfg, iteration) / "candidates.extxyz"
+
+
+def explore(cfg: dict, iteration: int) -> Path:
+    """GA for iteration+1 with iteration's committee; returns the candidates file."""
+    nxt = iteration + 1
+    spec_dir = speculative_dir(cfg, nxt)
+    spec_dir.mkdir(parents=True, exist_ok=True)
+    db_name = str(spec_dir / "speculative.db")
+
+    with span("speculative.create_db", cat="speculative", iteration=nxt):
+        create_db(cfg, nxt, db_name=db_name)
+    with span("speculative.run_ga", cat="speculative", iteration=nxt):
+        run_ga(cfg, nxt, model_iteration=iteration, db_name=db_name, out_xyz=str(spec_dir / "selected.extxyz"),
+               use_pool=False)
+
+    frames = []
+    for a in GADataConnection(db_name).get_all_relaxed_candidates():
+        frame = a.copy()
+        frame.info = {"confid": a.info.get("confid"), "charge": cfg["initialization"]["charge"],
+                      "speculative_raw_score": a.info["key_value_pairs"].get("raw_score")}
+        frames.append(frame)
+    out = candidates_file(cfg, nxt)
+    write(str(out), frames, format="extxyz")
+    print(f"[Speculative] Stored {len(frames)} candidates for iteration {nxt} → {out}")
+    return out
+
+
+class SpeculativeJob:
+    """explore() running in its own process; join() waits for it."""
+
+    def __init__(self, proc: subprocess.Popen, iteration: int, log: Path):
+        self.proc = proc
+        self.iteration = iteration
+        self.log = log
+
+    def join(self):
+        # speculation is optional; the next iteration falls back to random structures
+        rc = self.proc.wait()
+        if rc != 0:
+            print(f"[Speculative] Exploration for iteration {self.iteration + 1} failed (exit {rc}), see {self.log}")
+
+
+def start(cfg: dict, iteration: int) -> Optional[SpeculativeJob]:
+    """Start explore() in a separate process if speculative.enabled and there is a next iteration."""
+    sc = speculative_cfg(cfg)
+    if not sc["enabled"] or iteration + 1 >= cfg["active_learning"]["iterations"]:
+        return None
+    spec_dir = speculative_dir(cfg, iteration + 1)
+    spec_dir.mkdir(parents=True, exist_ok=True)
+    cfg_path = spec_dir / "config.yaml"
+    cfg_path.write_text(yaml.safe_dump(cfg, sort_keys=False))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in [str(PROJECT_ROOT), env.get("PYTHONPATH", "")] if p)
+    if sc["threads"]:
+        env["OMP_NUM_THREADS"] = env["MKL_NUM_THREADS"] = str(sc["threads"])
+    log = spec_dir / "speculative.log"
+    with open(log, "w") as f:
+        proc = subprocess.Popen([sys.executable, "-m", "scripts.speculative", "-c", str(cfg_path), "-i", str(iteration)],
+                                env=env, stdout=f, stderr=subprocess.STDOUT)
+    print(f"[Speculative] Exploring iteration {iteration + 1} in process {proc.pid} (log: {log})")
+    return SpeculativeJob(proc, iteration, log)
+
+
+def seed_quota(cfg: dict) -> int:
+    """Rescored candidates seeded into a population; warm-start seeds keep their own share."""
+    fraction = speculative_cfg(cfg)["fraction"]
+    ws = cfg.get("warm_start") or {}
+    if ws.get("enabled", False):
+        fraction = min(fraction, 1.0 - ws.get("fraction", 0.5))
+    return int(fraction * cfg["initialization"]["n_to_generate"] + 1e-9)     # floor: never eats a warm-start slot
+
+
+def rescored_seeds(cfg: dict, iteration: int, n_keep: Optional[int] = None) -> List[Atoms]:
+    """Candidates stored for `iteration`, rescored with its committee, lowest energy first."""
+    path = candidates_file(cfg, iteration)
+    if not speculative_cfg(cfg)["enabled"] or not path.exists():
+        return []
+    frames = read(str(path), ":")
+    n_keep = seed_quota(cfg) if n_keep is None else n_keep
+    if not frames or n_keep <= 0:
+        return []
+
+    committee = CommitteeCalculator(iteration=iteration, use_forces=True)
+    with span("speculative.rescore", cat="speculative", n_structures=len(frames)):
+        results = committee.calculate_batch(frames)
+    for a, res in zip(frames, results):
+        a.calc = SinglePointCalculator(a, energy=res["energy"], forces=res["forces"])
+        a.info["key_value_pairs"] = {"raw_score": -res["energy"], "sigma_E_pa": res["sigma_E_pa"],
+                                     "sigma_F_mean": res["sigma_F_mean"]}
+        a.info["data"] = {}
+        a.info.pop("confid", None)   # a new id is assigned in the new database
+    frames.sort(key=lambda a: -a.info["key_value_pairs"]["raw_score"])
+    print(f"[Speculative] Rescored {len(frames)} candidates with the iteration {iteration} committee, "
+          f"seeding {min(n_keep, len(frames))}")
+    return frames[:n_keep]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Explore iteration i+1 with the committee of iteration i")
+    ap.add_argument("--config", "-c", required=True, help="Path to project config.yaml")
+    ap.add_argument("--iter", "-i", required=True, type=int, help="Iteration whose committee explores")
+    args = ap.parse_args()
+    cfg = yaml.safe_load(open(args.config))
+    TRACER.configure(cfg)
+    TRACER.start_iteration(args.iter + 1, speculative_dir(cfg, args.iter + 1))
+    explore(cfg, args.iter)
+    print_summary(TRACER.finish_iteration())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# stage_runner.py
+# Completion markers for the stages of one active-learning iteration, so a restarted job
+# skips everything that already finished with the same inputs and config.
+#
+# A marker data/iterXXX/.stages/<stage>.json stores
+#   - key:     hash of the consumed config sections, input file contents and upstream stage keys
+#   - outputs: every output file with its sha256 at completion time
+#   - result:  the (JSON-serialisable) return value of the stage function
+#   - run_id:  changes on every execution; stages listed in `after=` hash it into their key,
+#              so rerunning an upstream stage invalidates everything downstream of it
+# A stage is skipped when the key is unchanged and all recorded outputs still hash the same.
+# Stages run with cacheable=True are also published to the shared ArtifactCache and
+# restored from it when another campaign already ran them with the same key.
+#
+#   python -m scripts.stage_runner -c config.yaml -i 3                      # list markers
+#   python -m scripts.stage_runner -c config.yaml -i 3 --invalidate run_ga  # force a rerun
+import argparse
+import glob
+import hashlib
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import yaml
+
+from scripts.artifact_cache import ArtifactCache, file_sha256
+
+
+def cfg_subset(cfg: dict, keys: Iterable[str]) -> Dict:
+    """Pick dotted keys ("prep", "data.test_file") out of the config."""
+    out = {}
+    for key in keys:
+        node = cfg
+        for part in key.split("."):
+            node = node.get(part) if isinstance(node, dict) else None
+        out[key] = node
+    return out
+
+
+def expand(patterns: Iterable) -> List[Path]:
+    files = []
+    for pat in patterns:
+        matches = sorted(glob.glob(str(pat)))
+        files.extend(Path(m) for m in matches if Path(m).is_file())
+    return files
+
+
+class StageRunner:
+    def __init__(self, cfg: dict, iteration: int, enabled: Optional[bool] = None):
+        self.cfg = cfg
+        self.iteration = iteration
+        if enabled is None:
+            enabled = bool((cfg.get("resume") or {}).get("enabled", False))
+        self.enabled = enabled
+        cache_cfg = cfg.get("artifact_cache") or {}
+        self.cache = ArtifactCache(cache_cfg.get("root", "../.al_cache")) if cache_cfg.get("enabled", False) else None
+        self.stage_dir = Path(cfg["data"]["iterdir_pattern"].format(iter=iteration)) / ".stages"
+
+    def marker_path(self, stage: str) -> Path:
+        return self.stage_dir / f"{stage}.json"
+
+    def load_marker(self, stage: str) -> Optional[Dict]:
+        path = self.marker_path(stage)
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text())
+        except json.JSONDecodeError:
+            return None
+
+    def stage_key(self, stage: str, inputs=(), cfg_keys=(), after=(), extra=None) -> str:
+        h = hashlib.sha256()
+        h.update(stage.encode())
+        h.update(json.dumps(cfg_subset(self.cfg, cfg_keys), sort_keys=True, default=str).encode())
+        h.update(json.dumps(extra, sort_keys=True, default=str).encode())
+        for f in expand(inputs):
+            h.update(str(f).encode())
+            h.update(file_sha256(f).encode())
+        for upstream in after:
+            marker = self.load_marker(upstream)
+            h.update((marker or {}).get("run_id", "missing").encode())
+        return h.hexdigest()
+
+    def is_valid(self, marker: Optional[Dict], key: str) -> bool:
+        if not marker or marker.get("key") != key:
+            return False
+        if not marker.get("outputs"):
+            return False
+        for path, digest in marker["outputs"].items():
+            if not Path(path).is_file():
+                return False
+            if digest is not None and file_sha256(path) != digest:
+                return False
+        return True
+
+    def run(self, stage: str, fn: Callable, *args, inputs=(), outputs=(), cfg_keys=(), after=(),
+            extra=None, verify_outputs: bool = True, force: bool = False, cacheable: bool = False, **kwargs):
+        """
+        Run fn(*args, **kwargs) unless a valid marker for this stage exists.
+        inputs/outputs are paths or glob patterns; every output pattern must match a file for
+        the marker to be written. verify_outputs=False only checks that outputs exist (for
+        files later stages modify, such as the GA database). force=True always reruns and
+        refreshes the marker (GA/DFT retries). cacheable=True is for deterministic stages whose
+        key contains no campaign-specific state (no `after=`, relative paths only).
+        """
+        use_cache = cacheable and self.cache is not None
+        if not (self.enabled or use_cache):
+            return fn(*args, **kwargs)
+
+        key = self.stage_key(stage, inputs, cfg_keys, after, extra)
+        marker = self.load_marker(stage)
+        if self.enabled and not force and self.is_valid(marker, key):
+            print(f"[Resume] iter {self.iteration:03d}: '{stage}' is up to date, skipping.")
+            return marker.get("result")
+
+        self.invalidate(stage)     # a crash inside fn must not leave the old marker behind
+        if use_cache and not force:
+            meta = self.cache.restore(stage, key)
+            if meta is not None:
+                print(f"[Artifact-cache] iter {self.iteration:03d}: '{stage}' restored from {meta['source']}")
+                self.write_marker(stage, key, outputs, meta["result"], verify_outputs, 0.0)
+                return meta["result"]
+
+        t0 = time.time()
+        result = fn(*args, **kwargs)
+        marker = self.write_marker(stage, key, outputs, result, verify_outputs, time.time() - t0)
+        if use_cache and marker is not None:
+            digests = {p: d or file_sha256(p) for p, d in marker["outputs"].items()}
+            self.cache.put(stage, key, digests, marker["result"])
+        return result
+
+    def write_marker(self, stage, key, outputs, result, verify_outputs, wall_s) -> Optional[Dict]:
+        missing = [str(p) for p in outputs if not expand([p])]
+        if missing:
+            print(f"[Resume] iter {self.iteration:03d}: '{stage}' produced no {missing}; not marking it complete.")
+            return None
+        self.stage_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            json.dumps(result)
+        except TypeError:
+            result = None
+        marker = {
+            "stage": stage,
+            "iteration": self.iteration,
+            "key": key,
+            "run_id": uuid.uuid4().hex,
+            "outputs": {str(f): (file_sha256(f) if verify_outputs else None) for f in expand(outputs)},
+            "result": result,
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "wall_s": wall_s,
+        }
+        tmp = self.marker_path(stage).with_suffix(".tmp")
+        tmp.write_text(json.dumps(marker, indent=2))
+        tmp.replace(self.marker_path(stage))
+        return marker
+
+    def invalidate(self, stage: str):
+        self.marker_path(stage).unlink(missing_ok=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Show or reset the stage markers of an iteration")
+    ap.add_argument("--config", "-c", required=True, help="Path to project config.yaml")
+    ap.add_argument("--iter", "-i", type=int, required=True)
+    ap.add_argument("--invalidate", nargs="*", default=[], help="Stages to rerun on the next start")
+    args = ap.parse_args()
+    cfg = yaml.safe_load(open(args.config))
+    runner = StageRunner(cfg, args.iter, enabled=True)
+    for stage in args.invalidate:
+        runner.invalidate(stage)
+        print(f"Invalidated {stage}")
+    for path in sorted(runner.stage_dir.glob("*.json")):
+        m = json.loads(path.read_text())
+        print(f"{m['stage']:24s} finished {m['finished']}  ({m['wall_s']:.1f} s, {len(m['outputs'])} outputs)")
+
+
+if __name__ == "__main__":
+    main()
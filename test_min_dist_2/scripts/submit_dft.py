@@ -4,86 +4,18 @@ import argparse
 from pathlib import Path
 import yaml
 from ase.io import read, write
-from ase.optimize import BFGS
-from ase.calculators.turbomole import Turbomole
-from ase.calculators.singlepoint import SinglePointCalculator
-import os
-from multiprocessing import Pool 
-
-
-
-""" def get_dft_calculator():
-    return Turbomole(**TM_PARAMS) """
-
-# Turbomole parameters as a global variable
-TM_PARAMS=None
-charge=None
-fmax=None
-steps=None
-
-def relax_one(args):
-    i, a, base_iterdir= args    #get the index, atoms, and iteration folder
-
-    folder= base_iterdir/f"atoms_{i:03d}"
-    folder.mkdir(parents=True, exist_ok=True)
-
-    # Save cwd and temporarily change to folder 
-    old_cwd=Path.cwd()
-    os.chdir(folder)
-
-    confid = a.info.get("confid", "N/A")
-    a.calc= Turbomole(**TM_PARAMS)
-    dyn = BFGS(a, logfile=f"dft{i}_opt.log")
-    try:
-        print(f"[DFT] Relaxing confid={confid}")
-        dyn.run(fmax=fmax, steps=steps)
-        E = a.get_potential_energy()
-        # keep handy metadata in XYZ comment
-        a.info["energy"] = float(E)
-        #a.info["raw_score"]=float(-E)
-        a.info['key_value_pairs']['raw_score'] = -E
-
-        a.info["confid"] = confid
-        #a.info["element"] = element
-        a.info["charge"]  = charge
-        #ok.append(a)
-        ok_flag=True
-        print(f"[DFT] confid={confid}, atoms_{i:03d} converged; E={E:.6f} eV")
-    except RuntimeError as e:
-        print(f"[DFT] confid={confid}, atoms_{i:03d} FAILED (SCF): {e}")
-        # write a placeholder energy so file remains readable
-        a.calc = SinglePointCalculator(a, energy=1e6)
-        #a.info["raw_score"]=float(-1e6)
-        a.info['key_value_pairs']['raw_score'] = float(-1e6)
-        a.info["confid"] = confid
-        a.info["charge"]  = charge
-        #bad.append(a)
-        ok_flag=False
-    finally:
-        os.chdir(old_cwd)
-    return ok_flag, a
+from scripts.dft_cache import DFTCache, dft_settings_from_cfg, record_cache_stats
+from scripts.dft_executors import get_executor
+from scripts.dft_task import DFTTask
+from scripts.tracing import TRACER, span
 
-def submit_dft(cfg, iteration):
-    global fmax, steps, TM_PARAMS, charge  #declare global variables to assign 
-    n_atoms = cfg["initialization"]["n_atoms"]
-    charge  = cfg["initialization"]["charge"]
-    element = cfg["initialization"]["element"]
 
+def submit_dft(cfg, iteration):
     iterdir = Path(f"data/iter{iteration:03d}")
     in_xyz  = iterdir / "selected_for_dft.extxyz"
-    out_ok  = iterdir / "dft_relaxed.extxyz"
-    out_bad = iterdir / "dft_failed.extxyz"
-
-    TM_PARAMS = {
-        "total charge": cfg["dft"]["total_charge"],
-        "multiplicity": cfg["dft"]["multiplicity"],
-        "scf iterations": cfg["dft"]["scf_iter"],
-        "basis set name": cfg["dft"]["basis_set"],
-        "density functional": cfg["dft"]["density_func"],
-    }
-
-    fmax=cfg["dft"]["fmax"]
-    steps=cfg["dft"]["opt_steps"]
+    # names read by merge_datasets and the retry check in active_learning_loop.py
+    out_ok  = iterdir / "dft_relaxed.xyz"
+    out_bad = iterdir / "dft_failed.xyz"
 
     if not in_xyz.exists():
         raise FileNotFoundError(f"Missing input: {in_xyz}")
@@ -92,16 +24,50 @@ def submit_dft(cfg, iteration):
     # frame sis a python list of Atoms objects
     print(f"[DFT] Loaded {len(frames)} structures from {in_xyz}")
 
-    # Prepare argument for pool function 
-    frames_with_idx= [(i, a, iterdir) for i, a in enumerate(frames, 1)]
+    # Serve structures that were already labelled with the same settings from the cache
+    cache = None
+    if cfg["dft"].get("cache", True):
+        cache = DFTCache(cfg["dft"].get("cache_dir", "data/dft_cache"), dft_settings_from_cfg(cfg),
+                         cfg["dft"].get("cache_failures", False))
+
+    # On restart, reuse relaxations that finished in data/iterXXX/atoms_XXX before the interruption
+    resume = bool((cfg.get("resume") or {}).get("enabled", False))
+
+    results_by_idx = {}
+    tasks = []
+    for i, a in enumerate(frames, 1):
+        hit = cache.get(a) if cache else None
+        if hit is not None:
+            print(f"[DFT-cache] confid={a.info.get('confid', 'N/A')} served from cache")
+            results_by_idx[i] = hit
+            continue
+        task = DFTTask.from_cfg(cfg, i, a, iterdir)
+        if resume and task.matches_previous():
+            print(f"[Resume] atoms_{i:03d} already relaxed, reusing {task.workdir.name}")
+            results_by_idx[i] = task.load_result()
+            if cache:
+                cache.put(task.atoms, *results_by_idx[i])
+        else:
+            tasks.append(task)
 
     ok, bad = [], []
-    i=0
-
-    # try multiprocessing
-    p= Pool(10)
 
-    results = p.map(relax_one, frames_with_idx)
+    executor = get_executor(cfg["dft"], iterdir)
+    print(f"[DFT] Running {len(tasks)} task(s) with the '{executor.name}' executor")
+    with span("dft.executor", cat="dft", backend=executor.name, n_tasks=len(tasks)):
+        task_results = executor.run(tasks)
+    for task, (ok_flag, result_frame) in zip(tasks, task_results):
+        results_by_idx[task.index] = (ok_flag, result_frame)
+        t = task.timing()
+        if t:
+            TRACER.record("dft.task", t["ts"], t["wall_s"], t["cpu_s"], cat="dft", pid=t["pid"],
+                          tid=t["pid"], host=t["host"], index=task.index, ok=ok_flag, confid=str(task.atoms.info.get("confid", "N/A")))
+        # keyed on the input structure, not the relaxed one; crashed tasks (no result written) are not
+        # cached, failed ones only with dft.cache_failures
+        if cache and task.completed():
+            cache.put(task.atoms, ok_flag, result_frame)
+
+    results = [results_by_idx[i] for i in sorted(results_by_idx)]
 
     for ok_flag, result_frame in results:
         if ok_flag:
@@ -111,17 +77,20 @@ def submit_dft(cfg, iteration):
             bad.append(result_frame)
             print("Added frame to unsuccessfull results list.")
 
-    p.close()
-    p.join()
+    if cache:
+        stats = cache.stats()
+        total = record_cache_stats(iterdir, stats)
+        print(f"[DFT-cache] hits={stats['hits']} misses={stats['misses']} "
+              f"(iteration total: {total['hits']}/{total['hits'] + total['misses']}, hit rate {total['hit_rate']:.2f})")
 
     if ok:
-        write(str(out_ok), ok)
+        write(str(out_ok), ok, format="extxyz")
         print(f"[DFT] Wrote {len(ok)} relaxed structures → {out_ok}")
     else:
         print("[DFT] No successful relaxations.")
 
     if bad:
-        write(str(out_bad), bad)
+        write(str(out_bad), bad, format="extxyz")
         print(f"[DFT] Wrote {len(bad)} failed structures → {out_bad}")
 
 
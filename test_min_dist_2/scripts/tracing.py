@@ -0,0 +1,209 @@
+# tracing.py
+# Timing spans for the active-learning pipeline. Every span records wall time, CPU time
+# (including child processes such as mace_run_train or Turbomole), RSS and its nesting;
+# per iteration the spans are written as
+#   data/iterXXX/trace.jsonl           one JSON object per span
+#   data/iterXXX/trace_iterXXX.json    Chrome trace / Perfetto (open in ui.perfetto.dev)
+#   data/iterXXX/trace_summary.json    calls, wall and CPU totals per span name
+# Spans are aggregated per name as they close and written out every trace.flush_every
+# spans, so memory stays bounded however many committee calls an iteration makes. The
+# first write of an iteration truncates both files, so a resumed or retried iteration
+# (or an async generation re-entering its directory) does not count spans twice.
+#
+# CPU time: spans on the main thread count the whole process plus its finished child
+# processes (the sync loop runs its stages there). Spans on other threads (async_loop's
+# GA, DFT and training threads) count only their own thread, time.thread_time(), which
+# leaves out child processes; DFT tasks report their own CPU time (TRACER.record).
+#
+# Usage:
+#   from scripts.tracing import TRACER, span
+#   with span("ga.relax_child", confid=12):
+#       ...
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:     # not available on Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def cpu_seconds() -> float:
+    """CPU seconds of this process and its finished child processes."""
+    t = os.times()
+    return time.process_time() + t.children_user + t.children_system
+
+
+def span_cpu_clock():
+    """cpu_seconds on the main thread, time.thread_time on any other."""
+    return cpu_seconds if threading.current_thread() is threading.main_thread() else time.thread_time
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux), falling back to the peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2**20
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return float("nan")
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.flush_every = 5000
+        self.events: List[Dict] = []
+        self.out_dir: Optional[Path] = None
+        self.iteration = None
+        self._agg: Dict = {}
+        self._chrome_open = False
+        self._jsonl_open = False
+        self._lock = threading.Lock()
+        self._local = threading.local()     # per-thread stack of open spans
+
+    def configure(self, cfg: dict):
+        tc = cfg.get("trace") or {}
+        self.enabled = bool(tc.get("enabled", False))
+        self.flush_every = int(tc.get("flush_every", 5000))
+
+    def start_iteration(self, iteration, out_dir):
+        with self._lock:
+            self.iteration = iteration
+            self.out_dir = Path(out_dir)
+            self.events = []
+            self._agg = {}
+            self._chrome_open = False
+            self._jsonl_open = False
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name: str, cat: str = "stage", **attrs):
+        if not self.enabled:
+            yield attrs
+            return
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        cpu = span_cpu_clock()
+        ts, t0, c0, rss0 = time.time(), time.perf_counter(), cpu(), rss_mb()
+        try:
+            yield attrs     # callers may add attributes while the span is open
+        finally:
+            stack.pop()
+            self._append({
+                "name": name,
+                "cat": cat,
+                "ts": ts,
+                "wall_s": time.perf_counter() - t0,
+                "cpu_s": cpu() - c0,
+                "rss_mb": rss_mb(),
+                "rss_delta_mb": rss_mb() - rss0,
+                "parent": parent,
+                "depth": len(stack),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "iteration": self.iteration,
+                "attrs": attrs,
+            })
+
+    def record(self, name: str, ts: float, wall_s: float, cpu_s: float = None, cat: str = "stage",
+               pid: int = None, tid=None, **attrs):
+        """Add a span measured elsewhere, e.g. by a DFT task process."""
+        if not self.enabled:
+            return
+        self._append({
+            "name": name, "cat": cat, "ts": ts, "wall_s": wall_s, "cpu_s": cpu_s,
+            "rss_mb": None, "rss_delta_mb": None, "parent": None, "depth": 0,
+            "pid": pid if pid is not None else os.getpid(), "tid": tid if tid is not None else 0,
+            "iteration": self.iteration, "attrs": attrs,
+        })
+
+    def _append(self, event):
+        with self._lock:
+            a = self._agg.setdefault(event["name"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "max_rss_mb": 0.0})
+            a["calls"] += 1
+            a["wall_s"] += event["wall_s"]
+            a["cpu_s"] += event["cpu_s"] or 0.0
+            if event["rss_mb"] is not None:
+                a["max_rss_mb"] = max(a["max_rss_mb"], event["rss_mb"])
+            self.events.append(event)
+            if len(self.events) >= self.flush_every:
+                self._flush()
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return self._summary()
+
+    def _summary(self) -> Dict:
+        return {name: dict(a) for name, a in sorted(self._agg.items(), key=lambda kv: -kv[1]["wall_s"])}
+
+    @staticmethod
+    def chrome_event(e: Dict) -> Dict:
+        return {
+            "name": e["name"], "cat": e["cat"], "ph": "X",
+            "ts": e["ts"] * 1e6, "dur": e["wall_s"] * 1e6,
+            "pid": e["pid"], "tid": e["tid"],
+            "args": {**e["attrs"], "cpu_s": e["cpu_s"], "rss_mb": e["rss_mb"]},
+        }
+
+    def _chrome_path(self) -> Path:
+        tag = f"iter{self.iteration:03d}" if isinstance(self.iteration, int) else "run"
+        return self.out_dir / f"trace_{tag}.json"
+
+    def _flush(self):
+        """Append the buffered spans to trace.jsonl and the Chrome trace (JSON array format); the
+        first flush of an iteration starts both files over. Lock held."""
+        if self.out_dir is None:
+            self.events = []
+            return
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.out_dir / "trace.jsonl", "a" if self._jsonl_open else "w", encoding="utf-8") as f:
+            for e in self.events:
+                f.write(json.dumps(e, default=str) + "\n")
+        self._jsonl_open = True
+        with open(self._chrome_path(), "a" if self._chrome_open else "w", encoding="utf-8") as f:
+            for e in self.events:
+                f.write(("," if self._chrome_open else "[") + json.dumps(self.chrome_event(e), default=str) + "\n")
+                self._chrome_open = True
+        self.events = []
+
+    def finish_iteration(self) -> Optional[Dict]:
+        """Write out the remaining spans and the summary, and start a fresh aggregate."""
+        if not self.enabled or self.out_dir is None:
+            return None
+        with self._lock:
+            summary = self._summary()
+            self._flush()
+            if self._chrome_open:
+                with open(self._chrome_path(), "a", encoding="utf-8") as f:
+                    f.write("]\n")
+            (self.out_dir / "trace_summary.json").write_text(json.dumps(summary, indent=2))
+            self._agg = {}
+            self._chrome_open = False
+            self._jsonl_open = False
+        return summary
+
+
+TRACER = Tracer()
+span = TRACER.span
+
+
+def print_summary(summary: Optional[Dict], top: int = 15):
+    if not summary:
+        return
+    print(f"{'[Trace] span':40s} {'calls':>7s} {'wall [s]':>10s} {'cpu [s]':>10s} {'max RSS [MB]':>13s}")
+    for name, a in list(summary.items())[:top]:
+        print(f"{name:40s} {a['calls']:7d} {a['wall_s']:10.2f} {a['cpu_s']:10.2f} {a['max_rss_mb']:13.1f}")
@@ -2,6 +2,7 @@
 import argparse, json, subprocess, yaml
 from pathlib import Path
 from typing import Dict, List
+from scripts.tracing import span
 
 def relative_path(old_path):
     return str(Path("../../../")/ old_path)
@@ -21,11 +22,14 @@ def write_config(base_mace_cfg: Dict, train_file: str, valid_file: str,test_file
 
 def train_one(config_yaml: Path):
     # Uses mace_run_train available in your env
-    subprocess.run(["mace_run_train", "--config", str(config_yaml.name)], 
-    check=True,
-    cwd=config_yaml.parent)
+    with span("train.member", cat="train", config=str(config_yaml)):
+        subprocess.run(["mace_run_train", "--config", str(config_yaml.name)], 
+        check=True,
+        cwd=config_yaml.parent)
 
-def train_ensemble_for_iteration(cfg: Dict, manifest_path: Path):
+def train_ensemble_for_iteration(cfg: Dict, manifest_path: Path, runner=None):
+    # runner: optional StageRunner; members whose model is already trained on the same
+    # bootstrap/config are skipped on restart or restored from the shared artifact cache
     m = json.loads(Path(manifest_path).read_text())
     it = m["iteration"]
     boots: List[Dict] = m["outputs"]["boots"]
@@ -51,12 +55,19 @@ def train_ensemble_for_iteration(cfg: Dict, manifest_path: Path):
         config_out = model_dir / "config.yaml"          #runs/iter000/boot_001/config.yaml
         name = f"MACE_iter{it:03d}_boot{boot_idx:03d}"
         write_config(base_mace_cfg, relative_path(train_file), relative_path(valid_file),relative_path(test_file), str(model_dir), name, config_out)
-        written.append(config_out)
+        written.append((boot_idx, train_file, name, config_out))
 
     # Sequential training (simple). You can parallelize via SLURM arrays below.
-    for conf in written:
+    for boot_idx, train_file, name, conf in written:
         print(f"[train] {conf}")
-        train_one(conf)
+        if runner is None:
+            train_one(conf)
+            continue
+        runner.run(f"train_boot{boot_idx:03d}", train_one, conf,
+                   inputs=[train_file, valid_file, test_file, conf],
+                   outputs=[conf.parent / "checkpoints" / f"{name}_run-*_stagetwo.model",
+                            conf.parent / "logs" / f"{name}_run-*.log"],
+                   cacheable=True)
 
 def main():
     ap = argparse.ArgumentParser(description="Train MACE ensemble for a given iteration using manifest.json")
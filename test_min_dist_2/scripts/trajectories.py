@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# trajectories.py
+# In-memory trajectory capture for the GA relaxations (ga.trajectories). Each relaxation
+# gets a Recorder: a ring buffer of the last ring_size steps (positions, energy, max force,
+# committee uncertainties) filled from the calculator results the optimizer already has,
+# so recording costs no evaluations and no per-step I/O. At the end of a relaxation the
+# buffer is written as one compressed .npz per candidate:
+#
+#   mode  "off"      never
+#         "failure"  only if the relaxation did not converge or raised
+#         "always"   every relaxation
+#
+# Files go to <GA db dir>/trajectories/<db stem>/<stage>_<confid>.npz; the path is stored
+# in the candidate's key_value_pairs as traj_file, i.e. in its GA database row.
+#
+# Harvesting (ga.harvest): independently of the ring buffer, each Recorder keeps the
+# per_trajectory most uncertain intermediate frames of the whole relaxation (the endpoint
+# is a candidate anyway). run_ga offers the most uncertain of them to acquisition, so every
+# committee evaluation already paid for along the path can end up in the training set.
+# Frames with max force below min_fmax or within the acquisition dedup_tol of the endpoint
+# are the converged tail and are not kept. Harvested frames are flagged for a DFT single
+# point (dft_cache.SINGLE_POINT): relaxing them would only return the endpoint.
+import argparse
+import copy
+import heapq
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from ase import Atoms
+from ase.io import write
+
+from scripts.dft_cache import SINGLE_POINT
+from scripts.fingerprints import fingerprint_distances, pair_distance_fingerprint
+
+DEFAULT_TRAJECTORIES = {
+    "mode": "failure",
+    "ring_size": 50,        # steps kept per relaxation
+}
+
+DEFAULT_HARVEST = {
+    "per_trajectory": 0,    # most uncertain intermediate frames kept per relaxation (0: off)
+    "offer": 20,            # harvested frames offered to acquisition per GA run
+    "min_fmax": 0.3,        # eV/Å; frames closer to convergence than this are not kept
+}
+
+MODES = ("off", "failure", "always")
+
+
+def trajectories_cfg(cfg: dict) -> Dict:
+    tc = {**DEFAULT_TRAJECTORIES, **(cfg.get("ga", {}).get("trajectories") or {})}
+    if tc["mode"] not in MODES:
+        raise ValueError(f"Unknown ga.trajectories.mode '{tc['mode']}' (expected one of {MODES})")
+    return tc
+
+
+def harvest_cfg(cfg: dict) -> Dict:
+    return {**DEFAULT_HARVEST, **(cfg.get("ga", {}).get("harvest") or {})}
+
+
+class Recorder:
+    """Ring buffer of one relaxation. Attach to an ASE optimizer (dyn.attach(rec)) or call record()."""
+
+    def __init__(self, atoms: Atoms, key: str, maxlen: int, top_k: int = 0, uncertainty_key: str = "sigma_E_pa",
+                 min_fmax: float = 0.0, dedup_tol: float = 0.0):
+        self.atoms = atoms
+        self.key = key
+        self.frames = deque(maxlen=maxlen)
+        self.n_steps = 0
+        self.top_k = top_k
+        self.uncertainty_key = uncertainty_key
+        self.min_fmax = min_fmax
+        self.dedup_tol = dedup_tol
+        self._top: List = []    # min-heap of (uncertainty, frame)
+
+    def __call__(self):
+        self.record(self.atoms, self.atoms.calc.results)
+
+    def record(self, atoms: Atoms, results: Dict):
+        forces = results.get("forces")
+        fmax = float(np.sqrt((forces**2).sum(axis=1).max())) if forces is not None else np.nan
+        frame = (self.n_steps, atoms.get_positions().astype(np.float32), float(results.get("energy", np.nan)),
+                 fmax, float(results.get("sigma_E_pa", np.nan)), float(results.get("sigma_F_mean", np.nan)))
+        self.frames.append(frame)
+        sigma = float(results.get(self.uncertainty_key, np.nan))
+        if self.top_k and not np.isnan(sigma) and not fmax < self.min_fmax:
+            if len(self._top) < self.top_k:
+                heapq.heappush(self._top, (sigma, self.n_steps, frame))
+            elif sigma > self._top[0][0]:
+                heapq.heapreplace(self._top, (sigma, self.n_steps, frame))
+        self.n_steps += 1
+
+    def most_uncertain(self) -> List[Atoms]:
+        """The kept intermediate frames as candidates, most uncertain first (endpoint and frames
+        within dedup_tol of it excluded)."""
+        out = []
+        confid = self.atoms.info.get("confid", "N/A")
+        endpoint = pair_distance_fingerprint(self.atoms)
+        for sigma, step, (_, positions, energy, _, sigma_E, sigma_F) in sorted(self._top, key=lambda t: -t[0]):
+            if step == self.n_steps - 1:
+                continue
+            a = self.atoms.copy()
+            a.calc = None
+            a.set_positions(positions.astype(float))
+            if fingerprint_distances(endpoint, pair_distance_fingerprint(a))[0] < self.dedup_tol:
+                continue
+            a.info = copy.deepcopy(self.atoms.info)
+            a.info["confid"] = f"{confid}-step{step}"   # unique, so merge does not drop it as a duplicate
+            a.info["harvested_from"] = str(confid)
+            a.info[SINGLE_POINT] = True
+            a.info["key_value_pairs"] = {"raw_score": -energy, "sigma_E_pa": sigma_E, "sigma_F_mean": sigma_F}
+            out.append(a)
+        return out
+
+
+class TrajectorySink:
+    def __init__(self, directory, mode: str = "failure", ring_size: int = 50, harvest: int = 0,
+                 uncertainty_key: str = "sigma_E_pa", min_fmax: float = 0.0, dedup_tol: float = 0.0):
+        self.directory = Path(directory)
+        self.mode = mode
+        self.ring_size = ring_size if mode != "off" else 0
+        self.harvest = harvest
+        self.uncertainty_key = uncertainty_key
+        self.min_fmax = min_fmax
+        self.dedup_tol = dedup_tol
+        self.harvested: List[Atoms] = []
+        self.written = 0
+
+    @classmethod
+    def from_cfg(cls, cfg: dict, db_name, uncertainty_key: str = "sigma_E_pa",
+                 dedup_tol: float = 0.0) -> "TrajectorySink":
+        db_name = Path(db_name)
+        hc = harvest_cfg(cfg)
+        return cls(db_name.parent / "trajectories" / db_name.stem, **trajectories_cfg(cfg),
+                   harvest=hc["per_trajectory"], uncertainty_key=uncertainty_key, min_fmax=hc["min_fmax"],
+                   dedup_tol=dedup_tol)
+
+    def recorder(self, atoms: Atoms, key: str) -> Recorder:
+        return Recorder(atoms, key, self.ring_size, self.harvest, self.uncertainty_key, self.min_fmax,
+                        self.dedup_tol)
+
+    @contextmanager
+    def on_failure(self, rec: Recorder):
+        """Write the buffer if the relaxation raises (mode failure or always), then re-raise."""
+        try:
+            yield
+        except BaseException as e:
+            if self.mode != "off":
+                self.write(rec, converged=False, error=repr(e))
+            raise
+
+    def finish(self, rec: Recorder, converged: bool) -> Optional[Path]:
+        if self.harvest:
+            self.harvested += rec.most_uncertain()
+        if self.mode == "always" or (self.mode == "failure" and not converged):
+            path = self.write(rec, converged)
+            rec.atoms.info.setdefault("key_value_pairs", {})["traj_file"] = str(path)
+            return path
+        return None
+
+    def most_uncertain(self, n: int) -> List[Atoms]:
+        """The n most uncertain harvested frames over all finished relaxations."""
+        key = self.uncertainty_key
+        return sorted(self.harvested, key=lambda a: -a.info["key_value_pairs"].get(key, -np.inf))[:n]
+
+    def write(self, rec: Recorder, converged: bool, error: str = "") -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{rec.key}.npz"
+        frames = list(rec.frames)
+        np.savez_compressed(
+            path,
+            numbers=rec.atoms.get_atomic_numbers(),
+            step=np.array([f[0] for f in frames], dtype=np.int32),
+            positions=np.stack([f[1] for f in frames]) if frames else np.zeros((0, len(rec.atoms), 3), np.float32),
+            energy=np.array([f[2] for f in frames]),
+            fmax=np.array([f[3] for f in frames]),
+            sigma_E_pa=np.array([f[4] for f in frames]),
+            sigma_F_mean=np.array([f[5] for f in frames]),
+            n_steps=rec.n_steps,
+            converged=converged,
+            error=error,
+        )
+        self.written += 1
+        return path
+
+
+def load_trajectory(path) -> list:
+    """The buffered frames as Atoms with energy, fmax and uncertainties in info."""
+    with np.load(path) as z:
+        out = []
+        for k in range(len(z["step"])):
+            a = Atoms(numbers=z["numbers"], positions=z["positions"][k].astype(float))
+            a.info.update({key: z[key][k].item() for key in ("step", "energy", "fmax", "sigma_E_pa", "sigma_F_mean")})
+            out.append(a)
+        return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert a buffered GA relaxation trajectory to extxyz")
+    ap.add_argument("npz", help="Trajectory file (traj_file of a GA database row)")
+    ap.add_argument("--out", "-o", help="Output .extxyz (default: next to the .npz)")
+    args = ap.parse_args()
+    out = args.out or str(Path(args.npz).with_suffix(".extxyz"))
+    frames = load_trajectory(args.npz)
+    write(out, frames, format="extxyz")
+    print(f"Wrote {len(frames)} frames → {out}")
+
+
+if __name__ == "__main__":
+    main()
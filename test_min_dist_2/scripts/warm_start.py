@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# warm_start.py
+# Seeds for iteration i's GA population from earlier iterations: relaxed candidates of the
+# previous GA databases and the DFT-relaxed structures. Energies of different committees
+# (and of DFT) are not comparable, so every source is ranked on its own; the seeds are the
+# best-ranked structures plus the most diverse rest (farthest-point selection on the
+# pair-distance fingerprints). create_db tops them up with random structures.
+import argparse
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import yaml
+from ase import Atoms
+from ase.io import read
+
+from scripts.create_db import ga_db_name
+from scripts.fingerprints import farthest_point_order, fingerprint_matrix, unique_indices
+from scripts.ga_db import GADataConnection
+
+DEFAULT_WARM_START = {
+    "enabled": False,
+    "fraction": 0.5,        # share of initialization.n_to_generate taken from earlier iterations
+    "best_fraction": 0.5,   # of those, best-ranked first; the rest maximises diversity
+    "lookback": 3,          # earlier iterations to draw from (null: all)
+    "sources": ["ga_db", "dft_relaxed"],
+    "dedup_tol": 0.015,     # fingerprint distance below which two structures are the same
+}
+
+
+def _ranked(frames: List[Atoms], energies, source: str, iteration: int) -> List[Atoms]:
+    """Clean copies with info["warm_start_rank"] in [0, 1), 0 = lowest energy of the source."""
+    order = np.argsort(energies)
+    out = []
+    for rank, k in enumerate(order):
+        a = Atoms(frames[k].get_chemical_symbols(), positions=frames[k].get_positions(),
+                  cell=frames[k].get_cell(), pbc=False)
+        a.info = {"warm_start_rank": rank / len(order), "warm_start_source": f"{source}:iter{iteration:03d}"}
+        out.append(a)
+    return out
+
+
+def collect_candidates(cfg: dict, iteration: int) -> List[Atoms]:
+    ws = {**DEFAULT_WARM_START, **(cfg.get("warm_start") or {})}
+    first = 0 if ws["lookback"] is None else max(0, iteration - int(ws["lookback"]))
+    n_atoms = cfg["initialization"]["n_atoms"]
+    pool: List[Atoms] = []
+    for j in range(first, iteration):
+        if "ga_db" in ws["sources"] and Path(ga_db_name(cfg, j)).exists():
+            frames = GADataConnection(ga_db_name(cfg, j)).get_all_relaxed_candidates()
+            energies = [-a.info["key_value_pairs"]["raw_score"] for a in frames]
+            pool += _ranked(frames, energies, "ga_db", j)
+        relaxed = Path(cfg["data"]["iterdir_pattern"].format(iter=j)) / "dft_relaxed.xyz"
+        if "dft_relaxed" in ws["sources"] and relaxed.exists():
+            frames = read(str(relaxed), ":")
+            energies = [a.info.get("REF_energy", a.get_potential_energy() if a.calc else 0.0) for a in frames]
+            pool += _ranked(frames, energies, "dft_relaxed", j)
+    return [a for a in pool if len(a) == n_atoms]
+
+
+def warm_start_seeds(cfg: dict, iteration: int) -> List[Atoms]:
+    ws = {**DEFAULT_WARM_START, **(cfg.get("warm_start") or {})}
+    if not ws["enabled"] or iteration == 0:
+        return []
+    n_seeds = int(round(ws["fraction"] * cfg["initialization"]["n_to_generate"]))
+    pool = collect_candidates(cfg, iteration)
+    if not pool or n_seeds <= 0:
+        return []
+
+    # best first, so deduplication keeps the better-ranked copy
+    pool.sort(key=lambda a: a.info["warm_start_rank"])
+    fps = fingerprint_matrix(pool)
+    keep = unique_indices(fps, ws["dedup_tol"])
+    pool, fps = [pool[k] for k in keep], fps[keep]
+
+    n_best = min(int(round(ws["best_fraction"] * n_seeds)), len(pool))
+    chosen = list(range(n_best))
+    chosen += farthest_point_order(fps, n_seeds - n_best, chosen=chosen)
+    seeds = [pool[k] for k in chosen]
+    print(f"[Warm-start] iteration {iteration}: {len(seeds)} seeds ({n_best} best, "
+          f"{len(seeds) - n_best} diverse) from {len(pool)} distinct earlier structures")
+    return seeds
+
+
+def main():
+    ap = argparse.ArgumentParser(description="List the warm-start seeds for an iteration")
+    ap.add_argument("--config", "-c", required=True, help="Path to project config.yaml")
+    ap.add_argument("--iter", "-i", required=True, type=int)
+    args = ap.parse_args()
+    cfg = yaml.safe_load(open(args.config))
+    cfg.setdefault("warm_start", {})["enabled"] = True
+    for a in warm_start_seeds(cfg, args.iter):
+        print(f"{a.info['warm_start_source']:24s} rank={a.info['warm_start_rank']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+# Tests run from test_min_dist_2/ (python -m pytest -q); scripts/ is imported as a package
+# from the project root, as in the job scripts.
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from ase import Atoms
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def random_cluster(n_atoms: int, rng: np.random.Generator, symbol: str = "Na", density: float = 0.02) -> Atoms:
+    """Random cluster without overlapping atoms (pairs at least 2.5 Å apart)."""
+    side = (n_atoms / density) ** (1 / 3)
+    positions = []
+    while len(positions) < n_atoms:
+        p = rng.uniform(0.0, side, 3)
+        if all(np.linalg.norm(p - q) > 2.5 for q in positions):
+            positions.append(p)
+    return Atoms(f"{symbol}{n_atoms}", positions=positions)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
@@ -0,0 +1,32 @@
+import pytest
+
+from conftest import random_cluster
+from scripts.acquisition import METHODS, select_batch
+
+
+def _candidates(rng, n_distinct, n_copies):
+    out = []
+    for k in range(n_distinct):
+        a = random_cluster(8, rng)
+        for c in range(n_copies):
+            b = a.copy()
+            b.rattle(1e-4, seed=c)
+            b.info["confid"] = f"{k}-{c}"
+            b.info["key_value_pairs"] = {"sigma_E_pa": float(rng.uniform(0.001, 0.05))}
+            out.append(b)
+    return out
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("n_distinct, n", [(20, 10), (10, 10), (3, 10), (1, 3), (0, 5)])
+def test_select_batch_returns_min_n_distinct(rng, method, n_distinct, n):
+    selected = select_batch(_candidates(rng, n_distinct, 1), n, method=method)
+    assert len(selected) == min(n, n_distinct)
+    assert len({a.info["confid"] for a in selected}) == len(selected)
+
+
+@pytest.mark.parametrize("method", [m for m in METHODS if m != "top"])
+def test_select_batch_never_pads_with_duplicates(rng, method):
+    # 4 distinct structures with 5 near-identical copies each: one copy of each, batch stays short
+    selected = select_batch(_candidates(rng, 4, 5), 10, method=method)
+    assert sorted(a.info["confid"].split("-")[0] for a in selected) == ["0", "1", "2", "3"]
@@ -0,0 +1,24 @@
+import numpy as np
+from ase.calculators.fd import calculate_numerical_forces
+
+from conftest import random_cluster
+from scripts.cheap_potential import GUPTA_START, GuptaCalculator
+
+
+def test_gupta_forces_match_finite_differences(rng):
+    for n_atoms in (2, 8, 13):
+        a = random_cluster(n_atoms, rng)
+        a.calc = GuptaCalculator(**GUPTA_START, r0=3.7)
+        np.testing.assert_allclose(a.get_forces(), calculate_numerical_forces(a, eps=1e-5), atol=1e-6)
+
+
+def test_gupta_is_translation_and_rotation_invariant(rng):
+    a = random_cluster(8, rng)
+    a.calc = GuptaCalculator(**GUPTA_START, r0=3.7)
+    e = a.get_potential_energy()
+    b = a.copy()
+    b.rotate(37, "x", center="COM")
+    b.translate([1.0, -2.0, 0.5])
+    b.calc = GuptaCalculator(**GUPTA_START, r0=3.7)
+    np.testing.assert_allclose(b.get_potential_energy(), e)
+    np.testing.assert_allclose(b.get_forces().sum(axis=0), 0.0, atol=1e-10)
@@ -0,0 +1,85 @@
+import numpy as np
+from ase.calculators.singlepoint import SinglePointCalculator
+
+from conftest import random_cluster
+from scripts.dft_cache import SINGLE_POINT, DFTCache, structure_hash
+
+SETTINGS = {"total_charge": 0, "multiplicity": 1, "basis_set": "def2-SVP", "density_func": "pbe",
+            "scf_iter": 300, "fmax": 0.05, "opt_steps": 200}
+
+
+def _label(a, rng):
+    result = a.copy()
+    result.rattle(0.1, seed=0)
+    result.calc = SinglePointCalculator(result, energy=-12.5, forces=rng.normal(size=(len(a), 3)))
+    result.info.update({"confid": a.info["confid"], "charge": 0, "REF_energy": -12.5,
+                        "key_value_pairs": {"raw_score": 12.5, "sigma_E_pa": 0.01}})
+    result.arrays["REF_forces"] = result.get_forces().copy()
+    return result
+
+
+def test_round_trip(tmp_path, rng):
+    cache = DFTCache(tmp_path, SETTINGS)
+    a = random_cluster(8, rng)
+    a.info["confid"] = 7
+    result = _label(a, rng)
+    assert cache.get(a) is None
+    cache.put(a, True, result)
+
+    # the same structure asked for again, translated and reordered, under another confid
+    b = a[rng.permutation(len(a))]
+    b.translate([0.5, 0.0, -1.0])
+    b.info["confid"] = 42
+    ok, cached = cache.get(b)
+    assert ok
+    assert cached.info["confid"] == 42 and cached.info["cache_hit"]
+    np.testing.assert_allclose(cached.get_positions(), result.get_positions())
+    np.testing.assert_allclose(cached.get_potential_energy(), -12.5)
+    np.testing.assert_allclose(cached.get_forces(), result.get_forces())
+    np.testing.assert_allclose(cached.arrays["REF_forces"], result.arrays["REF_forces"])
+    assert cached.info["key_value_pairs"] == {"raw_score": 12.5}
+    assert cache.stats() == {"hits": 1, "misses": 1, "stored": 1, "hit_rate": 0.5}
+
+
+def test_hit_carries_the_provenance_of_the_request(tmp_path, rng):
+    cache = DFTCache(tmp_path, SETTINGS)
+    a = random_cluster(8, rng)
+    a.info.update({"confid": 5, "ga_iteration": 1, "key_value_pairs": {"sigma_E_pa": 0.01, "traj_file": "x.npz"}})
+    cache.put(a, True, _label(a, rng))
+
+    b = a.copy()
+    b.info = {"confid": 9, "ga_iteration": 3, "key_value_pairs": {"sigma_E_pa": 0.02}}
+    _, cached = cache.get(b)
+    assert cached.info["confid"] == 9 and cached.info["ga_iteration"] == 3
+    assert cached.info["key_value_pairs"] == {"sigma_E_pa": 0.02, "raw_score": 12.5}
+    assert cached.info["REF_energy"] == -12.5 and cached.info["charge"] == 0
+
+
+def test_keys_separate_settings(tmp_path, rng):
+    a = random_cluster(8, rng)
+    a.info["confid"] = 1
+    DFTCache(tmp_path, SETTINGS).put(a, True, _label(a, rng))
+    assert DFTCache(tmp_path, {**SETTINGS, "fmax": 0.01}).get(a) is None
+    assert DFTCache(tmp_path, SETTINGS).get(a) is not None
+
+
+def test_single_points_have_their_own_key(tmp_path, rng):
+    a = random_cluster(8, rng)
+    a.info["confid"] = 1
+    DFTCache(tmp_path, SETTINGS).put(a, True, _label(a, rng))
+    single = a.copy()
+    single.info[SINGLE_POINT] = True
+    assert structure_hash(single) == structure_hash(a)
+    assert DFTCache(tmp_path, SETTINGS).get(single) is None
+
+
+def test_failures_are_cached_only_on_request(tmp_path, rng):
+    a = random_cluster(8, rng)
+    a.info["confid"] = 3
+    assert DFTCache(tmp_path, SETTINGS).put(a, False, _label(a, rng)) is None
+    assert DFTCache(tmp_path, SETTINGS).get(a) is None
+
+    DFTCache(tmp_path, SETTINGS, cache_failures=True).put(a, False, _label(a, rng))
+    assert DFTCache(tmp_path, SETTINGS).get(a) is None
+    ok, _ = DFTCache(tmp_path, SETTINGS, cache_failures=True).get(a)
+    assert not ok
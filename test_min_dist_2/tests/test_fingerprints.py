@@ -0,0 +1,48 @@
+import numpy as np
+from ase.calculators.singlepoint import SinglePointCalculator
+from ase.ga.standard_comparators import InteratomicDistanceComparator
+
+from conftest import random_cluster
+from scripts.fingerprints import FingerprintComparator
+
+
+def _with_energy(a, energy):
+    a.calc = SinglePointCalculator(a, energy=energy)
+    return a
+
+
+def test_matches_interatomic_distance_comparator(rng):
+    n_atoms = 8
+    kwargs = {"n_top": n_atoms, "pair_cor_cum_diff": 0.015, "pair_cor_max": 0.7, "dE": 0.02}
+    ours = FingerprintComparator(**kwargs)
+    ase_cmp = InteratomicDistanceComparator(**kwargs, mic=False)
+
+    pairs = []
+    for _ in range(40):
+        a = _with_energy(random_cluster(n_atoms, rng), rng.uniform(-10, -9))
+        # copies from identical to clearly different, energies on both sides of dE
+        for amplitude in (0.0, 0.005, 0.02, 0.05, 0.2):
+            b = a.copy()
+            b.rattle(amplitude, seed=int(rng.integers(1 << 30)))
+            b.translate(rng.uniform(-3, 3, 3))
+            b = b[rng.permutation(n_atoms)]
+            pairs.append((a, _with_energy(b, a.get_potential_energy() + rng.uniform(-0.03, 0.03))))
+        pairs.append((a, _with_energy(random_cluster(n_atoms, rng), a.get_potential_energy())))
+
+    expected = [ase_cmp.looks_like(a, b) for a, b in pairs]
+    assert [ours.looks_like(a, b) for a, b in pairs] == expected
+    assert any(expected) and not all(expected)
+
+
+def test_match_is_the_vectorised_looks_like(rng):
+    comparator = FingerprintComparator()
+    population = [_with_energy(random_cluster(8, rng), -9.5) for _ in range(10)]
+    child = population[3].copy()
+    child.rattle(0.001, seed=1)
+    child = _with_energy(child, -9.5)
+
+    fps = np.stack([comparator.fingerprint(a) for a in population])
+    energies = np.array([a.get_potential_energy() for a in population])
+    mask = comparator.match(comparator.fingerprint(child), -9.5, fps, energies)
+    assert list(mask) == [comparator.looks_like(child, a) for a in population]
+    assert mask[3]
@@ -0,0 +1,45 @@
+import numpy as np
+from ase.calculators.lj import LennardJones
+from ase.optimize import FIRE
+
+from conftest import random_cluster
+from scripts.optimizers import relax_batch
+
+
+def _lj():
+    return LennardJones(sigma=3.3, epsilon=0.05, rc=10.0, smooth=True)
+
+
+def test_relax_batch_follows_ase_fire_step_for_step(rng):
+    structures = [random_cluster(8, rng) for _ in range(5)]
+    fmax, steps = 0.01, 60
+
+    reference = []
+    for a in structures:
+        b = a.copy()
+        b.calc = _lj()
+        path = []
+        dyn = FIRE(b, logfile=None)
+        dyn.attach(lambda: path.append(b.get_positions().copy()))
+        dyn.run(fmax=fmax, steps=steps)
+        reference.append(path)
+
+    paths = [[] for _ in structures]
+    frames = [a.copy() for a in structures]
+    nsteps = relax_batch(frames, _lj(), fmax, steps, batch_size=2,
+                         observer=lambda i, a, res: paths[i].append(a.get_positions().copy()))
+
+    assert min(nsteps) > 10
+    for path, ref, n in zip(paths, reference, nsteps):
+        assert len(path) == len(ref) == n + 1
+        np.testing.assert_allclose(np.array(path), np.array(ref), atol=1e-10)
+
+
+def test_relax_batch_leaves_final_results_on_the_structures(rng):
+    frames = [random_cluster(8, rng) for _ in range(3)]
+    relax_batch(frames, _lj(), 0.05, 500)
+    for a in frames:
+        ref = a.copy()
+        ref.calc = _lj()
+        assert np.sqrt((a.get_forces() ** 2).sum(axis=1).max()) < 0.05
+        np.testing.assert_allclose(a.get_potential_energy(), ref.get_potential_energy())